@@ -0,0 +1,212 @@
+"""
+Embedding backends compared: parity with the fp32 model, latency, throughput and memory.
+
+Usage:
+    python -m benchmarks.bench_embeddings [--backends torch,torch-int8,onnx,onnx-int8]
+        [--min-cosine 0.98] [--threads 1] [--repeat 5]
+
+Each backend (see chatbot.embeddings.EMBEDDING_BACKENDS) is loaded in its
+own forked process (Linux), so the memory its model adds is measured alone.
+In that process it:
+  - embeds every chunk of universities_data.txt in batches (chunks/s)
+  - embeds each query of benchmarks/data/queries.txt one at a time, as a
+    chat request does (p50/p95/p99)
+The parent then compares each backend's vectors with those of the fp32
+'torch' backend: cosine similarity per chunk and per query (mean and min),
+and the overlap of the top --top-k chunks each query retrieves.
+
+Fails if any backend's minimum cosine similarity is below --min-cosine.
+Backends whose optional dependencies are missing are reported and skipped.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_intent import load_queries  # noqa: E402
+from benchmarks.report import rss_mb, save_results, summarize  # noqa: E402
+from chatbot.embeddings import (  # noqa: E402
+    DEFAULT_MODEL_NAME, EMBEDDING_BACKENDS, SharedEmbeddingFunction, cosine_similarity
+)
+from chatbot.enhanced_rag_service import EnhancedRAGService  # noqa: E402
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'chatbot', 'universities_data.txt')
+REFERENCE_BACKEND = 'torch'
+
+
+def measure_backend(backend: str, model_name: str, chunks, queries, batch_size: int,
+                    threads: int, repeat: int):
+    """Load one backend and time it; returns its vectors and measurements"""
+    if threads and 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    embedding = SharedEmbeddingFunction(model_name, batch_size=batch_size, backend=backend, threads=threads)
+    embedding.model
+    load_seconds = time.perf_counter() - started
+    rss_loaded = rss_mb()
+
+    # Warm-up: first calls allocate buffers and pick kernels
+    embedding.embed_documents(chunks[:batch_size])
+    embedding.embed_query(queries[0])
+
+    started = time.perf_counter()
+    chunk_vectors = embedding.embed_documents(chunks)
+    chunk_seconds = time.perf_counter() - started
+
+    latencies = []
+    query_vectors = []
+    for run in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            vector = embedding.embed_query(query)
+            latencies.append(time.perf_counter() - start)
+            if run == 0:
+                query_vectors.append(vector)
+
+    return {
+        'load_seconds': load_seconds,
+        'model_mb': (rss_loaded - rss_before) if rss_before is not None and rss_loaded is not None else None,
+        'rss_mb': rss_mb(),
+        'chunks_per_s': len(chunks) / chunk_seconds if chunk_seconds > 0 else 0.0,
+        'query': summarize(latencies),
+        'chunk_vectors': chunk_vectors,
+        'query_vectors': query_vectors
+    }
+
+
+def run_in_child(func, *args):
+    """func(*args) in a forked process; returns its JSON result or {'error': ...}"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            try:
+                result = func(*args)
+            except Exception as e:
+                result = {'error': f"{type(e).__name__}: {e}"}
+            data = json.dumps(result).encode('utf-8')
+            while data:
+                data = data[os.write(write_fd, data):]
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+    chunks = []
+    while True:
+        data = os.read(read_fd, 1 << 20)
+        if not data:
+            break
+        chunks.append(data)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    return json.loads(b''.join(chunks) or b'{"error": "no result"}')
+
+
+def top_k(query_vector, chunk_vectors, k: int):
+    scores = [cosine_similarity(query_vector, vector) for vector in chunk_vectors]
+    return set(sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k])
+
+
+def parity(reference, result, k: int):
+    """Cosine similarity with the reference vectors and top-k retrieval overlap"""
+    chunk_cosines = [cosine_similarity(a, b) for a, b in zip(reference['chunk_vectors'], result['chunk_vectors'])]
+    query_cosines = [cosine_similarity(a, b) for a, b in zip(reference['query_vectors'], result['query_vectors'])]
+    cosines = chunk_cosines + query_cosines
+    overlaps = [
+        len(top_k(ref_query, reference['chunk_vectors'], k) & top_k(query, result['chunk_vectors'], k)) / k
+        for ref_query, query in zip(reference['query_vectors'], result['query_vectors'])
+    ]
+    return {
+        'mean_cosine': sum(cosines) / len(cosines),
+        'min_cosine': min(cosines),
+        'min_query_cosine': min(query_cosines),
+        'top_k_overlap': sum(overlaps) / len(overlaps)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backends', default=','.join(EMBEDDING_BACKENDS),
+                        help=f"comma-separated, from {', '.join(EMBEDDING_BACKENDS)}")
+    parser.add_argument('--model', default=DEFAULT_MODEL_NAME)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=1,
+                        help='intra-op threads per backend (0: runtime default)')
+    parser.add_argument('--repeat', type=int, default=5, help='passes over the queries')
+    parser.add_argument('--top-k', type=int, default=8)
+    parser.add_argument('--min-cosine', type=float, default=0.98)
+    parser.add_argument('--chunk-size', type=int, default=400)
+    parser.add_argument('--data-file', default=DATA_FILE)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/)')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    unknown = [name for name in backends if name not in EMBEDDING_BACKENDS]
+    if unknown:
+        parser.error(f"unknown backends {unknown}; choose from {EMBEDDING_BACKENDS}")
+    if REFERENCE_BACKEND not in backends:
+        backends.insert(0, REFERENCE_BACKEND)
+
+    with open(args.data_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    # The text helpers do not touch instance state, so skip __init__ (model load, indexing)
+    rag = EnhancedRAGService.__new__(EnhancedRAGService)
+    chunks = rag._split_into_chunks(rag._clean_text(content), chunk_size=args.chunk_size)
+    queries = load_queries()
+    print(f"{len(chunks)} chunks, {len(queries)} queries, model {args.model}, {args.threads or 'default'} threads")
+
+    measured = {}
+    for backend in backends:
+        result = run_in_child(measure_backend, backend, args.model, chunks, queries,
+                              args.batch_size, args.threads, args.repeat)
+        if 'error' in result:
+            print(f"{backend}: skipped ({result['error']})")
+        measured[backend] = result
+
+    reference = measured[REFERENCE_BACKEND]
+    if 'error' in reference:
+        print(f"The reference backend '{REFERENCE_BACKEND}' failed; nothing to compare against")
+        return 1
+
+    rows = []
+    for backend, result in measured.items():
+        if 'error' in result:
+            rows.append({'backend': backend, 'error': result['error']})
+            continue
+        row = {'backend': backend, **{key: value for key, value in result.items() if not key.endswith('_vectors')}}
+        row.update(parity(reference, result, args.top_k))
+        rows.append(row)
+
+    print(f"\n{'backend':<12} {'load s':>7} {'model MiB':>10} {'chunks/s':>9} {'q p50 ms':>9} {'q p95 ms':>9} "
+          f"{'q p99 ms':>9} {'mean cos':>9} {'min cos':>8} {f'top-{args.top_k}':>7}")
+    for row in rows:
+        if 'error' in row:
+            continue
+        model_mb = f"{row['model_mb']:.1f}" if row['model_mb'] is not None else '-'
+        print(f"{row['backend']:<12} {row['load_seconds']:>7.2f} {model_mb:>10} {row['chunks_per_s']:>9.1f} "
+              f"{row['query']['p50_ms']:>9.3f} {row['query']['p95_ms']:>9.3f} {row['query']['p99_ms']:>9.3f} "
+              f"{row['mean_cosine']:>9.5f} {row['min_cosine']:>8.5f} {row['top_k_overlap']:>7.3f}")
+
+    if not args.no_save:
+        save_results('embeddings', {'backends': rows, 'chunks': len(chunks), 'queries': len(queries)},
+                     args=args, output=args.output)
+
+    failed = [row['backend'] for row in rows if 'error' not in row and row['min_cosine'] < args.min_cosine]
+    if failed:
+        print(f"FAIL: cosine similarity with fp32 below {args.min_cosine} for {', '.join(failed)}")
+        return 1
+    print(f"OK: every measured backend within cosine {args.min_cosine} of fp32")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Ingestion benchmark against the local Firecrawl stand-in.
+
+Usage:
+    python -m benchmarks.bench_ingest [--pages 20] [--latency 0.05] [--output results.json]
+
+Builds EnhancedRAGService on an in-memory store with StubFirecrawlService
+and times the three web ingestion paths: single pages (add_web_content),
+a site crawl (add_web_content with max_pages) and search-and-add
+(add_search_content). Reports seconds, pages/s and chunks added per path,
+the corpus load time and RSS after each step, and saves JSON results.
+Real embeddings are used, so the numbers include model inference.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.report import rss_mb, save_results  # noqa: E402
+from benchmarks.stub_firecrawl import StubFirecrawlService  # noqa: E402
+from chatbot.enhanced_rag_service import EnhancedRAGService  # noqa: E402
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'chatbot', 'universities_data.txt')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20, help='pages per ingestion path')
+    parser.add_argument('--latency', type=float, default=0.05, help='stub seconds per Firecrawl call')
+    parser.add_argument('--paragraphs', type=int, default=6, help='paragraphs per stub page')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent scrapes for search-and-add')
+    parser.add_argument('--ingest-workers', type=int, default=1)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/)')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    stub = StubFirecrawlService(latency=args.latency, paragraphs_per_page=args.paragraphs)
+    tmp = tempfile.mkdtemp(prefix='bench_ingest_')
+    try:
+        data_file = os.path.join(tmp, 'universities_data.txt')
+        shutil.copyfile(DATA_FILE, data_file)
+
+        rss_start = rss_mb()
+        started = time.perf_counter()
+        rag = EnhancedRAGService(
+            data_file, collection_name='bench_ingest', firecrawl=stub,
+            ingest_workers=args.ingest_workers, scrape_workers=args.workers, scrape_host_interval=0.0
+        )
+        steps = [{
+            'name': 'load corpus', 'seconds': time.perf_counter() - started,
+            'pages': 1, 'chunks': rag.get_stats()['file_chunks'], 'rss_mb': rss_mb()
+        }]
+
+        def single_pages():
+            return sum(
+                rag.add_web_content(f"https://www.ox.ac.uk/single/{i}") for i in range(args.pages)
+            )
+
+        scenarios = [
+            ('single pages', single_pages),
+            ('site crawl', lambda: rag.add_site_crawl(
+                'https://www.cam.ac.uk/crawl', max_pages=args.pages, poll_interval=0.0)),
+            ('search and add', lambda: rag.add_search_content(
+                'uk university admissions', max_results=args.pages)),
+        ]
+        for name, run in scenarios:
+            chunks_before = rag.get_stats()['web_chunks']
+            started = time.perf_counter()
+            pages = int(run())
+            steps.append({
+                'name': name, 'seconds': time.perf_counter() - started, 'pages': pages,
+                'chunks': rag.get_stats()['web_chunks'] - chunks_before, 'rss_mb': rss_mb()
+            })
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"\n{'step':<16} {'pages':>6} {'chunks':>7} {'seconds':>9} {'pages/s':>8} {'RSS MiB':>8}")
+    for step in steps:
+        step['pages_per_s'] = step['pages'] / step['seconds'] if step['seconds'] > 0 else 0.0
+        rss = f"{step['rss_mb']:.1f}" if step['rss_mb'] is not None else '-'
+        print(f"{step['name']:<16} {step['pages']:>6} {step['chunks']:>7} {step['seconds']:>9.2f} "
+              f"{step['pages_per_s']:>8.1f} {rss:>8}")
+    print(f"\nfirecrawl calls: {stub.calls}")
+
+    if not args.no_save:
+        save_results('ingest', {'steps': steps, 'rss_start_mb': rss_start, 'firecrawl_calls': stub.calls},
+                     args=args, output=args.output)
+    ok = all(step['pages'] == args.pages for step in steps[1:])
+    print("OK" if ok else "MISMATCH: not every page was indexed")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Micro-benchmark: KeywordIntentClassifier vs the original per-word Levenshtein scan.
+
+Usage:
+    python -m benchmarks.bench_intent [--variants 40] [--seed 7]
+
+Expands benchmarks/data/queries.txt into a few thousand queries (the
+originals plus seeded typo variants), checks that both gates make identical
+decisions and reports the time per query, with off-topic queries - the old
+worst case - timed separately.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.intent import KeywordIntentClassifier  # noqa: E402
+
+QUERIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'queries.txt')
+
+
+def load_queries(path: str = QUERIES_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def typo_variants(query: str, rng: random.Random, count: int):
+    """Queries with 1-2 random character edits, like real users' typos"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    variants = []
+    for _ in range(count):
+        chars = list(query)
+        for _ in range(rng.randint(1, 2)):
+            if not chars:
+                break
+            i = rng.randrange(len(chars))
+            edit = rng.choice(('delete', 'insert', 'replace', 'swap'))
+            if edit == 'delete':
+                del chars[i]
+            elif edit == 'insert':
+                chars.insert(i, rng.choice(letters))
+            elif edit == 'replace':
+                chars[i] = rng.choice(letters)
+            elif i + 1 < len(chars):
+                chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        variants.append(''.join(chars))
+    return variants
+
+
+class LegacyKeywordGate:
+    """Pre-optimization ChatbotService keyword gate (substring scan + Levenshtein)"""
+
+    def _is_education_related(self, query: str) -> bool:
+        """Check if query is about UK universities/education - with fuzzy matching for spelling mistakes"""
+        try:
+            education_keywords = [
+                'university', 'universities', 'college', 'oxford', 'cambridge',
+                'student', 'admission', 'ucas', 'degree', 'tuition', 'fee',
+                'russell group', 'redbrick', 'accommodation', 'campus',
+                'undergraduate', 'postgraduate', 'phd', 'master', 'bachelor',
+                'lecture', 'semester', 'academic', 'education', 'study',
+                'scholarship', 'student loan', 'uk education', 'british university',
+                'imperial', 'lse', 'ucl', 'edinburgh', 'manchester', 'warwick',
+                'course', 'program', 'programme', 'faculty', 'department', 'school',
+                'a-level', 'gcse', 'btec', 'foundation', 'clearing',
+                'student visa', 'international student', 'home student',
+                'halls', 'library', 'dissertation', 'thesis',
+                'exam', 'assessment', 'grade', 'gpa', 'transcript',
+                # More UK universities
+                'durham', 'bristol', 'nottingham', 'leeds', 'liverpool',
+                'birmingham', 'glasgow', 'exeter', 'york', 'bath',
+                'st andrews', 'kings college', 'queen mary', 'southampton',
+                'newcastle', 'cardiff', 'sheffield', 'leicester',
+                # University types
+                'ancient', 'plate glass', 'civic', 'new university',
+                'russell', 'group of universities'
+            ]
+
+            query_lower = query.lower()
+
+            # First check exact matches
+            if any(keyword in query_lower for keyword in education_keywords):
+                return True
+
+            # If no exact match, try fuzzy matching for spelling mistakes
+            query_words = query_lower.split()
+            for word in query_words:
+                # Only check words longer than 3 characters
+                if len(word) <= 3:
+                    continue
+
+                for keyword in education_keywords:
+                    # Only fuzzy match single-word keywords
+                    if ' ' in keyword:
+                        continue
+
+                    # Calculate similarity
+                    if self._is_similar(word, keyword):
+                        return True
+
+            return False
+
+        except Exception as e:
+            return False
+
+    def _is_similar(self, word1: str, word2: str, threshold: int = 2) -> bool:
+        """Check if two words are similar using Levenshtein distance (allows typos)"""
+        # If lengths differ by more than threshold, not similar
+        if abs(len(word1) - len(word2)) > threshold:
+            return False
+
+        # Calculate Levenshtein distance (edit distance)
+        distance = self._levenshtein_distance(word1, word2)
+
+        # Allow up to 2 character differences for words 5+ chars
+        # Allow 1 character difference for words 4 chars
+        max_distance = 2 if len(word2) >= 5 else 1
+
+        return distance <= max_distance
+
+    def _levenshtein_distance(self, s1: str, s2: str) -> int:
+        """Calculate Levenshtein distance between two strings"""
+        if len(s1) < len(s2):
+            return self._levenshtein_distance(s2, s1)
+
+        if len(s2) == 0:
+            return len(s1)
+
+        previous_row = range(len(s2) + 1)
+        for i, c1 in enumerate(s1):
+            current_row = [i + 1]
+            for j, c2 in enumerate(s2):
+                # Cost of insertions, deletions, or substitutions
+                insertions = previous_row[j + 1] + 1
+                deletions = current_row[j] + 1
+                substitutions = previous_row[j] + (c1 != c2)
+                current_row.append(min(insertions, deletions, substitutions))
+            previous_row = current_row
+
+        return previous_row[-1]
+
+    def _response_cache_key(self, user_query: str) -> str:
+        """Cache key from the normalized query and the knowledge base version"""
+        query_hash = hashlib.sha1(normalize_query(user_query).encode('utf-8')).hexdigest()
+        corpus_version = getattr(self.rag_service, 'corpus_version', '0')
+        return f"response:{corpus_version}:{query_hash}"
+
+    def get_cache_stats(self):
+        """Response cache hit/miss counters (None when caching is disabled)"""
+        return self.response_cache.stats() if self.response_cache is not None else None
+
+
+def time_per_query(func, queries, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--variants', type=int, default=40, help='typo variants per corpus query')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base_queries = load_queries()
+    queries = list(base_queries)
+    for query in base_queries:
+        queries.extend(typo_variants(query, rng, args.variants))
+
+    legacy = LegacyKeywordGate()
+    classifier = KeywordIntentClassifier()
+
+    mismatches = [q for q in queries if legacy._is_education_related(q) != classifier.is_education_related(q)]
+    off_topic = [q for q in queries if not legacy._is_education_related(q)]
+    print(f"Queries: {len(queries):,} ({len(off_topic):,} off-topic)")
+    print(f"Identical decisions: {not mismatches} ({len(mismatches)} mismatches)")
+    for query in mismatches[:10]:
+        print(f"  mismatch: {query!r}")
+
+    # Fresh classifier so its per-word memo does not flatter the comparison
+    for label, subset in (('all queries', queries), ('off-topic', off_topic)):
+        legacy_time = time_per_query(legacy._is_education_related, subset)
+        fresh_time = time_per_query(KeywordIntentClassifier().is_education_related, subset, repeat=1)
+        warm_time = time_per_query(classifier.is_education_related, subset)
+        print(f"{label:>12}: legacy {legacy_time * 1e6:8.1f} us | "
+              f"classifier cold {fresh_time * 1e6:6.1f} us ({legacy_time / fresh_time:5.1f}x) | "
+              f"warm {warm_time * 1e6:6.1f} us ({legacy_time / warm_time:5.1f}x)")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
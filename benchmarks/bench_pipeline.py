@@ -0,0 +1,104 @@
+"""
+Micro-benchmarks for the CPU-bound steps of the chat pipeline.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--repeat 200] [--output results.json]
+
+Times, per call and without a server, model or vector store:
+  - EnhancedRAGService._clean_text on each line of universities_data.txt
+  - EnhancedRAGService._split_into_chunks on the cleaned corpus
+  - ChatbotService._is_education_related on benchmarks/data/queries.txt
+  - ChatbotService._generate_response on each query with its top 8 BM25 chunks
+    (the documents retrieval would typically hand it)
+
+Reports p50/p95/p99 per step and the process RSS, and saves JSON results
+for comparison across commits (see benchmarks/compare.py).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_intent import load_queries  # noqa: E402
+from benchmarks.report import print_table, rss_mb, save_results, summarize  # noqa: E402
+from chatbot.bm25 import BM25Index  # noqa: E402
+from chatbot.chatbot_service import ChatbotService  # noqa: E402
+from chatbot.enhanced_rag_service import EnhancedRAGService  # noqa: E402
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'chatbot', 'universities_data.txt')
+
+
+def time_calls(func, inputs, repeat: int = 1):
+    """Per-call latencies (seconds) of func over inputs, `repeat` passes"""
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='passes over the inputs of the fast steps')
+    parser.add_argument('--chunk-size', type=int, default=400)
+    parser.add_argument('--data-file', default=DATA_FILE)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/)')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.data_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    queries = load_queries()
+
+    # The text helpers do not touch instance state, so skip __init__ (model load, indexing)
+    rag = EnhancedRAGService.__new__(EnhancedRAGService)
+    chatbot = ChatbotService(rag_service=None)
+
+    paragraphs = [line for line in content.splitlines() if line.strip()]
+    cleaned = rag._clean_text(content)
+    chunks = rag._split_into_chunks(cleaned, chunk_size=args.chunk_size)
+
+    index = BM25Index()
+    index.add_many([str(i) for i in range(len(chunks))], chunks)
+    docs_by_query = {
+        query: [chunks[int(doc_id)] for doc_id, _ in index.search(query, n_results=8)]
+        for query in queries
+    }
+    answerable = [query for query in queries if docs_by_query[query]]
+
+    rss_before = rss_mb()
+    steps = [
+        ('_clean_text (line)', time_calls(rag._clean_text, paragraphs, max(1, args.repeat // 20))),
+        ('_clean_text (whole corpus)', time_calls(rag._clean_text, [content], 5)),
+        ('_split_into_chunks (corpus)', time_calls(
+            lambda text: rag._split_into_chunks(text, chunk_size=args.chunk_size), [cleaned], 20)),
+        ('_is_education_related', time_calls(chatbot._is_education_related, queries, args.repeat)),
+        ('_generate_response (8 docs)', time_calls(
+            lambda query: chatbot._generate_response(query, docs_by_query[query]), answerable,
+            max(1, args.repeat // 20))),
+    ]
+
+    rows = [{'name': name, **summarize(latencies)} for name, latencies in steps]
+    print(f"Corpus: {len(content):,} chars, {len(paragraphs)} lines, {len(chunks)} chunks; "
+          f"{len(queries)} queries ({len(answerable)} with BM25 hits)")
+    print_table(rows, title='Per-call latency')
+    rss = rss_mb()
+    print(f"\nRSS: {rss:.1f} MiB" if rss is not None else "\nRSS: n/a")
+
+    if not args.no_save:
+        save_results('pipeline', {
+            'steps': rows,
+            'rss_mb': rss,
+            'rss_before_timing_mb': rss_before,
+            'corpus': {'chars': len(content), 'chunks': len(chunks), 'queries': len(queries)}
+        }, args=args, output=args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Search-and-add ingestion against the local Firecrawl stand-in.
+
+Usage:
+    python -m benchmarks.bench_search_ingest [--results 6] [--latency 0.2] [--host-interval 0.5]
+
+Runs EnhancedRAGService.add_search_content twice for the same query on an
+in-memory store and reports wall time, Firecrawl calls and the smallest gap
+between scrapes of one host. Checks that pages carry the search query in
+their metadata and that the repeat add reuses the cached search hits.
+chatbot/tests.py asserts the same with a stub embedding function
+(python manage.py test chatbot); this script times it with the real model.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_firecrawl import StubFirecrawlService  # noqa: E402
+from chatbot.enhanced_rag_service import EnhancedRAGService  # noqa: E402
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'chatbot', 'universities_data.txt')
+
+
+def min_host_gap(scrape_log):
+    """Smallest time between two scrapes of the same host"""
+    last_by_host = {}
+    gaps = []
+    for at, url in sorted(scrape_log):
+        host = url.split('/')[2]
+        if host in last_by_host:
+            gaps.append(at - last_by_host[host])
+        last_by_host[host] = at
+    return min(gaps) if gaps else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--query', default='uk university admissions')
+    parser.add_argument('--results', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.2, help='stub seconds per Firecrawl call')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--host-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    stub = StubFirecrawlService(latency=args.latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, 'universities_data.txt')
+        with open(DATA_FILE, 'r', encoding='utf-8') as src, open(data_file, 'w', encoding='utf-8') as dst:
+            dst.write(src.read())
+
+        rag = EnhancedRAGService(
+            data_file, collection_name='bench_search_ingest', firecrawl=stub,
+            scrape_workers=args.workers, scrape_host_interval=args.host_interval
+        )
+
+        timings = []
+        for attempt in ('first', 'repeat'):
+            started = time.perf_counter()
+            pages = rag.add_search_content(args.query, max_results=args.results)
+            timings.append((attempt, pages, time.perf_counter() - started))
+
+        tagged = rag.collection.get(where={"search_query": args.query}, include=['metadatas'])
+        sources = {meta['source'] for meta in tagged['metadatas']}
+
+    serial = args.results * args.latency
+    print(f"\n{'run':<8} {'pages':>6} {'seconds':>9}")
+    for attempt, pages, seconds in timings:
+        print(f"{attempt:<8} {pages:>6} {seconds:>9.2f}")
+    print(f"\nserial scrape estimate: {serial:.2f}s")
+    print(f"firecrawl calls: {stub.calls}")
+    gap = min_host_gap(stub.scrape_log)
+    print(f"min same-host gap: {gap:.2f}s (limit {args.host_interval:.2f}s)" if gap is not None
+          else "min same-host gap: n/a")
+    print(f"chunks tagged with the query: {len(tagged['ids'])} from {len(sources)} pages")
+
+    ok = (
+        stub.calls.get('search_web') == 1
+        and len(sources) == args.results
+        and (gap is None or gap >= args.host_interval * 0.95)
+    )
+    print("OK" if ok else "MISMATCH")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Micro-benchmark: shared precompiled cleaner vs the original sequential cleaner.
+
+Usage:
+    python -m benchmarks.bench_text_cleaner [--repeat 20]
+
+Checks that both produce identical output on universities_data.txt and
+reports the per-call time of each.
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.text_cleaner import clean_text  # noqa: E402
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'chatbot', 'universities_data.txt')
+
+
+def legacy_clean_text(text: str) -> str:
+    """Pre-optimization EnhancedRAGService._clean_text (30 uncompiled re.sub passes)"""
+    # Remove Wikipedia citations like [1], [2], [183]
+    text = re.sub(r'\[\d+\]', '', text)
+
+    # Remove escaped citation brackets like [\[183\]]
+    text = re.sub(r'\[\\?\[\\?\d+\\?\]\\?\]', '', text)
+
+    # Remove Wikipedia editorial markers like [citation needed], [self-published source], etc.
+    text = re.sub(r'\[\\?_\[?[^\]]+_?\\?\]\\?\]', '', text)
+    text = re.sub(r'\(_\[[^\]]+\]_?\)', '', text)
+    text = re.sub(r'\[_[^\]]+_\]', '', text)
+
+    # Remove Wikipedia tags like [update], [clarification needed], etc.
+    text = re.sub(r'\[\\?update\\?\]', '', text)
+    text = re.sub(r'\[\\?needs update\\?\]', '', text)
+    text = re.sub(r'\[\\?clarification needed\\?\]', '', text)
+    text = re.sub(r'\[\\?citation needed\\?\]', '', text)
+    text = re.sub(r'\[\\?failed verification\\?\]', '', text)
+    text = re.sub(r'\[\\?when\?\\?\]', '', text)
+    text = re.sub(r'\[\\?who\?\\?\]', '', text)
+    text = re.sub(r'\[\\?which\?\\?\]', '', text)
+
+    # Remove any remaining [word] patterns (Wikipedia tags)
+    text = re.sub(r'\[\\?[a-zA-Z\s]+\\?\]', '', text)
+
+    # Remove standalone _] or _[
+    text = re.sub(r'_\\?\]', '', text)
+    text = re.sub(r'\\?\[_', '', text)
+
+    # Remove backslashes and underscores (but keep normal brackets and parentheses)
+    text = re.sub(r'\\', '', text)  # Remove all backslashes
+    text = re.sub(r'_', '', text)  # Remove all underscores
+
+    # Remove any remaining escaped brackets
+    text = re.sub(r'\[\\?\]', '', text)
+
+    # Remove citation markers like #cite_note-211
+    text = re.sub(r'#cite[^\s\)]+', '', text)
+
+    # Remove URLs
+    text = re.sub(r'https?://[^\s]+', '', text)
+    text = re.sub(r'www\.[^\s]+', '', text)
+    text = re.sub(r'org/wiki/[^\s\)]+', '', text)
+    text = re.sub(r'en\.wikipedia\.org[^\s\)]+', '', text)
+
+    # Remove empty brackets and parentheses
+    text = re.sub(r'\(\s*\)', '', text)
+    text = re.sub(r'\[\s*\]', '', text)
+
+    # Clean whitespace
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s+([.,;:!?])', r'\1', text)
+
+    return text.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--data-file', default=DATA_FILE)
+    args = parser.parse_args()
+
+    with open(args.data_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    legacy_output = legacy_clean_text(content)
+    shared_output = clean_text(content)
+    print(f"Input: {len(content):,} chars -> {len(shared_output):,} chars cleaned")
+    print(f"Identical output: {legacy_output == shared_output}")
+
+    legacy_time = min(timeit.repeat(lambda: legacy_clean_text(content), number=1, repeat=args.repeat))
+    shared_time = min(timeit.repeat(lambda: clean_text(content), number=1, repeat=args.repeat))
+    print(f"legacy _clean_text: {legacy_time * 1000:8.2f} ms")
+    print(f"shared clean_text:  {shared_time * 1000:8.2f} ms  ({legacy_time / shared_time:.1f}x faster)")
+
+    # Response path: re-cleaning retrieved chunks that were already cleaned at ingestion
+    chunks = [shared_output[i:i + 400] for i in range(0, len(shared_output), 400)][:8]
+    legacy_time = min(timeit.repeat(lambda: [legacy_clean_text(c) for c in chunks], number=100, repeat=5)) / 100
+    shared_time = min(timeit.repeat(lambda: [clean_text(c) for c in chunks], number=100, repeat=5)) / 100
+    print(f"8 retrieved chunks, legacy: {legacy_time * 1e6:8.1f} us/request")
+    print(f"8 retrieved chunks, shared: {shared_time * 1e6:8.1f} us/request (skipped entirely when pre-cleaned)")
+
+    return 0 if legacy_output == shared_output else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Per-worker memory check for preload-and-fork deployments (Linux only).
+
+Usage:
+    python -m benchmarks.check_fork_rss [--workers 4] [--queries 50] [--max-ratio 0.5]
+
+Forks --workers children the way a pre-forking server does, twice:
+  - no preload: each child builds its own services after the fork
+  - preload: the parent builds them once, freezes the GC, and the children
+    inherit them (ServiceRegistry.after_fork runs in each child)
+Each child answers --queries queries from benchmarks/data/queries.txt,
+then reads its own /proc/self/smaps_rollup. The private memory (USS) a
+child reports is what one more worker costs.
+
+Fails if a preloaded worker's private memory exceeds --max-ratio times
+that of a worker which loaded everything itself.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_intent import load_queries  # noqa: E402
+from benchmarks.report import save_results  # noqa: E402
+from chatbot.chatbot_service import ChatbotService  # noqa: E402
+from chatbot.enhanced_rag_service import EnhancedRAGService  # noqa: E402
+from chatbot.services import ServiceRegistry  # noqa: E402
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'chatbot', 'universities_data.txt')
+
+
+def memory_mb(pid='self'):
+    """{'rss', 'pss', 'private', 'shared'} in MiB from /proc/<pid>/smaps_rollup (or smaps)"""
+    fields = {}
+    for name in ('smaps_rollup', 'smaps'):
+        try:
+            with open(f"/proc/{pid}/{name}", 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3 and parts[2] == 'kB':
+                        fields[parts[0].rstrip(':')] = fields.get(parts[0].rstrip(':'), 0) + int(parts[1])
+            break
+        except OSError:
+            continue
+    if not fields:
+        raise SystemExit("This check needs Linux /proc/<pid>/smaps")
+    kib = 1024.0
+    return {
+        'rss': fields.get('Rss', 0) / kib,
+        'pss': fields.get('Pss', 0) / kib,
+        'private': (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / kib,
+        'shared': (fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / kib
+    }
+
+
+def run_workers(registry: ServiceRegistry, workers: int, queries):
+    """Fork workers that answer queries and report their memory; returns their reports"""
+    children = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 0
+            try:
+                gc.enable()
+                # What the os.register_at_fork hook does for the process-wide registry
+                registry.after_fork()
+                started = time.perf_counter()
+                chatbot_service = registry.get_chatbot_service()
+                ready_seconds = time.perf_counter() - started
+                for query in queries:
+                    chatbot_service.get_response(query)
+                report = {'pid': os.getpid(), 'ready_seconds': ready_seconds, **memory_mb()}
+                os.write(write_fd, json.dumps(report).encode('utf-8'))
+            except BaseException as e:
+                os.write(write_fd, json.dumps({'error': repr(e)}).encode('utf-8'))
+                status = 1
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    reports = []
+    for pid, read_fd in children:
+        chunks = []
+        while True:
+            data = os.read(read_fd, 65536)
+            if not data:
+                break
+            chunks.append(data)
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+        report = json.loads(b''.join(chunks) or b'{"error": "no report"}')
+        if 'error' in report:
+            raise SystemExit(f"worker {pid} failed: {report['error']}")
+        reports.append(report)
+    return reports
+
+
+def mean(reports, key):
+    return sum(report[key] for report in reports) / len(reports)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=50, help='queries answered by each worker')
+    parser.add_argument('--max-ratio', type=float, default=0.5,
+                        help='max preloaded/no-preload private memory per worker')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/)')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    queries = load_queries()[:args.queries]
+    tmp = tempfile.mkdtemp(prefix='check_fork_rss_')
+    try:
+        data_file = os.path.join(tmp, 'universities_data.txt')
+        shutil.copyfile(DATA_FILE, data_file)
+
+        def factory():
+            # In-memory store: the built vector index is shared along with the model
+            rag_service = EnhancedRAGService(data_file, collection_name='check_fork_rss')
+            return rag_service, ChatbotService(rag_service)
+
+        results = {}
+        parent_before = memory_mb()
+        results['no_preload'] = {'workers': run_workers(ServiceRegistry(factory), args.workers, queries)}
+
+        registry = ServiceRegistry(factory)
+        registry.warm_up()
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        parent_preloaded = memory_mb()
+        results['preload'] = {'workers': run_workers(registry, args.workers, queries)}
+        gc.enable()
+        gc.unfreeze()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"parent: {parent_before['rss']:.1f} MiB RSS before building, "
+          f"{parent_preloaded['rss']:.1f} MiB after preloading")
+    print(f"\n{'mode':<12} {'workers':>7} {'RSS':>9} {'PSS':>9} {'private':>9} {'shared':>9} {'ready s':>8}")
+    for mode, result in results.items():
+        workers = result['workers']
+        for key in ('rss', 'pss', 'private', 'shared', 'ready_seconds'):
+            result[f"mean_{key}"] = mean(workers, key)
+        print(f"{mode:<12} {len(workers):>7} {result['mean_rss']:>9.1f} {result['mean_pss']:>9.1f} "
+              f"{result['mean_private']:>9.1f} {result['mean_shared']:>9.1f} {result['mean_ready_seconds']:>8.2f}")
+
+    ratio = results['preload']['mean_private'] / results['no_preload']['mean_private']
+    print(f"\nper-worker private memory, preload vs no preload: {ratio:.2f} (limit {args.max_ratio:.2f})")
+
+    if not args.no_save:
+        save_results('fork_rss', {
+            'parent_before_mb': parent_before, 'parent_preloaded_mb': parent_preloaded,
+            'modes': results, 'private_ratio': ratio
+        }, args=args, output=args.output)
+    ok = ratio <= args.max_ratio
+    print("OK" if ok else "FAIL: preloading does not keep per-worker memory down")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Compare two benchmark result files, e.g. from two commits.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/pipeline-abc123-....json \
+        benchmarks/results/pipeline-def456-....json [--all]
+
+Prints every numeric result present in both files with the relative change.
+Rows of a list are matched by their 'name'. By default only latency,
+throughput, time and RSS figures are shown.
+"""
+import argparse
+import json
+import sys
+
+KEY_FIELDS = ('_ms', '_per_s', 'seconds', 'rss', 'elapsed')
+
+
+def flatten(value, prefix=''):
+    """{'a.b[name].c': number} for every numeric leaf"""
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            label = item.get('name', i) if isinstance(item, dict) else i
+            flat.update(flatten(item, f"{prefix}[{label}]"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = value
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--all', action='store_true', help='show every numeric field')
+    args = parser.parse_args()
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, 'r', encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    if baseline.get('benchmark') != candidate.get('benchmark'):
+        print(f"warning: comparing {baseline.get('benchmark')} with {candidate.get('benchmark')}")
+    print(f"baseline:  {baseline.get('commit')} {baseline.get('timestamp')} ({baseline.get('host')})")
+    print(f"candidate: {candidate.get('commit')} {candidate.get('timestamp')} ({candidate.get('host')})\n")
+
+    old, new = flatten(baseline.get('results', {})), flatten(candidate.get('results', {}))
+    keys = [key for key in old if key in new and (args.all or any(field in key for field in KEY_FIELDS))]
+    width = max((len(key) for key in keys), default=10)
+    print(f"{'metric':<{width}} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for key in keys:
+        change = f"{(new[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else '-'
+        print(f"{key:<{width}} {old[key]:>12.3f} {new[key]:>12.3f} {change:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
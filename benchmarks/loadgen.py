@@ -0,0 +1,300 @@
+"""
+End-to-end load generator: replays the query corpus against a running server.
+
+Usage:
+    python manage.py runserver --noreload        # or gunicorn/uvicorn, in another shell
+    python -m benchmarks.loadgen [--base-url http://127.0.0.1:8000] [--concurrency 8]
+        [--requests 2000 | --duration 60] [--endpoints chat,search-sources]
+        [--queries unique|repeat] [--server-pid PID] [--output results.json]
+
+Each of `--concurrency` threads keeps one HTTP/1.1 keep-alive connection and
+sends queries from benchmarks/data/queries.txt (shuffled with --seed)
+back to back, so concurrency is fixed rather than the arrival rate. A
+warm-up of --warmup requests per endpoint runs first and is not measured. Reports p50/p95/p99
+latency and throughput per endpoint, the server RSS (with --server-pid, Linux)
+and the server's per-stage timings and cache hits from /metrics/, and saves JSON results.
+
+The corpus holds about a hundred queries and the server caches responses
+(CHATBOT_RESPONSE_CACHE), so replaying it verbatim soon measures cache
+lookups. --queries unique (the default) appends a request number to each
+query, e.g. "... [1042]", so every request misses the caches and runs the
+whole pipeline; --queries repeat replays the corpus as is, to measure a
+warm cache. The mode and the cache hits seen are saved with the results.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_intent import load_queries  # noqa: E402
+from benchmarks.report import print_table, rss_mb, save_results, summarize  # noqa: E402
+
+ENDPOINTS = {
+    'chat': ('/chat/', lambda query: {'message': query}),
+    'search-sources': ('/search-sources/', lambda query: {'query': query, 'n_results': 5}),
+}
+
+STAGE_SAMPLE = re.compile(
+    r'^chatbot_(stage|request)_duration_seconds_(sum|count)\{(?:stage|endpoint)="([^"]+)"\} (\S+)$'
+)
+CACHE_SAMPLE = re.compile(r'^chatbot_cache_(hits|misses)\{cache="([^"]+)"\} (\S+)$')
+QUERY_MODES = ('unique', 'repeat')
+
+
+class Client:
+    """One keep-alive connection, reopened after errors"""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.connection = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.connection = cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body=None):
+        """(status, body bytes); raises on connection errors after closing the connection"""
+        if self.connection is None:
+            self._connect()
+        headers = {'Connection': 'keep-alive'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response.status, data
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def is_success(endpoint: str, status: int, data: bytes) -> bool:
+    if status != 200:
+        return False
+    try:
+        body = json.loads(data)
+    except ValueError:
+        return False
+    if endpoint == 'chat':
+        # /chat/ always answers success:True; errors only show in the text
+        return not body.get('response', '').startswith('An error occurred')
+    return bool(body.get('success'))
+
+
+def fetch_stage_timings(base_url: str, timeout: float):
+    """
+    {'stage'|'request': {name: {'count', 'sum'}}, 'cache': {name: {'hits', 'misses'}}}
+    from the server's /metrics/, or None
+    """
+    client = Client(base_url, timeout)
+    try:
+        status, data = client.request('GET', '/metrics/')
+    except Exception:
+        return None
+    finally:
+        client.close()
+    if status != 200:
+        return None
+    timings = {}
+    for line in data.decode('utf-8').splitlines():
+        match = STAGE_SAMPLE.match(line)
+        if match:
+            kind, field, name, value = match.groups()
+            timings.setdefault(kind, {}).setdefault(name, {})[field] = float(value)
+            continue
+        match = CACHE_SAMPLE.match(line)
+        if match:
+            field, name, value = match.groups()
+            timings.setdefault('cache', {}).setdefault(name, {})[field] = float(value)
+    return timings
+
+
+def diff_timings(before, after):
+    """Mean milliseconds per stage between two /metrics/ snapshots"""
+    means = {}
+    for kind, stages in (after or {}).items():
+        for name, values in stages.items():
+            previous = ((before or {}).get(kind) or {}).get(name) or {}
+            count = values.get('count', 0) - previous.get('count', 0)
+            total = values.get('sum', 0.0) - previous.get('sum', 0.0)
+            if count > 0:
+                means[f"{kind}:{name}"] = {'count': int(count), 'mean_ms': total / count * 1000.0}
+    return means
+
+
+def diff_cache_counts(before, after):
+    """Hits, misses and hit ratio per cache between two /metrics/ snapshots"""
+    counts = {}
+    for name, values in ((after or {}).get('cache') or {}).items():
+        previous = ((before or {}).get('cache') or {}).get(name) or {}
+        hits = int(values.get('hits', 0) - previous.get('hits', 0))
+        misses = int(values.get('misses', 0) - previous.get('misses', 0))
+        if hits or misses:
+            counts[name] = {'hits': hits, 'misses': misses, 'hit_ratio': hits / (hits + misses)}
+    return counts
+
+
+def drive(args, endpoint: str, order, offset: int, count=None, duration=None, number=0):
+    """
+    Send requests from `concurrency` threads until count is sent or duration
+    elapses; with --queries unique, request i carries the number `number + i`
+    """
+    path, make_body = ENDPOINTS[endpoint]
+    lock = threading.Lock()
+    state = {'sent': 0}
+    latencies, errors = [], []
+    started = time.perf_counter()
+    deadline = started + duration if duration is not None else None
+
+    def next_query():
+        with lock:
+            if count is not None and state['sent'] >= count:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            index = offset + state['sent']
+            state['sent'] += 1
+            query = order[index % len(order)]
+            if args.queries == 'unique':
+                # A different query text per request, so no cache can answer it
+                query = f"{query} [{number + index}]"
+            return query
+
+    def worker():
+        client = Client(args.base_url, args.timeout)
+        try:
+            while True:
+                query = next_query()
+                if query is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    status, data = client.request('POST', path, make_body(query))
+                    error = None if is_success(endpoint, status, data) else f"HTTP {status}"
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if error:
+                        errors.append(error)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_endpoint(args, endpoint: str, queries, number: int = 0):
+    """Warm up and measure one endpoint; unique queries are numbered from `number`"""
+    order = list(queries)
+    random.Random(args.seed).shuffle(order)
+    if args.warmup:
+        drive(args, endpoint, order, 0, count=args.warmup, number=number)
+    if args.duration is not None:
+        latencies, errors, elapsed = drive(args, endpoint, order, args.warmup, duration=args.duration, number=number)
+    else:
+        latencies, errors, elapsed = drive(args, endpoint, order, args.warmup, count=args.requests, number=number)
+
+    summary = summarize(latencies, elapsed)
+    summary['errors'] = len(errors)
+    summary['error_samples'] = sorted(set(errors))[:5]
+    summary['sent'] = args.warmup + len(latencies)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--endpoints', default='chat,search-sources',
+                        help=f"comma-separated: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000, help='measured requests per endpoint')
+    parser.add_argument('--duration', type=float, help='seconds per endpoint (overrides --requests)')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per endpoint')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--queries', choices=QUERY_MODES, default='unique',
+                        help='unique: number every query so caches miss; repeat: replay the corpus verbatim')
+    parser.add_argument('--server-pid', type=int, help='server process to report RSS for (Linux)')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/)')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    queries = load_queries()
+    rss = {'server_before_mb': rss_mb(args.server_pid) if args.server_pid else None}
+    timings_before = fetch_stage_timings(args.base_url, args.timeout)
+
+    rows = []
+    number = 0
+    for endpoint in endpoints:
+        print(f"{endpoint}: {args.concurrency} connections, "
+              f"{f'{args.duration:.0f}s' if args.duration else f'{args.requests} requests'}, {args.queries} queries...")
+        row = {'name': endpoint, **run_endpoint(args, endpoint, queries, number)}
+        # Keep numbers unique across endpoints too: they share the search caches
+        number += row.pop('sent')
+        rows.append(row)
+
+    rss['server_after_mb'] = rss_mb(args.server_pid) if args.server_pid else None
+    rss['client_mb'] = rss_mb()
+    timings_after = fetch_stage_timings(args.base_url, args.timeout)
+    stages = diff_timings(timings_before, timings_after)
+    caches = diff_cache_counts(timings_before, timings_after)
+
+    print_table(rows, title='End-to-end latency')
+    for row in rows:
+        if row['errors']:
+            print(f"{row['name']}: {row['errors']} errors, e.g. {row['error_samples'][0]}")
+    if stages:
+        print("\nServer-side mean per stage (from /metrics/, this process only under multi-worker servers)")
+        for name, values in sorted(stages.items()):
+            print(f"  {name:<36} {values['mean_ms']:>9.3f} ms  ({values['count']} samples)")
+    if caches:
+        print(f"\nServer cache hits ({args.queries} queries, warm-up included)")
+        for name, values in sorted(caches.items()):
+            print(f"  {name:<36} {values['hits']:>7} hits {values['misses']:>7} misses  ({values['hit_ratio']:.1%})")
+    if args.server_pid:
+        before, after = rss['server_before_mb'], rss['server_after_mb']
+        print(f"\nServer RSS: {before:.1f} -> {after:.1f} MiB" if before and after else "\nServer RSS: n/a")
+
+    if not args.no_save:
+        save_results('loadgen', {'query_mode': args.queries, 'endpoints': rows, 'rss': rss,
+                                 'server_stages': stages, 'server_caches': caches},
+                     args=args, output=args.output)
+    return 1 if any(row['errors'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
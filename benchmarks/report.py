@@ -0,0 +1,111 @@
+"""
+Shared helpers for the benchmark scripts: latency percentiles, process RSS
+and JSON result files.
+
+Every result file records the git commit, host and arguments of the run,
+so files from different commits can be compared with benchmarks/compare.py.
+"""
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+
+def percentile(sorted_samples: Sequence[float], pct: float) -> float:
+    """Linear-interpolated percentile of already sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    position = (len(sorted_samples) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
+
+
+def summarize(latencies: Sequence[float], elapsed: Optional[float] = None) -> Dict:
+    """p50/p95/p99/mean/max in milliseconds, plus throughput when elapsed seconds is given"""
+    samples = sorted(latencies)
+    summary = {
+        'count': len(samples),
+        'p50_ms': percentile(samples, 50) * 1000.0,
+        'p95_ms': percentile(samples, 95) * 1000.0,
+        'p99_ms': percentile(samples, 99) * 1000.0,
+        'mean_ms': (sum(samples) / len(samples) * 1000.0) if samples else 0.0,
+        'max_ms': (samples[-1] * 1000.0) if samples else 0.0
+    }
+    if elapsed is not None:
+        summary['elapsed_s'] = elapsed
+        summary['throughput_per_s'] = len(samples) / elapsed if elapsed > 0 else 0.0
+    return summary
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Resident set size of a process in MiB (Linux /proc), or None if unavailable"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    if pid is None:
+        try:
+            import resource
+            # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+        except ImportError:
+            pass
+    return None
+
+
+def git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+            capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def print_table(rows: List[Dict], title: Optional[str] = None):
+    """Latency summaries as an aligned table, one row per {'name': ..., **summarize()}"""
+    if title:
+        print(f"\n{title}")
+    print(f"{'name':<32} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for row in rows:
+        throughput = row.get('throughput_per_s')
+        print(f"{row['name']:<32} {row['count']:>7} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+              f"{row['p99_ms']:>9.3f} {(f'{throughput:.1f}' if throughput is not None else '-'):>9}")
+
+
+def save_results(name: str, results: Dict, args=None, output: Optional[str] = None) -> str:
+    """Write results with run metadata to benchmarks/results/<name>-<commit>-<time>.json"""
+    commit = git_commit()
+    payload = {
+        'benchmark': name,
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'args': vars(args) if args is not None else {},
+        'results': results
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        filename = re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{name}-{commit or 'nogit'}-{stamp}.json")
+        output = os.path.join(RESULTS_DIR, filename)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {os.path.relpath(output)}")
+    return output
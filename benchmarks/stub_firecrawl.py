@@ -0,0 +1,90 @@
+"""
+Local stand-in for FirecrawlService: same methods and result shapes
+(v2 SDK dicts), deterministic content, configurable latency and no
+network or API key. Pass it as EnhancedRAGService(..., firecrawl=stub).
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+_PARAGRAPH = (
+    "{title} is one of the universities in the United Kingdom. This page covers "
+    "admissions, tuition fees, accommodation and student life at {title}, "
+    "including entry requirements for undergraduate and postgraduate courses."
+)
+
+
+class StubFirecrawlService:
+    def __init__(self, latency: float = 0.05, paragraphs_per_page: int = 6,
+                 hosts: Optional[List[str]] = None, crawl_pages_per_poll: int = 3):
+        self.latency = latency
+        self.paragraphs_per_page = paragraphs_per_page
+        self.hosts = hosts or ['www.ox.ac.uk', 'www.cam.ac.uk', 'www.ucl.ac.uk']
+        self.crawl_pages_per_poll = crawl_pages_per_poll
+        self.calls: Dict[str, int] = {}
+        # (monotonic time, url) of every scrape, to check per-host spacing
+        self.scrape_log: List = []
+        self._crawls: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, method: str):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    def _page(self, url: str) -> Dict:
+        parts = urlsplit(url)
+        title = f"{parts.netloc} {parts.path.strip('/') or 'home'}"
+        paragraphs = [
+            f"{_PARAGRAPH.format(title=title)} Section {i} of {url}."
+            for i in range(self.paragraphs_per_page)
+        ]
+        return {
+            'markdown': '\n\n'.join(paragraphs),
+            'metadata': {'title': title, 'source_url': url, 'url': url, 'status_code': 200}
+        }
+
+    def scrape_url(self, url, formats=['markdown', 'html']):
+        self._record('scrape_url')
+        with self._lock:
+            self.scrape_log.append((time.monotonic(), url))
+        time.sleep(self.latency)
+        return self._page(url)
+
+    def search_web(self, query, max_results=5):
+        self._record('search_web')
+        time.sleep(self.latency)
+        slug = '-'.join(query.lower().split()) or 'search'
+        web = [
+            {
+                'url': f"https://{self.hosts[i % len(self.hosts)]}/{slug}/{i}",
+                'title': f"{query} ({i})",
+                'description': f"Result {i} for {query}"
+            }
+            for i in range(max_results)
+        ]
+        return {'web': web}
+
+    def crawl_website(self, url, max_pages=10, include_paths=None, exclude_paths=None):
+        self._record('crawl_website')
+        job_id = f"crawl-{len(self._crawls) + 1}"
+        base = url.rstrip('/')
+        with self._lock:
+            self._crawls[job_id] = {'urls': [f"{base}/page-{i}" for i in range(max_pages)], 'polls': 0}
+        return {'id': job_id, 'url': url}
+
+    def get_crawl_status(self, job_id, skip=0):
+        self._record('get_crawl_status')
+        with self._lock:
+            crawl = self._crawls.get(job_id)
+            if crawl is None:
+                return None
+            crawl['polls'] += 1
+            done = min(len(crawl['urls']), crawl['polls'] * self.crawl_pages_per_poll)
+        time.sleep(self.latency)
+        return {
+            'status': 'completed' if done == len(crawl['urls']) else 'scraping',
+            'total': len(crawl['urls']),
+            'completed': done,
+            'data': [self._page(url) for url in crawl['urls'][skip:done]]
+        }
@@ -1,6 +1,33 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+WARMUP_MODES = ('off', 'background', 'blocking')
+
+
+def _is_serving() -> bool:
+    """False for manage.py commands other than runserver, and for runserver's autoreload parent"""
+    if os.path.basename(sys.argv[0]) != 'manage.py' or len(sys.argv) < 2:
+        return True
+    if sys.argv[1] != 'runserver':
+        return False
+    # With autoreload the server runs in a child process marked by RUN_MAIN
+    return '--noreload' in sys.argv or os.environ.get('RUN_MAIN') == 'true'
 
 
 class ChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chatbot'
+
+    def ready(self):
+        """Optionally build the chatbot services at startup instead of on the first request"""
+        mode = getattr(settings, 'CHATBOT_WARMUP', 'off')
+        if mode not in WARMUP_MODES:
+            raise ValueError(f"CHATBOT_WARMUP must be one of {WARMUP_MODES}")
+        if mode == 'off' or not _is_serving():
+            return
+
+        from chatbot.services import get_service_registry
+        get_service_registry().warm_up(background=(mode == 'background'))
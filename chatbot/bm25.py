@@ -0,0 +1,123 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about an and are as at be by can do does for from has have how i in is it me
+of on or tell that the their there this to was what when where which who why
+with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords ("LSE" -> "lse", "1826" kept)"""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over the same chunks stored in Chroma.
+    Catches exact entity matches (acronyms, names, years) that dense
+    similarity tends to miss.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._documents: Dict[str, Tuple[str, Dict]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict] = None):
+        with self._lock:
+            if doc_id in self._doc_lengths:
+                self.remove(doc_id)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            length = sum(counts.values())
+            self._doc_lengths[doc_id] = length
+            self._documents[doc_id] = (text, metadata or {})
+            self._total_length += length
+
+    def add_many(self, ids: List[str], texts: List[str], metadatas: Optional[List[Dict]] = None):
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                self.add(doc_id, text, metadata)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            if doc_id not in self._doc_lengths:
+                return
+            text, _ = self._documents.pop(doc_id)
+            for term in set(tokenize(text)):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_lengths.clear()
+            self._documents.clear()
+            self._total_length = 0
+
+    def get(self, doc_id: str) -> Optional[Tuple[str, Dict]]:
+        return self._documents.get(doc_id)
+
+    def has_terms(self, query: str) -> bool:
+        """True if any query term occurs in the index"""
+        return any(term in self._postings for term in tokenize(query))
+
+    def search(self, query: str, n_results: int = 8,
+               where: Optional[Dict] = None) -> List[Tuple[str, float]]:
+        """Return (doc_id, score) pairs, best first. `where` matches metadata equality."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_lengths)
+            if n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+
+            scores: Dict[str, float] = {}
+            for term in set(terms):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if where:
+                scores = {
+                    doc_id: score for doc_id, score in scores.items()
+                    if all(self._documents[doc_id][1].get(k) == v for k, v in where.items())
+                }
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Fuse several best-first id rankings into one (RRF)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
@@ -0,0 +1,118 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for use as a cache key"""
+    return _WHITESPACE_RE.sub(' ', text).strip().lower()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with optional TTL and hit/miss counters"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+class DjangoCacheBackend:
+    """
+    Cache backend on Django's cache framework, so hits are shared between
+    workers when a shared cache (Redis, Memcached, database) is configured.
+    """
+
+    def __init__(self, alias: str = 'default', timeout: Optional[float] = 300,
+                 key_prefix: str = 'chatbot'):
+        from django.core.cache import caches
+
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key) -> str:
+        return f"{self.key_prefix}:{key}"
+
+    def get(self, key, default=None) -> Any:
+        value = self.cache.get(self._key(key))
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.cache.set(self._key(key), value, timeout=self.timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'backend': 'django',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+def create_cache(backend: str, max_size: int = 1024, ttl: Optional[float] = None, **kwargs):
+    """Build a cache by backend name: 'local', 'django' or 'none'"""
+    if backend == 'none':
+        return None
+    if backend == 'django':
+        return DjangoCacheBackend(timeout=ttl, **kwargs)
+    if backend == 'local':
+        return LRUCache(max_size=max_size, ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
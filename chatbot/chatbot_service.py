@@ -1,182 +1,20 @@
+import hashlib
+import logging
 import os
-import re
+import time
 from dotenv import load_dotenv
 
-load_dotenv()
-
-
-class ChatbotService:
-    def __init__(self, rag_service):
-        self.rag_service = rag_service
-        print("✅ Chatbot initialized in FREE mode (no API required)")
-        print("💡 Responses will be structured and informative")
-
-    def _clean_text(self, text: str) -> str:
-        """Remove citation links and clean text"""
-        try:
-            # Remove citation numbers like [1], [2], [183]
-            text = re.sub(r'\[\d+\]', '', text)
-
-            # Remove escaped citation brackets like [\[183\]]
-            text = re.sub(r'\[\\?\[\\?\d+\\?\]\\?\]', '', text)
-
-            # Remove Wikipedia editorial markers like [citation needed], [self-published source], etc.
-            text = re.sub(r'\[\\?_\[?[^\]]+_?\\?\]\\?\]', '', text)
-            text = re.sub(r'\(_\[[^\]]+\]_?\)', '', text)
-            text = re.sub(r'\[_[^\]]+_\]', '', text)
-
-            # Remove Wikipedia tags like [update], [clarification needed], etc.
-            text = re.sub(r'\[\\?update\\?\]', '', text)
-            text = re.sub(r'\[\\?needs update\\?\]', '', text)
-            text = re.sub(r'\[\\?clarification needed\\?\]', '', text)
-            text = re.sub(r'\[\\?citation needed\\?\]', '', text)
-            text = re.sub(r'\[\\?failed verification\\?\]', '', text)
-            text = re.sub(r'\[\\?when\?\\?\]', '', text)
-            text = re.sub(r'\[\\?who\?\\?\]', '', text)
-            text = re.sub(r'\[\\?which\?\\?\]', '', text)
-
-            # Remove any remaining [word] patterns (Wikipedia tags)
-            text = re.sub(r'\[\\?[a-zA-Z\s]+\\?\]', '', text)
-
-            # Remove standalone _] or _[
-            text = re.sub(r'_\\?\]', '', text)
-            text = re.sub(r'\\?\[_', '', text)
-
-            # Remove backslashes and underscores (but keep normal brackets and parentheses)
-            text = re.sub(r'\\', '', text)  # Remove all backslashes
-            text = re.sub(r'_', '', text)  # Remove all underscores
-
-            # Remove any remaining escaped brackets
-            text = re.sub(r'\[\\?\]', '', text)
-
-            # Remove URLs
-            text = re.sub(r'https?://[^\s]+', '', text)
-            text = re.sub(r'www\.[^\s]+', '', text)
-            text = re.sub(r'org/wiki/[^\s\)]+', '', text)
-
-            # Remove citation markers like #cite_note-211
-            text = re.sub(r'#cite[^\s\)]+', '', text)
-
-            # Remove empty parentheses and brackets left after removing citations
-            text = re.sub(r'\(\s*\)', '', text)
-            text = re.sub(r'\[\s*\]', '', text)
-
-            # Remove multiple spaces
-            text = re.sub(r'\s+', ' ', text)
-
-            # Remove spaces before punctuation
-            text = re.sub(r'\s+([.,;:!?])', r'\1', text)
-
-            return text.strip()
-        except Exception as e:
-            print(f"Error cleaning text: {e}")
-            return text
-
-    def _is_education_related(self, query: str) -> bool:
-        """Check if query is about UK universities/education - with fuzzy matching for spelling mistakes"""
-        try:
-            education_keywords = [
-                'university', 'universities', 'college', 'oxford', 'cambridge',
-                'student', 'admission', 'ucas', 'degree', 'tuition', 'fee',
-                'russell group', 'redbrick', 'accommodation', 'campus',
-                'undergraduate', 'postgraduate', 'phd', 'master', 'bachelor',
-                'lecture', 'semester', 'academic', 'education', 'study',
-                'scholarship', 'student loan', 'uk education', 'british university',
-                'imperial', 'lse', 'ucl', 'edinburgh', 'manchester', 'warwick',
-                'course', 'program', 'programme', 'faculty', 'department', 'school',
-                'a-level', 'gcse', 'btec', 'foundation', 'clearing',
-                'student visa', 'international student', 'home student',
-                'halls', 'library', 'dissertation', 'thesis',
-                'exam', 'assessment', 'grade', 'gpa', 'transcript',
-                # More UK universities
-                'durham', 'bristol', 'nottingham', 'leeds', 'liverpool',
-                'birmingham', 'glasgow', 'exeter', 'york', 'bath',
-                'st andrews', 'kings college', 'queen mary', 'southampton',
-                'newcastle', 'cardiff', 'sheffield', 'leicester',
-                # University types
-                'ancient', 'plate glass', 'civic', 'new university',
-                'russell', 'group of universities'
-            ]
-
-            query_lower = query.lower()
+from chatbot.caching import normalize_query
+from chatbot.intent import KeywordIntentClassifier
+from chatbot.metrics import STAGE_SECONDS, timed
+from chatbot.text_cleaner import clean_text
 
-            # First check exact matches
-            if any(keyword in query_lower for keyword in education_keywords):
-                return True
-
-            # If no exact match, try fuzzy matching for spelling mistakes
-            query_words = query_lower.split()
-            for word in query_words:
-                # Only check words longer than 3 characters
-                if len(word) <= 3:
-                    continue
-
-                for keyword in education_keywords:
-                    # Only fuzzy match single-word keywords
-                    if ' ' in keyword:
-                        continue
-
-                    # Calculate similarity
-                    if self._is_similar(word, keyword):
-                        print(f"🔍 Fuzzy match: '{word}' matched with '{keyword}'")
-                        return True
-
-            return False
-
-        except Exception as e:
-            print(f"Error checking if education related: {e}")
-            return False
-
-    def _is_similar(self, word1: str, word2: str, threshold: int = 2) -> bool:
-        """Check if two words are similar using Levenshtein distance (allows typos)"""
-        # If lengths differ by more than threshold, not similar
-        if abs(len(word1) - len(word2)) > threshold:
-            return False
-
-        # Calculate Levenshtein distance (edit distance)
-        distance = self._levenshtein_distance(word1, word2)
-
-        # Allow up to 2 character differences for words 5+ chars
-        # Allow 1 character difference for words 4 chars
-        max_distance = 2 if len(word2) >= 5 else 1
-
-        return distance <= max_distance
-
-    def _levenshtein_distance(self, s1: str, s2: str) -> int:
-        """Calculate Levenshtein distance between two strings"""
-        if len(s1) < len(s2):
-            return self._levenshtein_distance(s2, s1)
-
-        if len(s2) == 0:
-            return len(s1)
-
-        previous_row = range(len(s2) + 1)
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                # Cost of insertions, deletions, or substitutions
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-
-        return previous_row[-1]
-
-    def get_response(self, user_query):
-        """Get response - 100% FREE, no API needed"""
+load_dotenv()
 
-        try:
-            print(f"📝 Processing query: {user_query[:50]}...")
+logger = logging.getLogger(__name__)
 
-            # Check if question is education-related
-            is_education = self._is_education_related(user_query)
-            print(f"🎓 Is education-related: {is_education}")
 
-            if not is_education:
-                # NOT education-related - decline politely
-                print("❌ Non-education question - returning decline message")
-                return """🎓 **UK Universities Information Bot**
+DECLINE_RESPONSE = """🎓 **UK Universities Information Bot**
 
 I specialize in providing information about UK universities and higher education.
 
@@ -201,14 +39,7 @@ I specialize in providing information about UK universities and higher education
 • "Student accommodation in UK universities"
 """
 
-            # Education question - search knowledge base
-            print("🔍 Searching knowledge base...")
-            relevant_docs = self.rag_service.search(user_query, n_results=8)
-            print(f"📚 Found {len(relevant_docs)} relevant documents")
-
-            if not relevant_docs or len(relevant_docs) == 0:
-                print("⚠️ No relevant documents found")
-                return """I don't have specific information about that topic in my knowledge base.
+NO_INFORMATION_RESPONSE = """I don't have specific information about that topic in my knowledge base.
 
 **I can help with:**
 • UK university information
@@ -225,21 +56,7 @@ I specialize in providing information about UK universities and higher education
 
 Please try rephrasing your question or ask about a specific UK university!"""
 
-            # Clean documents
-            print("🧹 Cleaning documents...")
-            cleaned_docs = [self._clean_text(doc) for doc in relevant_docs]
-
-            # Generate FREE mode response
-            print("✅ Generating response...")
-            return self._generate_response(user_query, cleaned_docs)
-
-        except Exception as e:
-            # Log the full error
-            import traceback
-            print(f"❌ ERROR in get_response: {str(e)}")
-            print(traceback.format_exc())
-
-            return """Sorry, I encountered an error processing your question.
+ERROR_RESPONSE = """Sorry, I encountered an error processing your question.
 
 **Please try:**
 • Rephrasing your question
@@ -253,58 +70,311 @@ Please try rephrasing your question or ask about a specific UK university!"""
 
 If the problem persists, please contact support."""
 
-    def _generate_response(self, user_query, cleaned_docs):
-        """Generate conversational, ChatGPT-style response from knowledge base"""
 
+TOPIC_GATES = ('keyword', 'embedding')
+
+
+class ChatbotService:
+    def __init__(self, rag_service, response_cache=None, topic_gate: str = 'keyword',
+                 topic_threshold: float = 0.3):
+        self.rag_service = rag_service
+        # Any object with get(key)/set(key, value), e.g. LRUCache or DjangoCacheBackend
+        self.response_cache = response_cache
+        # Precomputed keyword automaton + typo index (built once per process)
+        self.intent_classifier = KeywordIntentClassifier()
+
+        # 'keyword' gate, or 'embedding': compare the query vector (reused for retrieval)
+        # with the corpus centroid. Selectable for A/B comparison.
+        if topic_gate not in TOPIC_GATES:
+            raise ValueError(f"topic_gate must be one of {TOPIC_GATES}")
+        self.topic_gate = topic_gate
+        self.topic_threshold = topic_threshold
+        self.gate_stats = {'accepted': 0, 'declined': 0}
+        logger.info("Chatbot initialized in FREE mode (no API required), topic gate: %s", topic_gate)
+
+    def _clean_text(self, text: str) -> str:
+        """Remove citation links and clean text"""
         try:
-            print("📝 Building conversational response...")
-
-            # Extract sentences from documents
-            all_sentences = []
-            for doc in cleaned_docs[:8]:  # Use top 8 documents for more content
-                sentences = doc.split('.')
-                for sent in sentences:
-                    sent = sent.strip()
-                    if len(sent) > 50:
-                        all_sentences.append(sent)
-
-            print(f"📄 Extracted {len(all_sentences)} sentences")
-
-            # Remove duplicates while preserving order
-            seen = set()
-            unique_sentences = []
-            for sent in all_sentences:
-                sent_lower = sent.lower()
-                if sent_lower not in seen and len(sent) > 50:
-                    seen.add(sent_lower)
-                    unique_sentences.append(sent)
-                    if len(unique_sentences) >= 12:  # Get more sentences for better answers
-                        break
-
-            print(f"✅ {len(unique_sentences)} unique sentences")
+            return clean_text(text)
+        except Exception as e:
+            logger.error("Error cleaning text: %s", e)
+            return text
 
-            if len(unique_sentences) == 0:
-                return "I don't have specific information about that in my knowledge base. Could you try rephrasing your question or ask about a specific UK university?"
+    def _is_education_related(self, query: str) -> bool:
+        """Check if query is about UK universities/education - with fuzzy matching for spelling mistakes"""
+        try:
+            is_education, keyword, fuzzy = self.intent_classifier.classify(query)
+            if fuzzy:
+                logger.debug("Fuzzy match: matched with '%s'", keyword)
+            return is_education
+
+        except Exception as e:
+            logger.error("Error checking if education related: %s", e)
+            return False
+
+    def _is_on_topic_embedding(self, query: str, query_embedding) -> bool:
+        """Embedding gate: similarity to the UK higher education corpus centroid"""
+        similarity = self.rag_service.topic_similarity(query_embedding)
+        if similarity is None:
+            # Empty knowledge base - nothing to compare against
+            return self._is_education_related(query)
+        logger.debug("Topic similarity: %.3f (threshold %s)", similarity, self.topic_threshold)
+        return similarity >= self.topic_threshold
+
+    def _response_cache_key(self, user_query: str):
+        """
+        Cache key from the normalized query and the knowledge base version,
+        or None while the version is unknown (such responses are not cached)
+        """
+        corpus_version = getattr(self.rag_service, 'corpus_version', '0')
+        if corpus_version is None:
+            return None
+        query_hash = hashlib.sha1(normalize_query(user_query).encode('utf-8')).hexdigest()
+        return f"response:{self.topic_gate}:{corpus_version}:{query_hash}"
+
+    def get_cache_stats(self):
+        """Response cache hit/miss counters (None when caching is disabled)"""
+        return self.response_cache.stats() if self.response_cache is not None else None
+
+    def get_gate_stats(self):
+        """Topic gate decisions, for comparing the keyword and embedding gates"""
+        return {'gate': self.topic_gate, 'threshold': self.topic_threshold, **self.gate_stats}
+
+    def get_response(self, user_query):
+        """Get response - 100% FREE, no API needed"""
+
+        try:
+            logger.debug("Processing query: %s", user_query[:50])
+
+            cache_key, cached = self._get_cached_response(user_query)
+            if cached is not None:
+                return cached
+
+            response = self._answer(user_query)
+
+            self._set_cached_response(cache_key, response)
+            return response
+
+        except Exception as e:
+            return self._error_response(e)
+
+    async def aget_response(self, user_query):
+        """Async get_response: retrieval runs on the RAG service's bounded executor"""
 
-            # Build natural, conversational response like ChatGPT/Gemini
-            response = self._create_conversational_response(user_query, unique_sentences)
+        try:
+            logger.debug("Processing query: %s", user_query[:50])
+
+            cache_key, cached = self._get_cached_response(user_query)
+            if cached is not None:
+                return cached
+
+            # The embedding gate's query vector is reused for retrieval
+            query_embedding = None
+            if self.topic_gate == 'embedding':
+                query_embedding = await self.rag_service.aembed_query(user_query)
+
+            declined = self._check_topic(user_query, query_embedding)
+            if declined is not None:
+                response = declined
+            else:
+                logger.debug("Searching knowledge base...")
+                relevant_docs = await self.rag_service.asearch_documents(
+                    user_query, n_results=8, query_embedding=query_embedding
+                )
+                response = self._answer_from_documents(user_query, relevant_docs)
 
-            print("✅ Conversational response generated")
+            self._set_cached_response(cache_key, response)
             return response
 
         except Exception as e:
-            import traceback
-            print(f"❌ ERROR in _generate_response: {str(e)}")
-            print(traceback.format_exc())
+            return self._error_response(e)
+
+    async def astream_response(self, user_query):
+        """
+        Async generator of response pieces for streaming (SSE). The first
+        paragraph is sent as soon as retrieval finishes; the full response
+        is cached exactly like get_response().
+        """
+        try:
+            logger.debug("Streaming query: %s", user_query[:50])
+
+            cache_key, cached = self._get_cached_response(user_query)
+            if cached is not None:
+                yield cached
+                return
+
+            query_embedding = None
+            if self.topic_gate == 'embedding':
+                query_embedding = await self.rag_service.aembed_query(user_query)
+
+            declined = self._check_topic(user_query, query_embedding)
+            if declined is not None:
+                paragraphs = [declined]
+            else:
+                logger.debug("Searching knowledge base...")
+                relevant_docs = await self.rag_service.asearch_documents(
+                    user_query, n_results=8, query_embedding=query_embedding
+                )
+                paragraphs = self._iter_answer_from_documents(user_query, relevant_docs)
+
+            sent = []
+            for paragraph in paragraphs:
+                sent.append(paragraph)
+                yield paragraph
+
+            self._set_cached_response(cache_key, ''.join(sent))
+
+        except Exception as e:
+            yield self._error_response(e)
+
+    def _get_cached_response(self, user_query):
+        """Return (cache_key, cached response or None)"""
+        if self.response_cache is None:
+            return None, None
+        cache_key = self._response_cache_key(user_query)
+        if cache_key is None:
+            return None, None
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Response cache hit")
+        return cache_key, cached
+
+    def _set_cached_response(self, cache_key, response):
+        if cache_key is not None:
+            self.response_cache.set(cache_key, response)
+
+    def _error_response(self, error):
+        # Log the full error (called from except blocks, so the traceback is available)
+        logger.exception("ERROR in get_response: %s", error)
+
+        return ERROR_RESPONSE
+
+    def _answer(self, user_query):
+        """Build the answer for a query (deterministic for a given knowledge base)"""
+        # The embedding gate's query vector is reused for retrieval
+        query_embedding = None
+        if self.topic_gate == 'embedding':
+            query_embedding = self.rag_service.embed_query(user_query)
+
+        declined = self._check_topic(user_query, query_embedding)
+        if declined is not None:
+            return declined
+
+        # Education question - search knowledge base
+        logger.debug("Searching knowledge base...")
+        relevant_docs = self.rag_service.search_documents(
+            user_query, n_results=8, query_embedding=query_embedding
+        )
+        return self._answer_from_documents(user_query, relevant_docs)
+
+    def _check_topic(self, user_query, query_embedding=None):
+        """Return the decline message for non-education queries, else None"""
+        # Check if question is education-related
+        with timed('intent_gate'):
+            if query_embedding is not None:
+                is_education = self._is_on_topic_embedding(user_query, query_embedding)
+            else:
+                is_education = self._is_education_related(user_query)
+        logger.debug("Is education-related: %s", is_education)
+        self.gate_stats['accepted' if is_education else 'declined'] += 1
+
+        if not is_education:
+            # NOT education-related - decline politely
+            logger.debug("Non-education question - returning decline message")
+            return DECLINE_RESPONSE
+        return None
+
+    def _answer_from_documents(self, user_query, relevant_docs):
+        """Turn retrieved {'content', 'metadata'} documents into a response"""
+        return ''.join(self._iter_answer_from_documents(user_query, relevant_docs))
+
+    def _iter_answer_from_documents(self, user_query, relevant_docs):
+        """Like _answer_from_documents(), yielding the response paragraph by paragraph"""
+        logger.debug("Found %d relevant documents", len(relevant_docs))
+
+        if not relevant_docs or len(relevant_docs) == 0:
+            logger.info("No relevant documents found for: %s", user_query[:50])
+            yield NO_INFORMATION_RESPONSE
+            return
+
+        # Clean documents (chunks cleaned at ingestion are used as-is)
+        with timed('cleaning'):
+            cleaned_docs = [
+                doc['content'] if doc['metadata'].get('cleaned') else self._clean_text(doc['content'])
+                for doc in relevant_docs
+            ]
+
+        # Generate FREE mode response
+        yield from self._iter_generated_response(user_query, cleaned_docs)
+
+    def _generate_response(self, user_query, cleaned_docs):
+        """Generate conversational, ChatGPT-style response from knowledge base"""
+        return ''.join(self._iter_generated_response(user_query, cleaned_docs))
+
+    def _iter_generated_response(self, user_query, cleaned_docs):
+        """Like _generate_response(), yielding each paragraph as soon as it is assembled"""
+
+        yielded = False
+        try:
+            with timed('sentence_extraction'):
+                # Extract sentences from documents
+                all_sentences = []
+                for doc in cleaned_docs[:8]:  # Use top 8 documents for more content
+                    sentences = doc.split('.')
+                    for sent in sentences:
+                        sent = sent.strip()
+                        if len(sent) > 50:
+                            all_sentences.append(sent)
+
+                # Remove duplicates while preserving order
+                seen = set()
+                unique_sentences = []
+                for sent in all_sentences:
+                    sent_lower = sent.lower()
+                    if sent_lower not in seen and len(sent) > 50:
+                        seen.add(sent_lower)
+                        unique_sentences.append(sent)
+                        if len(unique_sentences) >= 12:  # Get more sentences for better answers
+                            break
+
+            logger.debug("Extracted %d sentences, %d unique", len(all_sentences), len(unique_sentences))
+
+            if len(unique_sentences) == 0:
+                yield "I don't have specific information about that in my knowledge base. Could you try rephrasing your question or ask about a specific UK university?"
+                return
+
+            # Build natural, conversational response like ChatGPT/Gemini; the time spent
+            # assembling (not the time the consumer holds each paragraph) is the stage
+            paragraphs = self._iter_conversational_response(user_query, unique_sentences)
+            assembly_seconds = 0.0
+            while True:
+                start = time.perf_counter()
+                paragraph = next(paragraphs, None)
+                assembly_seconds += time.perf_counter() - start
+                if paragraph is None:
+                    break
+                yielded = True
+                yield paragraph
+            STAGE_SECONDS.observe(assembly_seconds, stage='response_assembly')
+
+        except Exception as e:
+            logger.exception("ERROR in _generate_response: %s", e)
+            if yielded:
+                # Part of the answer has been sent; end it there
+                return
 
             # Fallback
             if cleaned_docs and len(cleaned_docs) > 0:
-                return cleaned_docs[0][:500] + "..."
+                yield cleaned_docs[0][:500] + "..."
             else:
-                return "I couldn't generate a proper response. Please try asking your question differently."
+                yield "I couldn't generate a proper response. Please try asking your question differently."
 
     def _create_conversational_response(self, query, sentences):
         """Create a natural, flowing response like ChatGPT/Gemini"""
+        return ''.join(self._iter_conversational_response(query, sentences))
+
+    def _iter_conversational_response(self, query, sentences):
+        """Yield the conversational response one paragraph at a time"""
 
         # Determine query type and create appropriate intro
         query_lower = query.lower()
@@ -313,35 +383,38 @@ If the problem persists, please contact support."""
         if any(word in query_lower for word in ['what is', 'what are', 'what\'s']):
             # Definitional question
             intro = sentences[0] if len(sentences) > 0 else ""
-            response = f"{intro}."
+            yield f"{intro}."
         elif any(word in query_lower for word in ['tell me about', 'tell about', 'info about', 'information about']):
             # General information request
-            response = f"{sentences[0]}." if len(sentences) > 0 else ""
+            yield f"{sentences[0]}." if len(sentences) > 0 else ""
         elif any(word in query_lower for word in ['how', 'why', 'when', 'where', 'who']):
             # Specific question
-            response = f"{sentences[0]}." if len(sentences) > 0 else ""
+            yield f"{sentences[0]}." if len(sentences) > 0 else ""
         else:
             # General query
-            response = f"{sentences[0]}." if len(sentences) > 0 else ""
+            yield f"{sentences[0]}." if len(sentences) > 0 else ""
 
         # Add supporting details in natural paragraphs
         if len(sentences) >= 4:
             # Second paragraph - add 2-3 supporting sentences
-            response += f"\n\n{sentences[1]}. {sentences[2]}."
+            paragraph = f"\n\n{sentences[1]}. {sentences[2]}."
             if len(sentences) > 3:
-                response += f" {sentences[3]}."
+                paragraph += f" {sentences[3]}."
+            yield paragraph
 
         if len(sentences) >= 7:
             # Third paragraph - add more context
-            response += f"\n\n{sentences[4]}. {sentences[5]}."
+            paragraph = f"\n\n{sentences[4]}. {sentences[5]}."
             if len(sentences) > 6:
-                response += f" {sentences[6]}."
+                paragraph += f" {sentences[6]}."
+            yield paragraph
 
         if len(sentences) >= 10:
             # Fourth paragraph - additional details
-            response += f"\n\n{sentences[7]}. {sentences[8]}."
+            paragraph = f"\n\n{sentences[7]}. {sentences[8]}."
             if len(sentences) > 9:
-                response += f" {sentences[9]}."
+                paragraph += f" {sentences[9]}."
+            yield paragraph
 
         # Add a natural closing if we have enough content
         if len(sentences) >= 6:
@@ -354,6 +427,4 @@ If the problem persists, please contact support."""
             ]
             # Pick based on query length to add variety
             closing_index = len(query) % len(closing_phrases)
-            response += closing_phrases[closing_index]
-
-        return response
\ No newline at end of file
+            yield closing_phrases[closing_index]
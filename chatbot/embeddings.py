@@ -0,0 +1,187 @@
+import logging
+import math
+import platform
+import threading
+from typing import List, Optional
+
+from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# 'torch': full-precision PyTorch. 'torch-int8': PyTorch with int8 dynamic quantization of
+# the Linear layers. 'onnx' / 'onnx-int8': ONNX Runtime with the fp32 or pre-quantized int8
+# export that sentence-transformers model repos ship (needs sentence-transformers[onnx]).
+EMBEDDING_BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+
+logger = logging.getLogger(__name__)
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _cpu_flags() -> str:
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _onnx_int8_file() -> str:
+    """The pre-quantized ONNX export that suits this CPU"""
+    if platform.machine().lower() in ('arm64', 'aarch64'):
+        return 'onnx/model_qint8_arm64.onnx'
+    flags = _cpu_flags()
+    if 'avx512_vnni' in flags:
+        return 'onnx/model_qint8_avx512_vnni.onnx'
+    if 'avx512' in flags:
+        return 'onnx/model_qint8_avx512.onnx'
+    return 'onnx/model_quint8_avx2.onnx'
+
+
+def load_model(model_name: str = DEFAULT_MODEL_NAME, backend: str = 'torch', threads: int = 0) -> SentenceTransformer:
+    """
+    Load model_name for one of EMBEDDING_BACKENDS; all of them expose
+    SentenceTransformer.encode. threads > 0 caps ONNX Runtime's intra-op
+    threads (PyTorch's are set per process, see gunicorn.conf.py).
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"embedding backend must be one of {EMBEDDING_BACKENDS}")
+
+    if backend == 'torch':
+        return SentenceTransformer(model_name)
+
+    if backend == 'torch-int8':
+        import torch
+        if platform.machine().lower() in ('arm64', 'aarch64'):
+            torch.backends.quantized.engine = 'qnnpack'
+        model = SentenceTransformer(model_name, device='cpu')
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    model_kwargs = {'file_name': _onnx_int8_file()} if backend == 'onnx-int8' else {}
+    try:
+        if threads > 0:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            # With one thread the session keeps no thread pool, so it stays usable after fork()
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+            model_kwargs['session_options'] = options
+        return SentenceTransformer(model_name, backend='onnx', model_kwargs=model_kwargs)
+    except (ImportError, TypeError) as e:
+        # TypeError: sentence-transformers older than 3.2 has no backend argument
+        raise ImportError(
+            f"The {backend} embedding backend needs sentence-transformers>=3.2 with ONNX Runtime: "
+            f"pip install 'sentence-transformers[onnx]' ({e})"
+        ) from e
+
+
+def get_shared_model(model_name: str = DEFAULT_MODEL_NAME, backend: str = 'torch',
+                     threads: int = 0) -> SentenceTransformer:
+    """Return the process-wide model for (model_name, backend), loading it once"""
+    key = (model_name, backend)
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                logger.info("Loading embedding model %s (%s backend)...", model_name, backend)
+                model = load_model(model_name, backend, threads)
+                _models[key] = model
+    return model
+
+
+class SharedEmbeddingFunction:
+    """
+    Chroma embedding function backed by the shared SentenceTransformer.
+    Used for both indexing and querying so each worker holds one model.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = 32, backend: str = 'torch',
+                 threads: int = 0):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"embedding backend must be one of {EMBEDDING_BACKENDS}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.backend = backend
+        self.threads = threads
+        self._model: Optional[SentenceTransformer] = None
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vectors this function produces (other backends differ slightly)"""
+        return self.model_name if self.backend == 'torch' else f"{self.model_name}@{self.backend}"
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            self._model = get_shared_model(self.model_name, self.backend, self.threads)
+        return self._model
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.embed_documents(input)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of documents"""
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self.embed_documents([text])[0]
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class RunningCentroid:
+    """Mean of a changing set of vectors, updated as vectors are added/removed"""
+
+    def __init__(self):
+        self._sum: Optional[List[float]] = None
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, vectors):
+        with self._lock:
+            for vector in vectors:
+                if self._sum is None:
+                    self._sum = [0.0] * len(vector)
+                self._sum = [total + float(x) for total, x in zip(self._sum, vector)]
+                self.count += 1
+
+    def remove(self, vectors):
+        with self._lock:
+            for vector in vectors:
+                if self._sum is None or self.count == 0:
+                    return
+                self._sum = [total - float(x) for total, x in zip(self._sum, vector)]
+                self.count -= 1
+            if self.count == 0:
+                self._sum = None
+
+    def clear(self):
+        with self._lock:
+            self._sum = None
+            self.count = 0
+
+    def similarity(self, vector: List[float]) -> Optional[float]:
+        """Cosine similarity to the centroid (None while empty)"""
+        centroid_sum = self._sum
+        if centroid_sum is None:
+            return None
+        # Cosine is scale-invariant, so the sum works as well as the mean
+        return cosine_similarity(vector, centroid_sum)
@@ -1,46 +1,287 @@
+import asyncio
 import chromadb
-from sentence_transformers import SentenceTransformer
+from chatbot.bm25 import BM25Index, reciprocal_rank_fusion
+from chatbot.caching import LRUCache, normalize_query
+from chatbot.embeddings import SharedEmbeddingFunction, RunningCentroid, DEFAULT_MODEL_NAME
 from chatbot.firecrawl_service import FirecrawlService
+from chatbot.metrics import timed
+from chatbot.query_batcher import QueryBatcher
+from chatbot.rate_limit import HostRateLimiter
+from chatbot.scrape_cache import ScrapeCache
+from chatbot.text_cleaner import clean_text
+import hashlib
+import json
+import logging
+import os
+import functools
 import re
-from typing import List, Dict, Optional
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Iterable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process lock, so one process should own a persistent store
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when cleaning or chunking logic changes so persisted stores re-index
+CHUNKING_VERSION = 3
+
+SEARCH_MODES = ('vector', 'lexical', 'hybrid', 'auto')
+# Used by the Django app as well, unless CHATBOT_SEARCH_MODE overrides it
+DEFAULT_SEARCH_MODE = 'auto'
+
+# Seconds a replaced collection is kept for other processes sharing the store to move off it
+RETIRED_COLLECTION_GRACE = 300.0
+
+# Firecrawl crawl states after which no more pages will arrive
+CRAWL_FINISHED_STATES = ('completed', 'failed', 'cancelled')
+
+# Short entity-style queries: acronyms like LSE/UCL or years like 1826
+_ENTITY_TOKEN_RE = re.compile(r'\b(?:[A-Z]{2,6}|\d{4})\b')
+
+
+class _ReadWriteLock:
+    """Many concurrent readers or one writer; a waiting writer holds off new readers"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writer or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class _ActiveIndex:
+    """A Chroma collection with its BM25 index and topic centroid, swapped as one unit"""
+
+    def __init__(self, collection, lexical_index: BM25Index, topic_centroid: RunningCentroid):
+        self.collection = collection
+        self.lexical_index = lexical_index
+        self.topic_centroid = topic_centroid
+
+
+class _PageProgress:
+    """Sums per-page (processed, total) progress from the ingest pool into one callback"""
+
+    def __init__(self, callback: Optional[Callable[[int, int], None]]):
+        self.callback = callback
+        self._processed: List[int] = []
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def add_page(self, n_chunks: int) -> Optional[Callable[[int, int], None]]:
+        """Register a page of n_chunks and return its progress callback"""
+        if self.callback is None:
+            return None
+        with self._lock:
+            index = len(self._processed)
+            self._processed.append(0)
+            self._total += n_chunks
+
+        def update(processed: int, total: int):
+            # Report under the lock so totals never go backwards
+            with self._lock:
+                self._processed[index] = processed
+                self.callback(sum(self._processed), self._total)
+
+        return update
 
 
 class EnhancedRAGService:
-    def __init__(self, data_file_path, collection_name="enhanced_knowledge_base"):
+    def __init__(self, data_file_path, collection_name="enhanced_knowledge_base",
+                 persist_directory: Optional[str] = None, chunk_size: int = 400,
+                 embedding_model: str = DEFAULT_MODEL_NAME, embedding_backend: str = 'torch',
+                 embedding_threads: int = 0,
+                 query_cache_size: int = 2048, query_cache_ttl: Optional[float] = None,
+                 embed_batch_size: int = 64, ingest_workers: int = 1,
+                 search_mode: str = DEFAULT_SEARCH_MODE, search_workers: int = 4,
+                 batch_window_ms: float = 0.0, batch_max_size: int = 16,
+                 scrape_workers: int = 4, scrape_host_interval: float = 1.0,
+                 search_cache_size: int = 256, search_cache_ttl: Optional[float] = 3600.0,
+                 scrape_cache_dir: Optional[str] = None, scrape_cache_ttl: Optional[float] = 86400.0,
+                 firecrawl=None):
         self.data_file = data_file_path
         self.collection_name = collection_name
-
-        # Use in-memory client for FASTER performance
-        print("⚡ Initializing ChromaDB (Pro Mode)...")
-        self.client = chromadb.Client()
-
+        self.persist_directory = persist_directory
+        self.chunk_size = chunk_size
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"search_mode must be one of {SEARCH_MODES}")
+        self.search_mode = search_mode
+        self.embed_batch_size = embed_batch_size
+        self.ingest_workers = max(1, ingest_workers)
+        self._ingest_executor = None
+        # Bounded pool for async callers: embedding + vector search off the event loop
+        self.search_workers = max(1, search_workers)
+        self._search_executor = None
+        # Search-and-add: concurrent scrapes, politely spaced per host
+        self.scrape_workers = max(1, scrape_workers)
+        self._scrape_executor = None
+        self.scrape_rate_limiter = HostRateLimiter(scrape_host_interval)
+
+        # Optional micro-batching: concurrent vector searches share one forward pass and query
+        self.query_batcher = None
+        if batch_window_ms > 0:
+            self.query_batcher = QueryBatcher(
+                self._vector_search_batch, window_ms=batch_window_ms, max_batch=batch_max_size
+            )
+        self._ingest_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        # Reloads and clearing run one at a time; searches hold the read side of the swap
+        # lock while they use a collection, so reloads can swap in a fresh one and drop
+        # the old one without disturbing queries in flight
+        self._writer_lock = threading.RLock()
+        self._swap_lock = _ReadWriteLock()
+        # Web pages are upserted in place, each under the read side of this lock; reloads
+        # and clearing take the write side, so they run between pages, not mid-page
+        self._upsert_lock = _ReadWriteLock()
+
+        # One explicit embedding function (and one model) for indexing and querying
+        self.embedding_function = SharedEmbeddingFunction(embedding_model, backend=embedding_backend,
+                                                          threads=embedding_threads)
+
+        # Repeated questions reuse their query vector instead of re-embedding
+        self.query_cache = LRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        # Web search hits per query, so repeated search-and-adds skip the search call
+        self.search_cache = LRUCache(max_size=search_cache_size, ttl=search_cache_ttl)
+        # Scraped pages on disk: fresh pages skip Firecrawl, unchanged ones skip re-indexing
+        self.scrape_cache = ScrapeCache(scrape_cache_dir, ttl=scrape_cache_ttl) if scrape_cache_dir else None
+
+        # Replaced on every knowledge base change so response caches invalidate. A persistent
+        # store keeps it in a file, so it survives restarts and all workers agree on it
+        self._corpus_version = uuid.uuid4().hex[:16]
+        self._version_mtime = None
+        # The stored version this process's indexes reflect (see _follow_store)
+        self._synced_version = None
+        self._follow_lock = threading.Lock()
+
+        if persist_directory:
+            # Persistent store survives restarts - unchanged corpora skip re-embedding
+            logger.info("Initializing ChromaDB (persistent: %s)...", persist_directory)
+            os.makedirs(persist_directory, exist_ok=True)
+            self.client = chromadb.PersistentClient(path=persist_directory)
+        else:
+            # Use in-memory client for FASTER performance
+            logger.info("Initializing ChromaDB (Pro Mode)...")
+            self.client = chromadb.Client()
+
+        # Reloads build a new collection and swap it in, so the active name lives in the state file
+        active_name = self._load_state().get('collection') or collection_name
         try:
-            self.collection = self.client.get_collection(name=collection_name)
-            print(f"✅ Loaded existing collection: {collection_name}")
+            collection = self.client.get_collection(
+                name=active_name,
+                embedding_function=self.embedding_function
+            )
+            logger.info("Loaded existing collection: %s", active_name)
         except:
-            self.collection = self.client.create_collection(
+            collection = self.client.create_collection(
                 name=collection_name,
-                metadata={"hnsw:space": "cosine"}
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=self.embedding_function
             )
-            print(f"✅ Created new collection: {collection_name}")
+            logger.info("Created new collection: %s", collection_name)
+        self._active = _ActiveIndex(collection, BM25Index(), RunningCentroid())
+        self._drop_stale_collections()
 
-        # Use faster embedding model
-        print("⚡ Loading embedding model...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("✅ Ready for ChatGPT Pro-style responses!")
+        # Load the shared embedding model up front so the first query is fast
+        self.model = self.embedding_function.model
+        logger.info("Ready for ChatGPT Pro-style responses!")
 
-        self.firecrawl = None
+        # Optional injected Firecrawl client (anything with FirecrawlService's methods)
+        self.firecrawl = firecrawl
+        # What the last refetch wrote to the data file (kept in the state file when persistent)
+        self._data_source: Optional[Dict] = None
+
+        # Per-type counters kept up to date at add/delete time (see get_stats)
+        self._stats_lock = threading.Lock()
+        self._stats = self._load_stats()
+
+        # Lexical (BM25) index and the corpus centroid used by the embedding topic gate,
+        # both kept in step with the collection
+        self._build_derived_indexes(self._active)
+        if self.persist_directory:
+            self._synced_version = self._stored_version()
 
         # Initialize with existing data if collection is empty
         try:
             count = self.collection.count()
             if count == 0:
-                print("📚 Loading knowledge base...")
+                logger.info("Loading knowledge base...")
                 self.load_data()
+                self._bump_corpus_version()
+            elif self.persist_directory and self._load_state().get('fingerprint') != self._corpus_fingerprint():
+                logger.info("Data file or chunking changed - re-indexing...")
+                self.reload_data()
             else:
-                print(f"✅ Knowledge base ready with {count} documents")
+                if self.persist_directory and not os.path.exists(self._version_path()):
+                    self._bump_corpus_version()
+                logger.info("Knowledge base ready with %s documents", count)
         except:
             self.load_data()
+            self._bump_corpus_version()
+        if self.persist_directory:
+            self._synced_version = self._stored_version()
+
+    def after_fork(self):
+        """
+        Make a service built before fork() (e.g. in a preloading server's
+        master) usable in the child. The model, BM25 index, centroid and an
+        in-memory collection stay shared copy-on-write; thread pools and a
+        persistent store's SQLite connections must not be inherited.
+        """
+        # Pool threads do not survive fork(); the child starts its own on first use
+        self._search_executor = None
+        self._scrape_executor = None
+        self._ingest_executor = None
+
+        if self.persist_directory:
+            # Chroma caches one client system per path; drop the inherited one and reopen
+            # the store (this worker then loads its own copy of the HNSW index)
+            shared_system = getattr(getattr(chromadb, 'api', None), 'client', None)
+            shared_system = getattr(shared_system, 'SharedSystemClient', None)
+            if shared_system is not None:
+                shared_system.clear_system_cache()
+            self.client = chromadb.PersistentClient(path=self.persist_directory)
+            active = self._active
+            collection = self.client.get_collection(
+                name=active.collection.name,
+                embedding_function=self.embedding_function
+            )
+            self._active = _ActiveIndex(collection, active.lexical_index, active.topic_centroid)
 
     def get_firecrawl_service(self):
         """Lazy initialize Firecrawl service"""
@@ -48,124 +289,296 @@ class EnhancedRAGService:
             try:
                 self.firecrawl = FirecrawlService()
             except ValueError as e:
-                print(f"Firecrawl not initialized: {e}")
+                logger.warning("Firecrawl not initialized: %s", e)
                 self.firecrawl = None
         return self.firecrawl
 
-    def load_data(self):
-        """Load and chunk data - OPTIMIZED with CLEAN text"""
-        try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            # Clean the content thoroughly
-            content = self._clean_text(content)
-
-            # Create optimized chunks (400 chars for balance of speed and detail)
-            chunks = self._split_into_chunks(content, chunk_size=400)
-
-            print(f"⚡ Processing {len(chunks)} chunks...")
-
-            # Batch processing for speed
-            batch_size = 50
-            total_added = 0
-
-            for i in range(0, len(chunks), batch_size):
-                batch = chunks[i:i + batch_size]
-                ids = [f"file_chunk_{j}" for j in range(i, i + len(batch))]
-                metadatas = [{"source": "local_file", "type": "file"} for _ in batch]
-
-                try:
-                    # Check existing
-                    existing = self.collection.get(ids=ids)
-                    existing_ids = set(existing['ids']) if existing['ids'] else set()
-
-                    # Add only new chunks
-                    new_chunks = []
-                    new_ids = []
-                    new_metadatas = []
-
-                    for chunk, chunk_id, metadata in zip(batch, ids, metadatas):
-                        if chunk_id not in existing_ids:
-                            new_chunks.append(chunk)
-                            new_ids.append(chunk_id)
-                            new_metadatas.append(metadata)
-
-                    if new_chunks:
-                        self.collection.add(
-                            documents=new_chunks,
-                            ids=new_ids,
-                            metadatas=new_metadatas
-                        )
-                        total_added += len(new_chunks)
-                except Exception as e:
-                    print(f"Error adding batch: {e}")
-
-            if total_added > 0:
-                print(f"✅ Loaded {total_added} new chunks")
-            else:
-                print("✅ All chunks already loaded")
+    @property
+    def collection(self):
+        """The active Chroma collection (replaced wholesale by reloads)"""
+        return self._active.collection
 
-        except FileNotFoundError:
-            print(f"⚠️ Data file {self.data_file} not found.")
-        except Exception as e:
-            print(f"Error loading data: {e}")
+    @property
+    def lexical_index(self) -> BM25Index:
+        return self._active.lexical_index
 
-    def _clean_text(self, text: str) -> str:
-        """Remove citations, URLs, and clean text thoroughly"""
-        # Remove Wikipedia citations like [1], [2], [183]
-        text = re.sub(r'\[\d+\]', '', text)
+    @property
+    def topic_centroid(self) -> RunningCentroid:
+        return self._active.topic_centroid
+
+    def _state_path(self) -> str:
+        """Sidecar file holding the corpus fingerprint of a persisted collection"""
+        return os.path.join(self.persist_directory, f"{self.collection_name}.state.json")
 
-        # Remove escaped citation brackets like [\[183\]]
-        text = re.sub(r'\[\\?\[\\?\d+\\?\]\\?\]', '', text)
+    def _load_state(self) -> Dict:
+        """Read persisted store state (empty dict for in-memory or missing state)"""
+        if not self.persist_directory:
+            return {}
+        try:
+            with open(self._state_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, **updates):
+        """Merge updates into the persisted store state"""
+        if not self.persist_directory:
+            return
+        with self._state_lock:
+            state = self._load_state()
+            state.update(updates)
+            tmp_path = self._state_path() + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._state_path())
+
+    def _version_path(self) -> str:
+        """File holding the corpus version of a persisted collection (written only by bumps)"""
+        return os.path.join(self.persist_directory, f"{self.collection_name}.version")
+
+    def _lock_path(self) -> str:
+        return os.path.join(self.persist_directory, f"{self.collection_name}.lock")
+
+    @contextmanager
+    def _store_lock(self, exclusive: bool, blocking: bool = True):
+        """
+        Lock a persistent store against other processes sharing it (flock on a
+        sidecar file): writers that replace the collection hold it exclusively,
+        in-place upserts shared. Yields whether the lock is held.
+        """
+        if not self.persist_directory or fcntl is None:
+            yield True
+            return
+        with open(self._lock_path(), 'a') as lock_file:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            try:
+                fcntl.flock(lock_file, flags if blocking else flags | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @property
+    def corpus_version(self) -> str:
+        """Identifies the current knowledge base contents for cache keys"""
+        if not self.persist_directory:
+            return self._corpus_version
+        return self._stored_version()
+
+    def _stored_version(self) -> str:
+        """Version in the store's version file, re-read only when the file changes"""
+        # Another worker (or a previous run) may have changed the store
+        try:
+            mtime = os.stat(self._version_path()).st_mtime_ns
+        except OSError:
+            return self._corpus_version
+        if mtime != self._version_mtime:
+            try:
+                with open(self._version_path(), 'r', encoding='utf-8') as f:
+                    version = f.read().strip()
+            except OSError:
+                version = ''
+            if version:
+                self._corpus_version = version
+            self._version_mtime = mtime
+        return self._corpus_version
+
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {
+            'total_chunks': 0,
+            'file_chunks': 0,
+            'web_chunks': 0,
+            'bytes_indexed': 0,
+            'sources': {},
+            'last_reload': None
+        }
+
+    def _build_derived_indexes(self, target: _ActiveIndex):
+        """Build target's BM25 index and topic centroid from whatever its collection already holds"""
+        target.lexical_index.clear()
+        target.topic_centroid.clear()
+        try:
+            if target.collection.count() == 0:
+                return
+            items = target.collection.get(include=['documents', 'metadatas', 'embeddings'])
+            target.lexical_index.add_many(items['ids'], items['documents'], items['metadatas'])
+            if items.get('embeddings') is not None:
+                target.topic_centroid.add(items['embeddings'])
+            logger.info("Lexical index and topic centroid ready with %s chunks", len(target.lexical_index))
+        except Exception as e:
+            logger.error("Error building lexical index: %s", e)
 
-        # Remove Wikipedia editorial markers like [citation needed], [self-published source], etc.
-        text = re.sub(r'\[\\?_\[?[^\]]+_?\\?\]\\?\]', '', text)
-        text = re.sub(r'\(_\[[^\]]+\]_?\)', '', text)
-        text = re.sub(r'\[_[^\]]+_\]', '', text)
+    def _load_stats(self, collection=None) -> Dict:
+        """Use persisted counters when they match the store, else rebuild them once"""
+        collection = collection or self.collection
+        stats = self._load_state().get('stats')
+        try:
+            count = collection.count()
+        except Exception:
+            count = 0
+        if stats and stats.get('total_chunks') == count:
+            return {**self._empty_stats(), **stats}
+        if count == 0:
+            return self._empty_stats()
+
+        logger.info("Rebuilding knowledge base statistics...")
+        stats = self._empty_stats()
+        all_items = collection.get(include=['metadatas'])
+        self._apply_stats_delta(stats, all_items['metadatas'], 1)
+        return stats
+
+    @staticmethod
+    def _apply_stats_delta(stats: Dict, metadatas: List[Dict], sign: int):
+        for meta in metadatas:
+            meta = meta or {}
+            chunk_type = meta.get('type')
+            stats['total_chunks'] += sign
+            stats['bytes_indexed'] += sign * meta.get('bytes', 0)
+            if chunk_type == 'file':
+                stats['file_chunks'] += sign
+            elif chunk_type == 'web_scrape':
+                stats['web_chunks'] += sign
+                source = meta.get('source', 'Unknown')
+                remaining = stats['sources'].get(source, 0) + sign
+                if remaining > 0:
+                    stats['sources'][source] = remaining
+                else:
+                    stats['sources'].pop(source, None)
 
-        # Remove Wikipedia tags like [update], [clarification needed], etc.
-        text = re.sub(r'\[\\?update\\?\]', '', text)
-        text = re.sub(r'\[\\?needs update\\?\]', '', text)
-        text = re.sub(r'\[\\?clarification needed\\?\]', '', text)
-        text = re.sub(r'\[\\?citation needed\\?\]', '', text)
-        text = re.sub(r'\[\\?failed verification\\?\]', '', text)
-        text = re.sub(r'\[\\?when\?\\?\]', '', text)
-        text = re.sub(r'\[\\?who\?\\?\]', '', text)
-        text = re.sub(r'\[\\?which\?\\?\]', '', text)
+    def _record_stats(self, metadatas: List[Dict], sign: int):
+        """Update counters for added (sign=1) or deleted (sign=-1) chunks and persist them"""
+        if not metadatas:
+            return
+        with self._stats_lock:
+            self._apply_stats_delta(self._stats, metadatas, sign)
+            snapshot = {**self._stats, 'sources': dict(self._stats['sources'])}
+        self._save_state(stats=snapshot)
+
+    def _bump_corpus_version(self):
+        """Give the knowledge base a new version (random, so no two processes or runs reuse one)"""
+        version = uuid.uuid4().hex[:16]
+        self._corpus_version = version
+        self._synced_version = version
+        if not self.persist_directory:
+            return
+        try:
+            # Own file rather than the state file, whose read-merge-writes could undo a bump
+            tmp_path = f"{self._version_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(version)
+            os.replace(tmp_path, self._version_path())
+        except OSError as e:
+            logger.error("Error saving corpus version: %s", e)
+
+    def _follow_store(self, force: bool = False):
+        """
+        Catch up with changes other processes made to a shared persistent
+        store: re-open the collection its state names as active and rebuild
+        the BM25 index, centroid and statistics from it. Searches call this
+        when the stored version changes and go on with the current index if
+        another thread is already catching up. Writers pass force=True, which
+        also re-checks the state file and waits, before they build on the
+        store. (Chroma keeps each process's HNSW index in memory, so vectors
+        upserted in place by another process show in BM25 results at once but
+        in dense results only once a reload swaps in a new collection.)
+        """
+        if not self.persist_directory:
+            return
+        if not force and self._stored_version() == self._synced_version:
+            return
+        if not self._follow_lock.acquire(blocking=force):
+            return
+        try:
+            version = self._stored_version()
+            name = self._load_state().get('collection') or self.collection_name
+            if version == self._synced_version and name == self.collection.name:
+                return
+            self._synced_version = version
+            try:
+                collection = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+            except Exception as e:
+                logger.error("Error opening collection %s: %s", name, e)
+                return
+            logger.info("Store changed by another process - following collection %s", name)
+            active = _ActiveIndex(collection, BM25Index(), RunningCentroid())
+            self._build_derived_indexes(active)
+            stats = self._load_stats(collection)
+            with self._swap_lock.write():
+                self._active = active
+                with self._stats_lock:
+                    self._stats = stats
+        finally:
+            self._follow_lock.release()
+
+    def _corpus_fingerprint(self) -> str:
+        """Hash of the data file plus the parameters that shape its chunks"""
+        digest = hashlib.sha256()
+        digest.update(
+            f"v{CHUNKING_VERSION}:chunk_size={self.chunk_size}:"
+            f"model={self.embedding_function.model_id}\n".encode('utf-8')
+        )
+        try:
+            with open(self.data_file, 'rb') as f:
+                for block in iter(lambda: f.read(65536), b''):
+                    digest.update(block)
+        except FileNotFoundError:
+            digest.update(b'<missing>')
+        return digest.hexdigest()
 
-        # Remove any remaining [word] patterns (Wikipedia tags)
-        text = re.sub(r'\[\\?[a-zA-Z\s]+\\?\]', '', text)
+    def load_data(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        """
+        Load and chunk data - OPTIMIZED with CLEAN text.
+        The new file chunks are built in a shadow collection and swapped in,
+        so searches never see a partially loaded knowledge base.
+        progress_callback(processed, total) is called as chunks are indexed.
+        """
+        with self._writer_lock, self._upsert_lock.write(), self._store_lock(exclusive=True):
+            try:
+                # Build on what the store holds now, even if another process just reloaded it
+                self._follow_store(force=True)
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
 
-        # Remove standalone _] or _[
-        text = re.sub(r'_\\?\]', '', text)
-        text = re.sub(r'\\?\[_', '', text)
+                # Clean the content thoroughly
+                content = self._clean_text(content)
 
-        # Remove backslashes and underscores (but keep normal brackets and parentheses)
-        text = re.sub(r'\\', '', text)  # Remove all backslashes
-        text = re.sub(r'_', '', text)  # Remove all underscores
+                # Create optimized chunks (400 chars for balance of speed and detail)
+                chunks = self._split_into_chunks(content, chunk_size=self.chunk_size)
 
-        # Remove any remaining escaped brackets
-        text = re.sub(r'\[\\?\]', '', text)
+                logger.info("Processing %s chunks...", len(chunks))
 
-        # Remove citation markers like #cite_note-211
-        text = re.sub(r'#cite[^\s\)]+', '', text)
+                # Content-addressed ids: unchanged chunks keep their id and are not re-embedded
+                ids = [self._chunk_id("file", chunk) for chunk in chunks]
+                metadatas = [{"source": "local_file", "type": "file", "cleaned": True} for _ in chunks]
+                total_added, total_deleted = self._swap_in_file_chunks(
+                    chunks, ids, metadatas, progress_callback=progress_callback
+                )
 
-        # Remove URLs
-        text = re.sub(r'https?://[^\s]+', '', text)
-        text = re.sub(r'www\.[^\s]+', '', text)
-        text = re.sub(r'org/wiki/[^\s\)]+', '', text)
-        text = re.sub(r'en\.wikipedia\.org[^\s\)]+', '', text)
+                if total_added > 0 or total_deleted > 0:
+                    logger.info("Loaded %s new chunks, removed %s stale chunks", total_added, total_deleted)
+                else:
+                    logger.info("All chunks already loaded")
 
-        # Remove empty brackets and parentheses
-        text = re.sub(r'\(\s*\)', '', text)
-        text = re.sub(r'\[\s*\]', '', text)
+                with self._stats_lock:
+                    self._stats['last_reload'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    snapshot = {**self._stats, 'sources': dict(self._stats['sources'])}
+                self._save_state(fingerprint=self._corpus_fingerprint(), model_id=self.embedding_function.model_id,
+                                 stats=snapshot)
+                return True
 
-        # Clean whitespace
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'\s+([.,;:!?])', r'\1', text)
+            except FileNotFoundError:
+                logger.warning("Data file %s not found.", self.data_file)
+            except Exception as e:
+                logger.error("Error loading data: %s", e)
+            return False
 
-        return text.strip()
+    def _clean_text(self, text: str) -> str:
+        """Remove citations, URLs, and clean text thoroughly"""
+        return clean_text(text)
 
     def _split_into_chunks(self, text: str, chunk_size: int = 400) -> List[str]:
         """Split text into optimized chunks"""
@@ -203,47 +616,209 @@ class EnhancedRAGService:
 
         return chunks
 
-    def search(self, query: str, n_results: int = 8, source_filter: Optional[str] = None) -> List[str]:
+    def embed_query(self, query: str) -> List[float]:
+        """Embed query text, reusing cached vectors for repeated questions"""
+        key = normalize_query(query)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            with timed('query_embedding'):
+                vector = self.embedding_function.embed_query(key)
+            self.query_cache.set(key, vector)
+        return vector
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async embed_query() on the bounded search executor"""
+        return await self._run_in_search_executor(self.embed_query, query)
+
+    def topic_similarity(self, query_embedding: List[float]) -> Optional[float]:
+        """Cosine similarity between a query vector and the corpus centroid (None if empty)"""
+        return self.topic_centroid.similarity(query_embedding)
+
+    def get_cache_stats(self) -> Dict:
+        """Query-embedding cache hit/miss counters"""
+        return self.query_cache.stats()
+
+    def get_batching_stats(self) -> Optional[Dict]:
+        """Micro-batching batch-size histogram (None when batching is disabled)"""
+        return self.query_batcher.stats() if self.query_batcher is not None else None
+
+    def search(self, query: str, n_results: int = 8, source_filter: Optional[str] = None,
+               query_embedding: Optional[List[float]] = None, mode: Optional[str] = None) -> List[str]:
         """
         Search for relevant documents
         Returns 8 results by default for comprehensive Pro-style responses
+        Pass query_embedding to skip embedding the query text
+        """
+        return [doc['content'] for doc in self.search_documents(
+            query, n_results=n_results, source_filter=source_filter,
+            query_embedding=query_embedding, mode=mode
+        )]
+
+    def search_documents(self, query: str, n_results: int = 8, source_filter: Optional[str] = None,
+                         query_embedding: Optional[List[float]] = None,
+                         mode: Optional[str] = None) -> List[Dict]:
+        """
+        Like search(), but returns {'id', 'content', 'metadata'} dicts.
+
+        mode: 'vector' (dense only), 'lexical' (BM25 only, no embedding),
+        'hybrid' (both, reciprocal rank fusion) or 'auto' (lexical fast path
+        for short entity queries like "LSE" or "UCL 1826", hybrid otherwise).
+        Defaults to the service's search_mode.
         """
         try:
+            self._follow_store()
+            mode = mode or self.search_mode
             where_clause = None
             if source_filter:
                 where_clause = {"type": source_filter}
 
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=where_clause
-            )
-
-            if not results['documents'] or not results['documents'][0]:
-                return []
-
-            documents = results['documents'][0]
-
-            # Filter out very short chunks
-            filtered_docs = [
-                doc for doc in documents
-                if len(doc.strip()) > 50
-            ]
+            if mode == 'auto':
+                if query_embedding is None and self._is_entity_query(query):
+                    documents = self._lexical_search(query, n_results, where_clause)
+                    if documents:
+                        return self._filter_short(documents)
+                mode = 'hybrid'
+
+            if mode == 'lexical':
+                documents = self._lexical_search(query, n_results, where_clause)
+            elif mode == 'hybrid':
+                # Over-fetch from both retrievers so fusion has candidates to rank
+                candidates = n_results * 2
+                dense = self._vector_search(query, candidates, where_clause, query_embedding)
+                lexical = self._lexical_search(query, candidates, where_clause)
+                by_id = {doc['id']: doc for doc in lexical}
+                by_id.update({doc['id']: doc for doc in dense})
+                fused_ids = reciprocal_rank_fusion([
+                    [doc['id'] for doc in dense],
+                    [doc['id'] for doc in lexical]
+                ])
+                documents = [by_id[doc_id] for doc_id in fused_ids[:n_results]]
+            else:
+                documents = self._vector_search(query, n_results, where_clause, query_embedding)
 
-            return filtered_docs if filtered_docs else documents
+            return self._filter_short(documents)
 
         except Exception as e:
-            print(f"Search error: {e}")
+            logger.error("Search error: %s", e)
             return []
 
-    def get_sources(self, query: str, n_results: int = 5) -> List[Dict]:
+    async def asearch(self, query: str, n_results: int = 8, source_filter: Optional[str] = None,
+                      query_embedding: Optional[List[float]] = None, mode: Optional[str] = None) -> List[str]:
+        """Async search(): CPU-bound work runs on the bounded search executor"""
+        documents = await self.asearch_documents(
+            query, n_results=n_results, source_filter=source_filter,
+            query_embedding=query_embedding, mode=mode
+        )
+        return [doc['content'] for doc in documents]
+
+    async def asearch_documents(self, query: str, n_results: int = 8, source_filter: Optional[str] = None,
+                                query_embedding: Optional[List[float]] = None,
+                                mode: Optional[str] = None) -> List[Dict]:
+        """Async search_documents(): CPU-bound work runs on the bounded search executor"""
+        return await self._run_in_search_executor(
+            self.search_documents, query, n_results=n_results, source_filter=source_filter,
+            query_embedding=query_embedding, mode=mode
+        )
+
+    async def aget_sources(self, query: str, n_results: int = 5,
+                           query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Async get_sources()"""
+        return await self._run_in_search_executor(
+            self.get_sources, query, n_results=n_results, query_embedding=query_embedding
+        )
+
+    @staticmethod
+    def _is_entity_query(query: str) -> bool:
+        """Short queries naming an acronym or a year skip embedding entirely"""
+        return len(query.split()) <= 4 and bool(_ENTITY_TOKEN_RE.search(query))
+
+    @staticmethod
+    def _filter_short(documents: List[Dict]) -> List[Dict]:
+        # Filter out very short chunks
+        filtered_docs = [
+            doc for doc in documents
+            if len(doc['content'].strip()) > 50
+        ]
+        return filtered_docs if filtered_docs else documents
+
+    def _lexical_search(self, query: str, n_results: int, where: Optional[Dict]) -> List[Dict]:
+        documents = []
+        with timed('lexical_search'):
+            for doc_id, _score in self.lexical_index.search(query, n_results=n_results, where=where):
+                entry = self.lexical_index.get(doc_id)
+                if entry is not None:
+                    documents.append({'id': doc_id, 'content': entry[0], 'metadata': entry[1]})
+        return documents
+
+    def _vector_search(self, query: str, n_results: int, where: Optional[Dict],
+                       query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        if self.query_batcher is not None:
+            return self.query_batcher.submit((query, n_results, where, query_embedding))
+        return self._vector_search_batch([(query, n_results, where, query_embedding)])[0]
+
+    def _vector_search_batch(self, requests: List[Tuple]) -> List[List[Dict]]:
+        """
+        Run many (query, n_results, where, query_embedding) searches at once:
+        uncached queries are embedded in one forward pass, and requests with
+        the same n_results/filter share one multi-query collection.query().
+        """
+        embeddings = [query_embedding for _, _, _, query_embedding in requests]
+
+        missing = {}
+        for i, (query, _, _, query_embedding) in enumerate(requests):
+            if query_embedding is None:
+                key = normalize_query(query)
+                cached = self.query_cache.get(key)
+                if cached is not None:
+                    embeddings[i] = cached
+                else:
+                    missing.setdefault(key, []).append(i)
+        if missing:
+            keys = list(missing)
+            with timed('query_embedding'):
+                vectors = self.embedding_function.embed_documents(keys)
+            for key, vector in zip(keys, vectors):
+                self.query_cache.set(key, vector)
+                for i in missing[key]:
+                    embeddings[i] = vector
+
+        groups = {}
+        for i, (_, n_results, where, _) in enumerate(requests):
+            groups.setdefault((n_results, json.dumps(where, sort_keys=True)), []).append(i)
+
+        outputs: List[List[Dict]] = [[] for _ in requests]
+        for (n_results, _), indexes in groups.items():
+            with self._swap_lock.read(), timed('vector_search'):
+                results = self.collection.query(
+                    query_embeddings=[embeddings[i] for i in indexes],
+                    n_results=n_results,
+                    where=requests[indexes[0]][2],
+                    include=['documents', 'metadatas']
+                )
+            for row, i in enumerate(indexes):
+                if not results['documents'] or not results['documents'][row]:
+                    continue
+                metadatas = results['metadatas'][row] if results.get('metadatas') else None
+                outputs[i] = [
+                    {'id': doc_id, 'content': doc, 'metadata': (metadatas[j] if metadatas else None) or {}}
+                    for j, (doc_id, doc) in enumerate(zip(results['ids'][row], results['documents'][row]))
+                ]
+        return outputs
+
+    def get_sources(self, query: str, n_results: int = 5,
+                    query_embedding: Optional[List[float]] = None) -> List[Dict]:
         """Get search results with source metadata"""
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                include=['documents', 'metadatas', 'distances']
-            )
+            self._follow_store()
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
+
+            with self._swap_lock.read(), timed('vector_search'):
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    include=['documents', 'metadatas', 'distances']
+                )
 
             sources = []
             if results['documents'] and results['metadatas']:
@@ -262,128 +837,690 @@ class EnhancedRAGService:
 
             return sources
         except Exception as e:
-            print(f"Error getting sources: {e}")
+            logger.error("Error getting sources: %s", e)
             return []
 
-    def reload_data(self):
-        """Reload data from file"""
+    def reload_data(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        """
+        Reload data from file. Only changed chunks are re-embedded, and the
+        result is swapped in at once, so reloads are invisible to live searches.
+        """
         try:
-            file_chunks = self.collection.get(where={"type": "file"})
-            if file_chunks['ids']:
-                self.collection.delete(ids=file_chunks['ids'])
-                print(f"Deleted {len(file_chunks['ids'])} old chunks")
-            self.load_data()
+            return self.load_data(progress_callback=progress_callback)
         except Exception as e:
-            print(f"Error reloading data: {e}")
+            logger.error("Error reloading data: %s", e)
+            return False
+        finally:
+            self._bump_corpus_version()
 
     def refetch_and_reload_data(self,
-                                url: str = "https://en.wikipedia.org/wiki/Universities_in_the_United_Kingdom") -> bool:
+                                url: str = "https://en.wikipedia.org/wiki/Universities_in_the_United_Kingdom",
+                                progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
         """Refetch data from URL"""
         firecrawl = self.get_firecrawl_service()
         if not firecrawl:
             return False
 
         try:
-            print(f"Fetching data from {url}...")
-            result = firecrawl.scrape_url(url)
+            logger.info("Fetching data from %s...", url)
+            result, _ = self._scrape_cached(firecrawl, url)
 
             if not result or 'markdown' not in result:
                 return False
 
+            # Skip only if the data file still holds exactly this page (not another URL's, or an edit)
+            content_hash = hashlib.sha256((result['markdown'] or '').encode('utf-8')).hexdigest()
+            source = self._data_file_source()
+            if (source and source.get('url') == url and source.get('content_hash') == content_hash
+                    and source.get('file_hash') == self._hash_file(self.data_file)):
+                logger.info("%s unchanged since the last fetch - nothing to reload", url)
+                return True
+
             content = result['markdown']
             title = result.get('metadata', {}).get('title', 'Unknown')
 
             cleaned_content = self._clean_text(content)
 
-            print(f"Saving to {self.data_file}...")
+            logger.info("Saving to %s...", self.data_file)
             with open(self.data_file, 'w', encoding='utf-8') as f:
                 f.write(f"# {title}\n\n")
                 f.write(f"Source: {url}\n\n")
                 f.write(cleaned_content)
+            self._record_data_file_source(url, content_hash)
 
-            self.reload_data()
-            print("✅ Data successfully refetched and reloaded")
+            if not self.reload_data(progress_callback=progress_callback):
+                return False
+            self._bump_corpus_version()
+            logger.info("Data successfully refetched and reloaded")
             return True
 
         except Exception as e:
-            print(f"Error refetching: {e}")
+            logger.error("Error refetching: %s", e)
             return False
 
-    def get_stats(self) -> Dict:
-        """Get knowledge base statistics"""
+    @staticmethod
+    def _hash_file(path: str) -> Optional[str]:
+        digest = hashlib.sha256()
         try:
-            all_items = self.collection.get(include=['metadatas'])
-            file_count = sum(1 for meta in all_items['metadatas'] if meta.get('type') == 'file')
-            web_count = sum(1 for meta in all_items['metadatas'] if meta.get('type') == 'web_scrape')
-
-            return {
-                'total_chunks': len(all_items['metadatas']),
-                'file_chunks': file_count,
-                'web_chunks': web_count
-            }
-        except Exception as e:
-            print(f"Error getting stats: {e}")
-            return {'total_chunks': 0, 'file_chunks': 0, 'web_chunks': 0}
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(65536), b''):
+                    digest.update(block)
+        except FileNotFoundError:
+            return None
+        return digest.hexdigest()
+
+    def _data_file_source(self) -> Optional[Dict]:
+        """{'url', 'content_hash', 'file_hash'} of the last refetch that wrote the data file"""
+        if self.persist_directory:
+            return self._load_state().get('data_source')
+        return self._data_source
+
+    def _record_data_file_source(self, url: str, content_hash: str):
+        self._data_source = {'url': url, 'content_hash': content_hash, 'file_hash': self._hash_file(self.data_file)}
+        self._save_state(data_source=self._data_source)
+
+    def get_stats(self) -> Dict:
+        """Get knowledge base statistics (maintained counters - no collection scan)"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['sources'] = dict(self._stats['sources'])
+        stats['web_sources'] = len(stats['sources'])
+        return stats
 
     def clear_web_content(self):
         """Clear web-scraped content"""
         try:
-            web_chunks = self.collection.get(where={"type": "web_scrape"})
-            if web_chunks['ids']:
-                self.collection.delete(ids=web_chunks['ids'])
-                print(f"Cleared {len(web_chunks['ids'])} web chunks")
+            with self._writer_lock, self._upsert_lock.write(), self._store_lock(exclusive=True):
+                self._follow_store(force=True)
+                web_chunks = self.collection.get(where={"type": "web_scrape"}, include=[])
+                deleted = self._delete_chunks(web_chunks['ids'] or [])
+            if deleted:
+                logger.info("Cleared %s web chunks", deleted)
         except Exception as e:
-            print(f"Error clearing: {e}")
+            logger.error("Error clearing: %s", e)
+        finally:
+            self._bump_corpus_version()
+
+    def add_web_content(self, url: str, max_pages: int = 1,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        """Add web content (max_pages > 1 crawls the site from url)"""
+        if max_pages > 1:
+            return self.add_site_crawl(url, max_pages=max_pages, progress_callback=progress_callback) > 0
 
-    def add_web_content(self, url: str, max_pages: int = 1) -> bool:
-        """Add web content"""
         firecrawl = self.get_firecrawl_service()
         if not firecrawl:
             return False
 
         try:
-            result = firecrawl.scrape_url(url)
+            result, changed = self._scrape_cached(firecrawl, url)
             if result and 'markdown' in result:
-                self._add_scraped_content(result, url)
+                if self._needs_indexing(url, changed):
+                    self._add_scraped_content(result, url, progress_callback=progress_callback)
+                else:
+                    logger.info("%s unchanged and already indexed", url)
                 return True
             return False
         except Exception as e:
-            print(f"Error adding web content: {e}")
+            logger.error("Error adding web content: %s", e)
             return False
+        finally:
+            self._bump_corpus_version()
 
-    def _add_scraped_content(self, scraped_data: Dict, url: str, search_query: Optional[str] = None):
+    def add_site_crawl(self, url: str, max_pages: int = 10,
+                       include_paths: Optional[List[str]] = None, exclude_paths: Optional[List[str]] = None,
+                       poll_interval: float = 2.0, timeout: float = 600.0,
+                       progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        Crawl a site and index its pages while the crawl is still running.
+        Pages go into the batched ingestion pipeline as status polls report
+        them, and the next poll only happens once the pipeline has room, so
+        the site is never held in memory at once. Returns pages indexed.
+        """
+        firecrawl = self.get_firecrawl_service()
+        if not firecrawl:
+            return 0
+
+        try:
+            crawl = firecrawl.crawl_website(url, max_pages=max_pages,
+                                           include_paths=include_paths, exclude_paths=exclude_paths)
+            if not crawl or not crawl.get('id'):
+                return 0
+            logger.info("Crawling %s (job %s, up to %s pages)...", url, crawl['id'], max_pages)
+
+            pages = self._iter_crawl_pages(firecrawl, crawl['id'], poll_interval, timeout)
+            indexed = [0]
+
+            def counted():
+                for scraped_data, page_url, search_query in pages:
+                    indexed[0] += 1
+                    changed = self.scrape_cache.put(page_url, scraped_data) if self.scrape_cache else True
+                    if self._needs_indexing(page_url, changed):
+                        yield scraped_data, page_url, search_query
+
+            chunks = self._add_scraped_pages(counted(), progress_callback=progress_callback)
+            logger.info("Crawl indexed %s pages (%s new chunks)", indexed[0], chunks)
+            return indexed[0]
+        except Exception as e:
+            logger.error("Error crawling %s: %s", url, e)
+            return 0
+        finally:
+            self._bump_corpus_version()
+
+    def _iter_crawl_pages(self, firecrawl, job_id: str, poll_interval: float,
+                          timeout: float) -> Iterable[Tuple[Dict, str, Optional[str]]]:
+        """
+        Poll a crawl job, yielding each newly completed page as (scraped_data, url, None).
+        Each poll asks only for pages past those already received; a failed
+        poll is retried every poll_interval until the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        received = 0
+        failed_polls = 0
+        while True:
+            status = firecrawl.get_crawl_status(job_id, skip=received)
+            if status is None:
+                failed_polls += 1
+                if time.monotonic() >= deadline:
+                    logger.warning("Crawl %s status unavailable after %s failed polls - stopping early with %s pages",
+                                   job_id, failed_polls, received)
+                    return
+                logger.info("Crawl %s status poll failed (%s in a row), retrying in %.1fs",
+                            job_id, failed_polls, poll_interval)
+                time.sleep(poll_interval)
+                continue
+            failed_polls = 0
+
+            pages = status.pop('data', None) or []
+            batch = len(pages)
+            received += batch
+            # Hand pages over one at a time so indexed ones are not kept alive here
+            pages.reverse()
+            while pages:
+                page = pages.pop()
+                metadata = page.get('metadata') or {}
+                page_url = metadata.get('source_url') or metadata.get('url') or metadata.get('sourceURL')
+                if page_url and page.get('markdown'):
+                    yield page, page_url, None
+
+            if status.get('next') and batch:
+                # More pages are ready than one response carries; fetch them without waiting
+                continue
+            state = status.get('status')
+            if state in CRAWL_FINISHED_STATES:
+                if state != 'completed':
+                    logger.warning("Crawl %s ended with status %s", job_id, state)
+                return
+            if time.monotonic() >= deadline:
+                logger.warning("Crawl %s still %s after %.0fs - keeping pages so far", job_id, state, timeout)
+                return
+            time.sleep(poll_interval)
+
+    def add_search_content(self, query: str, max_results: int = 5,
+                           progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        Search the web, scrape the top results concurrently (rate limited per
+        host) and index them with the query recorded in their metadata.
+        Returns the number of pages indexed.
+        """
+        firecrawl = self.get_firecrawl_service()
+        if not firecrawl:
+            return 0
+
+        try:
+            urls = self._search_urls(firecrawl, query, max_results)
+            if not urls:
+                logger.info("No search results for '%s'", query)
+                return 0
+            logger.info("Scraping %s results for '%s'...", len(urls), query)
+
+            executor = self._get_scrape_executor()
+            futures = {executor.submit(self._scrape_cached, firecrawl, url, True): url for url in urls}
+            indexed = [0]
+
+            def scraped_pages():
+                # Index pages in the order their scrapes finish
+                for future in as_completed(futures):
+                    result, changed = future.result()
+                    if result and result.get('markdown'):
+                        indexed[0] += 1
+                        if self._needs_indexing(futures[future], changed):
+                            yield result, futures[future], query
+
+            chunks = self._add_scraped_pages(scraped_pages(), progress_callback=progress_callback)
+            logger.info("Indexed %s of %s search results (%s new chunks)", indexed[0], len(urls), chunks)
+            return indexed[0]
+        except Exception as e:
+            logger.error("Error adding search content: %s", e)
+            return 0
+        finally:
+            self._bump_corpus_version()
+
+    def _search_urls(self, firecrawl, query: str, max_results: int) -> List[str]:
+        """Result URLs for a web search, cached per normalized query"""
+        key = f"{max_results}:{normalize_query(query)}"
+        urls = self.search_cache.get(key)
+        if urls is not None:
+            return urls
+
+        results = firecrawl.search_web(query, max_results=max_results)
+        if not results:
+            return []
+        hits = (results.get('web') or results.get('data') or []) if isinstance(results, dict) else results
+        urls = []
+        for hit in hits:
+            url = hit.get('url') if isinstance(hit, dict) else getattr(hit, 'url', None)
+            if url and url not in urls:
+                urls.append(url)
+        urls = urls[:max_results]
+        self.search_cache.set(key, urls)
+        return urls
+
+    def _scrape_cached(self, firecrawl, url: str, rate_limit: bool = False) -> Tuple[Optional[Dict], bool]:
+        """
+        Scrape url through the on-disk cache. Returns (scraped_data, changed):
+        fresh cache entries are served without a Firecrawl call, and changed
+        is False when the content hash matches the cached copy.
+        """
+        cache = self.scrape_cache
+        if cache is not None:
+            entry = cache.get_fresh(url)
+            if entry is not None:
+                return cache.as_scraped(entry), False
+
+        if rate_limit:
+            self.scrape_rate_limiter.wait(url)
+        result = firecrawl.scrape_url(url)
+        if cache is None or not result or not result.get('markdown'):
+            return result, True
+        return result, cache.put(url, result)
+
+    def _needs_indexing(self, url: str, changed: bool) -> bool:
+        """Unchanged pages that are already in the index skip cleaning and embedding"""
+        if changed:
+            return True
+        with self._stats_lock:
+            return url not in self._stats['sources']
+
+    def get_search_cache_stats(self) -> Dict:
+        """Web search cache hit/miss counters"""
+        return self.search_cache.stats()
+
+    def get_scrape_cache_stats(self) -> Optional[Dict]:
+        """Scrape cache hit/miss counters (None when the cache is disabled)"""
+        return self.scrape_cache.stats() if self.scrape_cache is not None else None
+
+    def _add_scraped_content(self, scraped_data: Dict, url: str, search_query: Optional[str] = None,
+                             progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
         """Add scraped content to database"""
-        if 'markdown' not in scraped_data:
-            return
+        return self._add_scraped_pages([(scraped_data, url, search_query)], progress_callback=progress_callback)
+
+    def _prepare_scraped_content(self, scraped_data: Dict, url: str,
+                                 search_query: Optional[str] = None) -> Tuple[List[str], List[str], List[Dict]]:
+        """Clean and chunk one scraped page into (documents, ids, metadatas)"""
+        if not scraped_data or 'markdown' not in scraped_data:
+            return [], [], []
 
-        content = scraped_data['markdown']
-        title = scraped_data.get('metadata', {}).get('title', 'Unknown')
+        content = scraped_data['markdown'] or ''
+        title = (scraped_data.get('metadata') or {}).get('title') or 'Unknown'
 
         cleaned_content = self._clean_text(content)
-        chunks = self._split_into_chunks(cleaned_content)
+        chunks = self._split_into_chunks(cleaned_content, chunk_size=self.chunk_size)
 
+        ids = []
+        metadatas = []
         for i, chunk in enumerate(chunks):
-            chunk_id = f"web_{hash(url)}_{i}"
+            ids.append(self._chunk_id("web", chunk, scope=url))
             metadata = {
                 "source": url,
                 "type": "web_scrape",
                 "title": title,
-                "chunk_index": i
+                "chunk_index": i,
+                "cleaned": True
             }
             if search_query:
                 metadata["search_query"] = search_query
+            metadatas.append(metadata)
 
-            try:
-                existing = self.collection.get(ids=[chunk_id])
-                if not existing['documents']:
-                    self.collection.add(
-                        documents=[chunk],
-                        ids=[chunk_id],
-                        metadatas=[metadata]
+        return chunks, ids, metadatas
+
+    def _add_scraped_pages(self, pages: Iterable[Tuple[Dict, str, Optional[str]]],
+                           progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        Batched ingestion pipeline for (scraped_data, url, search_query) pages.
+        Each page is fetched, cleaned and chunked here while the previous page
+        is embedded and upserted on the ingest worker pool. No lock is held
+        while pages are fetched; each page's upsert takes the upsert lock.
+        """
+        executor = self._get_ingest_executor()
+        progress = _PageProgress(progress_callback)
+        pending = []
+        total_added = 0
+
+        for scraped_data, url, search_query in pages:
+            documents, ids, metadatas = self._prepare_scraped_content(scraped_data, url, search_query)
+            if not ids:
+                continue
+            where = {"$and": [{"type": "web_scrape"}, {"source": url}]}
+            pending.append(executor.submit(
+                self._replace_page, documents, ids, metadatas, where, progress.add_page(len(ids))
+            ))
+
+            # Backpressure: never hold more than a few prepared pages in memory
+            while len(pending) > self.ingest_workers:
+                total_added += pending.pop(0).result()[0]
+
+        for future in pending:
+            total_added += future.result()[0]
+
+        return total_added
+
+    def _replace_page(self, documents: List[str], ids: List[str], metadatas: List[Dict], where: Dict,
+                      progress_callback: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
+        """_replace_chunks for one web page, kept clear of reloads swapping the collection"""
+        with self._upsert_lock.read(), self._store_lock(exclusive=False):
+            self._follow_store(force=True)
+            return self._replace_chunks(documents, ids, metadatas, where, progress_callback=progress_callback)
+
+    def _get_search_executor(self) -> ThreadPoolExecutor:
+        if self._search_executor is None:
+            with self._ingest_lock:
+                if self._search_executor is None:
+                    self._search_executor = ThreadPoolExecutor(
+                        max_workers=self.search_workers,
+                        thread_name_prefix='rag-search'
+                    )
+        return self._search_executor
+
+    async def _run_in_search_executor(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_search_executor(), functools.partial(func, *args, **kwargs)
+        )
+
+    def _get_scrape_executor(self) -> ThreadPoolExecutor:
+        if self._scrape_executor is None:
+            with self._ingest_lock:
+                if self._scrape_executor is None:
+                    self._scrape_executor = ThreadPoolExecutor(
+                        max_workers=self.scrape_workers,
+                        thread_name_prefix='rag-scrape'
+                    )
+        return self._scrape_executor
+
+    def _get_ingest_executor(self) -> ThreadPoolExecutor:
+        if self._ingest_executor is None:
+            with self._ingest_lock:
+                if self._ingest_executor is None:
+                    self._ingest_executor = ThreadPoolExecutor(
+                        max_workers=self.ingest_workers,
+                        thread_name_prefix='rag-ingest'
                     )
-            except:
-                self.collection.add(
-                    documents=[chunk],
-                    ids=[chunk_id],
-                    metadatas=[metadata]
-                )
\ No newline at end of file
+        return self._ingest_executor
+
+    @staticmethod
+    def _chunk_id(prefix: str, chunk: str, scope: str = "") -> str:
+        """Stable id derived from chunk content (and its source scope, e.g. the URL)"""
+        chunk_hash = hashlib.sha1(chunk.encode('utf-8')).hexdigest()[:20]
+        if scope:
+            scope_hash = hashlib.sha1(scope.encode('utf-8')).hexdigest()[:12]
+            return f"{prefix}_{scope_hash}_{chunk_hash}"
+        return f"{prefix}_{chunk_hash}"
+
+    def _replace_chunks(self, documents: List[str], ids: List[str], metadatas: List[Dict], where: Dict,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
+        """
+        Make the chunks matching `where` equal to the given set: add new ids,
+        then delete ids that vanished. Returns (added, deleted).
+        """
+        added = self._index_chunks(documents, ids, metadatas, progress_callback=progress_callback)
+
+        current = self.collection.get(where=where, include=[])
+        stale_ids = list(set(current['ids'] or []) - set(ids))
+        return added, self._delete_chunks(stale_ids)
+
+    def _delete_chunks(self, ids: List[str]) -> int:
+        """Delete chunks by id, keeping the statistics counters in step"""
+        if not ids:
+            return 0
+        existing = self.collection.get(ids=ids, include=['metadatas', 'embeddings'])
+        if not existing['ids']:
+            return 0
+        self.collection.delete(ids=existing['ids'])
+        for chunk_id in existing['ids']:
+            self.lexical_index.remove(chunk_id)
+        if existing.get('embeddings') is not None:
+            self.topic_centroid.remove(existing['embeddings'])
+        self._record_stats(existing['metadatas'], -1)
+        return len(existing['ids'])
+
+    def _index_chunks(self, documents: List[str], ids: List[str], metadatas: List[Dict],
+                      progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        Embed and upsert chunks that are not already in the collection.
+        One get() for the whole set of ids, then batched embedding and upserts.
+        progress_callback(processed, total) counts already-stored chunks as processed.
+        """
+        if not ids:
+            return 0
+
+        existing = self.collection.get(ids=list(dict.fromkeys(ids)), include=[])
+        seen = set(existing['ids']) if existing['ids'] else set()
+
+        new_documents, new_ids, new_metadatas = [], [], []
+        for document, chunk_id, metadata in zip(documents, ids, metadatas):
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            new_documents.append(document)
+            new_ids.append(chunk_id)
+            new_metadatas.append(metadata)
+
+        skipped = len(ids) - len(new_ids)
+        if progress_callback:
+            progress_callback(skipped, len(ids))
+
+        for start in range(0, len(new_ids), self.embed_batch_size):
+            end = start + self.embed_batch_size
+            batch_documents = new_documents[start:end]
+            batch_metadatas = [
+                {**metadata, "bytes": len(document.encode('utf-8'))}
+                for document, metadata in zip(batch_documents, new_metadatas[start:end])
+            ]
+            try:
+                batch_embeddings = self.embedding_function.embed_documents(batch_documents)
+                self._write_chunks(self._active, new_ids[start:end], batch_documents,
+                                   batch_metadatas, batch_embeddings)
+                self._record_stats(batch_metadatas, 1)
+            except Exception as e:
+                # Propagate so callers never delete stale chunks after a partial add
+                logger.error("Error adding batch: %s", e)
+                raise
+            if progress_callback:
+                progress_callback(skipped + min(end, len(new_ids)), len(ids))
+
+        return len(new_ids)
+
+    @staticmethod
+    def _write_chunks(target: _ActiveIndex, ids: List[str], documents: List[str],
+                      metadatas: List[Dict], embeddings: List[List[float]]):
+        """Upsert embedded chunks into a collection and its BM25 index and centroid"""
+        target.collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        target.lexical_index.add_many(ids, documents, metadatas)
+        target.topic_centroid.add(embeddings)
+
+    def _iter_stored_chunks(self, collection) -> Iterable[Tuple[List[str], List[str], List[Dict], List]]:
+        """Page through a collection as (ids, documents, metadatas, embeddings) batches"""
+        offset = 0
+        while True:
+            page = collection.get(include=['documents', 'metadatas', 'embeddings'],
+                                  limit=self.embed_batch_size, offset=offset)
+            if not page['ids']:
+                return
+            yield page['ids'], page['documents'], page['metadatas'], page['embeddings']
+            offset += len(page['ids'])
+
+    def _swap_in_file_chunks(self, documents: List[str], ids: List[str], metadatas: List[Dict],
+                             progress_callback: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
+        """
+        Replace the file chunks without a window where searches see a partial
+        knowledge base: build a shadow collection holding the current non-file
+        chunks plus the new file chunks (unchanged ones reuse their stored
+        embeddings), then swap it in. Returns (added, deleted).
+        When the store was embedded by another model or backend, every chunk,
+        file and web, is embedded again: ids hash content, not vectors.
+        """
+        active = self._active
+        current = active.collection.get(where={"type": "file"}, include=[])
+        current_ids = set(current['ids'] or [])
+        model_id = self.embedding_function.model_id
+        stored_model_id = self._load_state().get('model_id') if self.persist_directory else model_id
+        reembed = stored_model_id != model_id
+        if reembed:
+            logger.info("Store was embedded with %s, now %s - re-embedding every chunk",
+                        stored_model_id or 'an unknown model', model_id)
+
+        unique = {}
+        for document, chunk_id, metadata in zip(documents, ids, metadatas):
+            unique.setdefault(chunk_id, (document, metadata))
+        if set(unique) == current_ids and not reembed:
+            if progress_callback:
+                progress_callback(len(ids), len(ids))
+            return 0, 0
+
+        shadow_name = f"{self.collection_name}-{uuid.uuid4().hex[:12]}"
+        shadow = _ActiveIndex(
+            self.client.create_collection(
+                name=shadow_name,
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=self.embedding_function
+            ),
+            BM25Index(),
+            RunningCentroid()
+        )
+        stats = self._empty_stats()
+        added = 0
+
+        try:
+            # Web chunks carry over with their embeddings (the writer lock keeps them still)
+            for page_ids, page_documents, page_metadatas, page_embeddings in self._iter_stored_chunks(active.collection):
+                keep = [i for i, metadata in enumerate(page_metadatas) if (metadata or {}).get('type') != 'file']
+                if keep:
+                    kept_documents = [page_documents[i] for i in keep]
+                    kept_metadatas = [page_metadatas[i] for i in keep]
+                    if reembed:
+                        kept_embeddings = self.embedding_function.embed_documents(kept_documents)
+                        added += len(keep)
+                    else:
+                        kept_embeddings = [page_embeddings[i] for i in keep]
+                    self._write_chunks(shadow, [page_ids[i] for i in keep], kept_documents,
+                                       kept_metadatas, kept_embeddings)
+                    self._apply_stats_delta(stats, kept_metadatas, 1)
+
+            # File chunks: reuse stored embeddings, embed only the new ones
+            reusable = current_ids & set(unique) if not reembed else set()
+            stored = active.collection.get(ids=list(reusable), include=['embeddings']) if reusable else None
+            stored_embeddings = dict(zip(stored['ids'], stored['embeddings'])) if stored else {}
+
+            chunk_ids = list(unique)
+            processed = len(ids) - len(chunk_ids)
+            for start in range(0, len(chunk_ids), self.embed_batch_size):
+                batch_ids = chunk_ids[start:start + self.embed_batch_size]
+                batch_documents = [unique[chunk_id][0] for chunk_id in batch_ids]
+                batch_metadatas = [
+                    {**unique[chunk_id][1], "bytes": len(unique[chunk_id][0].encode('utf-8'))}
+                    for chunk_id in batch_ids
+                ]
+                missing = [i for i, chunk_id in enumerate(batch_ids) if chunk_id not in stored_embeddings]
+                fresh = self.embedding_function.embed_documents([batch_documents[i] for i in missing])
+                batch_embeddings = [stored_embeddings.get(chunk_id) for chunk_id in batch_ids]
+                for i, vector in zip(missing, fresh):
+                    batch_embeddings[i] = vector
+                added += len(missing)
+
+                self._write_chunks(shadow, batch_ids, batch_documents, batch_metadatas, batch_embeddings)
+                self._apply_stats_delta(stats, batch_metadatas, 1)
+                processed += len(batch_ids)
+                if progress_callback:
+                    progress_callback(processed, len(ids))
+        except Exception:
+            self._drop_collection(shadow_name)
+            raise
+
+        self._swap_active(shadow, stats)
+        return added, len(current_ids - set(unique))
+
+    def _swap_active(self, new_active: _ActiveIndex, stats: Dict):
+        """Make new_active the live index, then drop the collection it replaces"""
+        with self._swap_lock.write():
+            old_active = self._active
+            self._active = new_active
+            with self._stats_lock:
+                stats['last_reload'] = self._stats.get('last_reload')
+                self._stats = stats
+                snapshot = {**stats, 'sources': dict(stats['sources'])}
+
+        # Record the new name before retiring the old collection, so a crash leaves a usable store;
+        # the new version tells processes sharing the store to move to it
+        self._save_state(collection=new_active.collection.name, stats=snapshot)
+        self._bump_corpus_version()
+        self._retire_collection(old_active.collection.name)
+        logger.info("Swapped in collection %s", new_active.collection.name)
+
+    def _retire_collection(self, name: str):
+        """
+        Drop a replaced collection - at once for an in-memory store, after
+        RETIRED_COLLECTION_GRACE for a persistent one, whose other processes
+        may still be searching it until they follow the swap.
+        """
+        if not self.persist_directory:
+            self._drop_collection(name)
+            return
+        retired = self._load_state().get('retired') or {}
+        retired[name] = time.time()
+        self._save_state(retired=self._drop_expired_collections(retired))
+
+    def _drop_expired_collections(self, retired: Dict[str, float]) -> Dict[str, float]:
+        """Drop retired collections past their grace period; returns those still kept"""
+        now = time.time()
+        kept = {}
+        for name, retired_at in retired.items():
+            if now - retired_at < RETIRED_COLLECTION_GRACE:
+                kept[name] = retired_at
+            else:
+                self._drop_collection(name)
+        return kept
+
+    def _drop_collection(self, name: str):
+        try:
+            self.client.delete_collection(name=name)
+        except Exception as e:
+            logger.error("Error dropping collection %s: %s", name, e)
+
+    def _drop_stale_collections(self):
+        """
+        Remove shadow collections left behind by an interrupted reload, and
+        retired ones past their grace period. Skipped while another process
+        holds the store lock, as its reload owns the shadow it is building.
+        """
+        if not self.persist_directory:
+            return
+        with self._store_lock(exclusive=True, blocking=False) as locked:
+            if not locked:
+                return
+            try:
+                collections = self.client.list_collections()
+            except Exception as e:
+                logger.error("Error listing collections: %s", e)
+                return
+            state = self._load_state()
+            retired = self._drop_expired_collections(state.get('retired') or {})
+            in_use = {self.collection.name, state.get('collection')} | set(retired)
+            for collection in collections:
+                # Older Chroma releases return Collection objects, newer ones names
+                name = getattr(collection, 'name', collection)
+                if name in in_use:
+                    continue
+                if name == self.collection_name or name.startswith(f"{self.collection_name}-"):
+                    logger.info("Dropping stale collection %s", name)
+                    self._drop_collection(name)
+            self._save_state(retired=retired)
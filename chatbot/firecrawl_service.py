@@ -1,16 +1,34 @@
 from firecrawl import FirecrawlApp
+import json
+import logging
 import os
+import urllib.parse
+import urllib.request
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = 'https://api.firecrawl.dev'
+
+
+def _to_dict(result):
+    """Convert Pydantic SDK responses to plain dicts for compatibility"""
+    if hasattr(result, 'model_dump'):
+        return result.model_dump()
+    return result
+
+
 class FirecrawlService:
     def __init__(self):
 
         api_key = os.getenv('FIRECRAWL_API_KEY')
         if not api_key:
             raise ValueError("FIRECRAWL_API_KEY environment variable is required")
+        self.api_key = api_key
         self.app = FirecrawlApp(api_key=api_key)
+        self.api_url = (getattr(self.app, 'api_url', None) or DEFAULT_API_URL).rstrip('/')
 
     def scrape_url(self, url, formats=['markdown', 'html']):
 
@@ -22,58 +40,61 @@ class FirecrawlService:
                 exclude_tags=['nav', 'footer', 'script', 'style'],
                 wait_for=2000  # Wait 2 seconds for dynamic content
             )
-            # Convert Pydantic Document object to dict for compatibility
-            if hasattr(result, 'model_dump'):
-                return result.model_dump()
-            return result
+            return _to_dict(result)
         except Exception as e:
-            print(f"Error scraping URL {url}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error scraping URL %s: %s", url, e)
             return None
 
     def crawl_website(self, url, max_pages=10, include_paths=None, exclude_paths=None):
-
+        """Start an asynchronous crawl; returns {'id': ..., 'url': ...} or None"""
         try:
             params = {
                 'limit': max_pages,
-                'scrapeOptions': {
-                    'formats': ['markdown', 'html'],
-                    'includeTags': ['title', 'meta', 'h1', 'h2', 'h3', 'p', 'article'],
-                    'excludeTags': ['nav', 'footer', 'script', 'style'],
+                'scrape_options': {
+                    'formats': ['markdown'],
+                    'include_tags': ['title', 'meta', 'h1', 'h2', 'h3', 'p', 'article'],
+                    'exclude_tags': ['nav', 'footer', 'script', 'style'],
                 }
             }
 
             if include_paths:
-                params['includePaths'] = include_paths
+                params['include_paths'] = include_paths
             if exclude_paths:
-                params['excludePaths'] = exclude_paths
+                params['exclude_paths'] = exclude_paths
 
-            result = self.app.start_crawl(url, params=params)
-            return result
+            result = self.app.start_crawl(url, **params)
+            return _to_dict(result)
         except Exception as e:
-            print(f"Error crawling website {url}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error crawling website %s: %s", url, e)
             return None
 
-    def get_crawl_status(self, job_id):
-
+    def get_crawl_status(self, job_id, skip=0):
+        """
+        Crawl progress as a dict: status, total, completed, and in data the
+        pages scraped so far from offset skip on. 'next' is set when more
+        pages are ready than one response holds.
+        """
+        # Straight to the API: the SDK's get_crawl_status downloads every page (all of them
+        # on each poll), where skip lets a poller fetch only the pages it has not seen
+        query = f"?{urllib.parse.urlencode({'skip': skip})}" if skip else ''
+        request = urllib.request.Request(
+            f"{self.api_url}/v2/crawl/{urllib.parse.quote(job_id)}{query}",
+            headers={'Authorization': f"Bearer {self.api_key}"}
+        )
         try:
-            return self.app.get_crawl_status(job_id)
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return json.load(response)
         except Exception as e:
-            print(f"Error getting crawl status for job {job_id}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error getting crawl status for job %s: %s", job_id, e)
             return None
 
     def search_web(self, query, max_results=5):
-
+        """Web search; returns a dict with the hits under 'web' (v2) or 'data' (v1)"""
         try:
-            result = self.app.search(query, params={'limit': max_results})
-            return result
+            result = self.app.search(query, limit=max_results)
+            return _to_dict(result)
         except Exception as e:
-            print(f"Error searching web for query '{query}': {str(e)}")
+            logger.error("Error searching web for query '%s': %s", query, e)
             return None
 
     def extract_structured_data(self, url, schema):
@@ -90,7 +111,5 @@ class FirecrawlService:
             )
             return result
         except Exception as e:
-            print(f"Error extracting structured data from {url}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error extracting structured data from %s: %s", url, e)
             return None
@@ -0,0 +1,198 @@
+"""
+Education-intent classifier for ChatbotService.
+
+Same decisions as the original per-word Levenshtein scan, but precomputed:
+an Aho-Corasick automaton finds any keyword substring in one pass over the
+query, and a SymSpell-style deletion index narrows fuzzy matching to the few
+keywords that can be within edit distance 2 of a query word.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from chatbot.caching import LRUCache
+
+EDUCATION_KEYWORDS = [
+    'university', 'universities', 'college', 'oxford', 'cambridge',
+    'student', 'admission', 'ucas', 'degree', 'tuition', 'fee',
+    'russell group', 'redbrick', 'accommodation', 'campus',
+    'undergraduate', 'postgraduate', 'phd', 'master', 'bachelor',
+    'lecture', 'semester', 'academic', 'education', 'study',
+    'scholarship', 'student loan', 'uk education', 'british university',
+    'imperial', 'lse', 'ucl', 'edinburgh', 'manchester', 'warwick',
+    'course', 'program', 'programme', 'faculty', 'department', 'school',
+    'a-level', 'gcse', 'btec', 'foundation', 'clearing',
+    'student visa', 'international student', 'home student',
+    'halls', 'library', 'dissertation', 'thesis',
+    'exam', 'assessment', 'grade', 'gpa', 'transcript',
+    # More UK universities
+    'durham', 'bristol', 'nottingham', 'leeds', 'liverpool',
+    'birmingham', 'glasgow', 'exeter', 'york', 'bath',
+    'st andrews', 'kings college', 'queen mary', 'southampton',
+    'newcastle', 'cardiff', 'sheffield', 'leicester',
+    # University types
+    'ancient', 'plate glass', 'civic', 'new university',
+    'russell', 'group of universities'
+]
+
+# Typo tolerance: edit distance 2 for keywords of 5+ chars, 1 for shorter ones
+MAX_EDIT_DISTANCE = 2
+MIN_FUZZY_WORD_LENGTH = 4
+
+
+def levenshtein_distance(s1: str, s2: str) -> int:
+    """Calculate Levenshtein distance between two strings"""
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    if not s2:
+        return len(s1)
+
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            current_row.append(min(
+                previous_row[j + 1] + 1,
+                current_row[j] + 1,
+                previous_row[j] + (c1 != c2)
+            ))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """All strings obtained by deleting up to max_distance characters"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: finds any of the patterns in one scan"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]
+
+        for pattern in patterns:
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                node = next_node
+            if self._output[node] is None:
+                self._output[node] = pattern
+
+        # Breadth-first failure links; a node inherits the output of its failure chain
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                if self._output[child] is None:
+                    self._output[child] = self._output[self._fail[child]]
+
+    def find_first(self, text: str) -> Optional[str]:
+        """Return a pattern occurring in text (the first one to end), or None"""
+        node = 0
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node] is not None:
+                return output[node]
+        return None
+
+
+class SymSpellIndex:
+    """Deletion index: maps every up-to-2-deletion variant to its keywords"""
+
+    def __init__(self, words: Iterable[str], max_distance: int = MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self._deletes: Dict[str, Set[str]] = {}
+        self._max_length = 0
+        for word in words:
+            self._max_length = max(self._max_length, len(word))
+            for variant in _deletes(word, max_distance):
+                self._deletes.setdefault(variant, set()).add(word)
+
+    def candidates(self, word: str) -> Set[str]:
+        """Keywords that may be within max_distance edits of word"""
+        if len(word) > self._max_length + self.max_distance:
+            return set()
+        found = set()
+        for variant in _deletes(word, self.max_distance):
+            keywords = self._deletes.get(variant)
+            if keywords:
+                found |= keywords
+        return found
+
+
+class KeywordIntentClassifier:
+    """Decides whether a query is about UK universities/education"""
+
+    def __init__(self, keywords: Iterable[str] = EDUCATION_KEYWORDS, cache_size: int = 4096):
+        self.keywords = list(keywords)
+        self._matcher = AhoCorasick(self.keywords)
+        # Only single-word keywords take part in fuzzy matching
+        self._fuzzy_index = SymSpellIndex(k for k in self.keywords if ' ' not in k)
+        self._fuzzy_cache = LRUCache(max_size=cache_size)
+
+    def classify(self, query: str) -> Tuple[bool, Optional[str], bool]:
+        """Return (is_education, matched keyword, matched fuzzily)"""
+        query_lower = query.lower()
+
+        # First check exact (substring) matches
+        keyword = self._matcher.find_first(query_lower)
+        if keyword is not None:
+            return True, keyword, False
+
+        # If no exact match, try fuzzy matching for spelling mistakes
+        for word in query_lower.split():
+            if len(word) < MIN_FUZZY_WORD_LENGTH:
+                continue
+            keyword = self._fuzzy_match(word)
+            if keyword:
+                return True, keyword, True
+
+        return False, None, False
+
+    def is_education_related(self, query: str) -> bool:
+        return self.classify(query)[0]
+
+    def _fuzzy_match(self, word: str) -> str:
+        """Keyword within typo distance of word ('' if none), memoized per word"""
+        cached = self._fuzzy_cache.get(word)
+        if cached is not None:
+            return cached
+
+        match = ''
+        for keyword in sorted(self._fuzzy_index.candidates(word)):
+            if abs(len(word) - len(keyword)) > MAX_EDIT_DISTANCE:
+                continue
+            max_distance = 2 if len(keyword) >= 5 else 1
+            if levenshtein_distance(word, keyword) <= max_distance:
+                match = keyword
+                break
+
+        self._fuzzy_cache.set(word, match)
+        return match
@@ -0,0 +1,232 @@
+"""
+In-process background jobs for the ingestion endpoints.
+
+Jobs are rows in the IngestionJob table, so any request (or worker) can
+read their status; the work runs on a small thread pool of its own, apart
+from the search executor, so chat keeps serving while a reload embeds.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from chatbot.models import IngestionJob
+
+logger = logging.getLogger(__name__)
+
+# A job function receives progress(processed, total) and returns a status message.
+# Raising marks the job as failed with the exception text.
+JobFunction = Callable[[Callable[[int, int], None]], str]
+
+
+class JobFailed(Exception):
+    """Raised by a job function to fail the job with a user-facing message"""
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _process_start_time(pid: int) -> Optional[str]:
+    """Start time of pid in clock ticks since boot (Linux), None where /proc has no answer"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Field 22; the command name (field 2) may hold spaces, so count from its closing ')'
+    fields = stat[stat.rfind(b')') + 2:].split()
+    return fields[19].decode() if len(fields) > 19 else None
+
+
+_runner_token: Optional[str] = None
+_runner_token_pid: Optional[int] = None
+
+
+def runner_token() -> str:
+    """
+    Identifies this process in job rows: 'pid:start-time', or 'pid:uuid' where
+    the start time is unknown. PIDs repeat across container restarts; the
+    start time tells a reused PID apart from the process that took the job.
+    """
+    global _runner_token, _runner_token_pid
+    pid = os.getpid()
+    if _runner_token_pid != pid:
+        # Forked workers inherit the master's token; each needs its own
+        _runner_token = f"{pid}:{_process_start_time(pid) or uuid.uuid4().hex}"
+        _runner_token_pid = pid
+    return _runner_token
+
+
+def _runner_alive(token: str) -> bool:
+    """Whether the process that wrote this runner token is still running"""
+    if token == runner_token():
+        return True
+    pid, _, start_time = token.partition(':')
+    if not pid.isdigit() or not _pid_alive(int(pid)):
+        return False
+    current = _process_start_time(int(pid))
+    if current is None or not start_time.isdigit():
+        # No start time to compare (no /proc, or a UUID token): the PID is all there is
+        return True
+    return current == start_time
+
+
+def is_orphaned(job: IngestionJob) -> bool:
+    """Whether an unfinished job's process is gone, so nothing will ever finish it"""
+    if job.status not in IngestionJob.UNFINISHED:
+        return False
+    if job.runner:
+        return not _runner_alive(job.runner)
+    # Rows from before runner tokens
+    return job.pid != os.getpid() and not _pid_alive(job.pid)
+
+
+class _ProgressReporter:
+    """
+    Progress callback that writes to the job row at most every `interval`
+    seconds. It is called from ingest-pool threads too; a failed write is
+    logged and never fails the ingestion.
+    """
+
+    def __init__(self, job_id: int, interval: float):
+        self.job_id = job_id
+        self.interval = interval
+        self._job_thread = threading.get_ident()
+        self.processed = 0
+        self.total = 0
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, processed: int, total: int):
+        with self._lock:
+            self.processed = processed
+            self.total = total
+            now = time.monotonic()
+            if processed < total and now - self._last_write < self.interval:
+                return
+            self._last_write = now
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            processed, total = self.processed, self.total
+        try:
+            IngestionJob.objects.filter(pk=self.job_id).update(processed=processed, total=total)
+        except Exception as e:
+            logger.warning("Could not record progress of job #%s: %s", self.job_id, e)
+        finally:
+            if threading.get_ident() != self._job_thread:
+                # Pool threads outlive the job and nothing else closes their connections
+                connections.close_all()
+
+
+class JobRunner:
+    """Runs job functions on a thread pool and records their outcome"""
+
+    def __init__(self, max_workers: int = 1, progress_interval: float = 0.5):
+        self.max_workers = max_workers
+        self.progress_interval = progress_interval
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: JobFunction, params: Optional[Dict] = None) -> IngestionJob:
+        """Create the job row and queue func; returns immediately"""
+        job = IngestionJob.objects.create(kind=kind, params=params or {}, pid=os.getpid(), runner=runner_token())
+        self._get_executor().submit(self._run, job.pk, func)
+        logger.info("Queued %s job #%s", kind, job.pk)
+        return job
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='ingestion-job'
+                    )
+        return self._executor
+
+    def _run(self, job_id: int, func: JobFunction):
+        close_old_connections()
+        try:
+            IngestionJob.objects.filter(pk=job_id).update(
+                status=IngestionJob.RUNNING, pid=os.getpid(), runner=runner_token(), started_at=timezone.now()
+            )
+            progress = _ProgressReporter(job_id, self.progress_interval)
+            try:
+                message = func(progress)
+                status = IngestionJob.SUCCEEDED
+            except Exception as e:
+                if not isinstance(e, JobFailed):
+                    logger.exception("Job #%s failed: %s", job_id, e)
+                message = str(e)
+                status = IngestionJob.FAILED
+            progress.flush()
+            IngestionJob.objects.filter(pk=job_id).update(
+                status=status, message=message or '', finished_at=timezone.now()
+            )
+            logger.info("Job #%s %s", job_id, status)
+        except Exception as e:
+            logger.exception("Could not record job #%s: %s", job_id, e)
+        finally:
+            close_old_connections()
+
+
+ORPHANED_MESSAGE = 'Interrupted: the server restarted before the job finished'
+
+
+def _fail_jobs(job_ids) -> int:
+    # The status filter leaves alone a job that finished since it was read
+    return IngestionJob.objects.filter(pk__in=job_ids, status__in=IngestionJob.UNFINISHED).update(
+        status=IngestionJob.FAILED, message=ORPHANED_MESSAGE, finished_at=timezone.now()
+    )
+
+
+def fail_orphaned_jobs() -> int:
+    """Mark unfinished jobs whose worker process is gone as failed"""
+    orphaned = [
+        job.pk for job in IngestionJob.objects.filter(status__in=IngestionJob.UNFINISHED)
+        if is_orphaned(job)
+    ]
+    return _fail_jobs(orphaned) if orphaned else 0
+
+
+def fail_if_orphaned(job: IngestionJob) -> IngestionJob:
+    """Fail an unfinished job whose process is gone; returns the job as now stored"""
+    if is_orphaned(job) and _fail_jobs([job.pk]):
+        logger.warning("Marked interrupted job #%s as failed", job.pk)
+        job.refresh_from_db()
+    return job
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Process-wide JobRunner, created (and orphaned jobs cleaned up) on first use"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                orphaned = fail_orphaned_jobs()
+                if orphaned:
+                    logger.warning("Marked %s interrupted jobs as failed", orphaned)
+                _runner = JobRunner(max_workers=settings.CHATBOT_JOB_WORKERS)
+    return _runner
@@ -0,0 +1,51 @@
+"""
+Logging handler that keeps stream I/O off the request path.
+
+Records are formatted by the calling thread and handed to a queue; a
+listener thread writes them to the stream, so a slow or blocked stdout
+pipe does not stall requests. The listener is started lazily in each
+process, which keeps the handler safe across pre-fork servers.
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+
+class BackgroundStreamHandler(logging.handlers.QueueHandler):
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.stream = stream
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._start_lock:
+            if self._pid == pid:
+                return
+            # A forked child inherits the queue but not the parent's listener thread
+            self.queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(
+                self.queue, logging.StreamHandler(self.stream or sys.stderr)
+            )
+            self._listener.start()
+            self._pid = pid
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        self.queue.put_nowait(record)
+
+    def close(self):
+        # Flushes queued records before the process exits (logging.shutdown closes handlers)
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+        super().close()
@@ -0,0 +1,49 @@
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.rag_server import create_server
+from chatbot.services import build_rag_service
+
+DEFAULT_ADDRESS = ('127.0.0.1', 8765)
+
+
+class Command(BaseCommand):
+    help = ("Serve embedding, search and ingestion from one process (the model and index live here). "
+            "Web workers use it when CHATBOT_RAG_SERVER_URL points at it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', help='host:port to listen on (default: from CHATBOT_RAG_SERVER_URL, '
+                                           'else 127.0.0.1:8765)')
+        parser.add_argument('--socket', help='listen on this Unix socket path instead')
+
+    def handle(self, *args, **options):
+        host, port = DEFAULT_ADDRESS
+        socket_path = options['socket']
+        url = urlsplit(settings.CHATBOT_RAG_SERVER_URL) if settings.CHATBOT_RAG_SERVER_URL else None
+        if options['bind']:
+            host, _, port_text = options['bind'].rpartition(':')
+            try:
+                port = int(port_text)
+            except ValueError:
+                raise CommandError(f"--bind must be host:port, got {options['bind']!r}")
+        elif not socket_path and url is not None:
+            if url.scheme == 'unix':
+                socket_path = url.path
+            else:
+                host, port = url.hostname or host, url.port or port
+
+        # Always the in-process service, even though CHATBOT_RAG_SERVER_URL is set for the web workers
+        self.stdout.write("Loading the embedding model and knowledge base...")
+        rag_service = build_rag_service()
+
+        server = create_server(rag_service, host=host, port=port, socket_path=socket_path)
+        where = f"unix://{socket_path}" if socket_path else f"http://{host}:{port}"
+        self.stdout.write(self.style.SUCCESS(f"RAG server listening on {where}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
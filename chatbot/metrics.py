@@ -0,0 +1,217 @@
+"""
+In-process metrics for the chat pipeline.
+
+Counters and histograms are kept in memory per worker process and
+rendered in the Prometheus text format by the /metrics/ view. timed(stage)
+records how long a pipeline stage took, both in the stage histogram and as
+a structured DEBUG log line (stage and duration_ms are also set as record
+attributes for JSON formatters).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the pipeline stages range from microseconds (cache hits) to seconds (cold embeddings)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count, optionally split by labels"""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def snapshot(self) -> Dict[LabelValues, Dict]:
+        """{label values: {'count', 'sum', 'buckets': [(bound, cumulative count)]}}"""
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        result = {}
+        for key, counts in values.items():
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                running += count
+                cumulative.append((bound, running))
+            result[key] = {'count': running, 'sum': counts[-1], 'buckets': cumulative}
+        return result
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        samples = []
+        for key, data in sorted(self.snapshot().items()):
+            for bound, count in data['buckets']:
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                samples.append((f"{self.name}_bucket", labels, count))
+            labels = _format_labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum", labels, data['sum']))
+            samples.append((f"{self.name}_count", labels, data['count']))
+        return samples
+
+
+class CallbackGauge:
+    """Gauge whose values are read from a callback at scrape time"""
+
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        try:
+            values = self.callback() or {}
+        except Exception:
+            logger.exception("Error collecting metric %s", self.name)
+            return []
+        return [
+            (self.name, _format_labels(self.labelnames, key), value)
+            for key, value in sorted(values.items()) if value is not None
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering a name (e.g. a module reloaded by the dev server) replaces it
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                       callback: Callable[[], Dict[LabelValues, float]]) -> CallbackGauge:
+        return self._register(CallbackGauge(name, documentation, labelnames, callback))
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'chatbot_stage_duration_seconds',
+    'Time spent in each chat pipeline stage',
+    ['stage']
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'chatbot_request_duration_seconds',
+    'End-to-end request latency by endpoint',
+    ['endpoint']
+)
+REQUESTS = REGISTRY.counter(
+    'chatbot_requests_total',
+    'Requests handled by endpoint and outcome',
+    ['endpoint', 'outcome']
+)
+
+
+@contextmanager
+def timed(stage: str, histogram: Histogram = STAGE_SECONDS):
+    """
+    Time the enclosed block as one pipeline stage. `stage` fills the
+    histogram's single label, e.g. the endpoint for REQUEST_SECONDS.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **{histogram.labelnames[0]: stage})
+        if logger.isEnabledFor(logging.DEBUG):
+            duration_ms = elapsed * 1000.0
+            logger.debug("stage=%s duration_ms=%.3f", stage, duration_ms,
+                         extra={'stage': stage, 'duration_ms': duration_ms})
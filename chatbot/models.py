@@ -0,0 +1,53 @@
+from django.db import models
+
+
+class IngestionJob(models.Model):
+    """A background reload/refetch/web ingestion run and its progress"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    UNFINISHED = (PENDING, RUNNING)
+
+    kind = models.CharField(max_length=32)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    # Chunks processed out of total (total grows as pages are scraped)
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True)
+    # Worker process running the job, used to spot jobs orphaned by a restart
+    pid = models.PositiveIntegerField(null=True, blank=True)
+    # That process's runner token (PID plus start time), so a reused PID is not taken for it
+    runner = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    def to_dict(self):
+        return {
+            'id': self.pk,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'message': self.message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'done': self.status not in self.UNFINISHED
+        }
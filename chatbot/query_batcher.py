@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent single-query calls into batches.
+
+    Callers block in submit(item); a background thread collects items that
+    arrive within `window_ms` of the first one (or until `max_batch` items
+    are waiting), hands them to `process_batch(items) -> results` in one
+    call, and gives each caller its own result back.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]],
+                 window_ms: float = 5.0, max_batch: int = 16, name: str = 'query-batcher'):
+        self.process_batch = process_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.name = name
+        self._pending: List = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._histogram: Dict[int, int] = {}
+
+    def submit(self, item) -> Any:
+        """Queue one item and wait for its result (re-raises the batch's error)"""
+        future = Future()
+        with self._condition:
+            self._ensure_thread()
+            self._pending.append((item, future))
+            self._condition.notify()
+        return future.result()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork(), so a forked worker starts its own
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self._histogram[len(batch)] = self._histogram.get(len(batch), 0) + 1
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Batch-size histogram and totals"""
+        with self._condition:
+            histogram = dict(sorted(self._histogram.items()))
+        batches = sum(histogram.values())
+        items = sum(size * count for size, count in histogram.items())
+        return {
+            'window_ms': self.window * 1000.0,
+            'max_batch': self.max_batch,
+            'batches': batches,
+            'queries': items,
+            'mean_batch_size': items / batches if batches else 0.0,
+            'batch_size_histogram': histogram
+        }
@@ -0,0 +1,313 @@
+"""
+Client for the standalone RAG server (rag_server.py).
+
+RemoteRAGService has the EnhancedRAGService methods that ChatbotService and
+the views use. Each call goes over a pooled keep-alive connection to the
+server, so web workers hold no model or index of their own.
+"""
+import asyncio
+import functools
+import http.client
+import json
+import logging
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from chatbot.rag_server import HEARTBEAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class RemoteRAGError(Exception):
+    """The RAG server could not be reached or rejected a call"""
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class _ConnectionPool:
+    """
+    Idle keep-alive connections, reused most-recent first. Callers never
+    wait: a new connection opens when none is idle, and at most `size` are
+    kept afterwards.
+    """
+
+    def __init__(self, connect: Callable[[], http.client.HTTPConnection], size: int = 8):
+        self.connect = connect
+        self.size = max(1, size)
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """(connection, reused)"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self.connect(), False
+
+    def put(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def clear(self, close: bool = True):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        if close:
+            for connection in idle:
+                connection.close()
+
+
+class RemoteRAGService:
+    """
+    EnhancedRAGService interface backed by a RAG server at `url`
+    (http://host:port or unix:///path/to.sock).
+    """
+
+    def __init__(self, url: str, pool_size: int = 8, timeout: float = 30.0,
+                 version_ttl: float = 1.0):
+        self.url = url
+        self.timeout = timeout
+        parts = urlsplit(url)
+        if parts.scheme == 'unix':
+            socket_path = parts.path
+            self._connect = lambda timeout=timeout: _UnixHTTPConnection(socket_path, timeout=timeout)
+        elif parts.scheme == 'http':
+            host, port = parts.hostname, parts.port or 80
+            self._connect = lambda timeout=timeout: http.client.HTTPConnection(host, port, timeout=timeout)
+        else:
+            raise ValueError(f"RAG server URL must be http:// or unix://, got {url!r}")
+        self.pool = _ConnectionPool(self._connect, size=pool_size)
+
+        # The corpus version keys the response cache; re-checked at most every version_ttl seconds.
+        # None until the server has told us, and responses are not cached meanwhile
+        self.version_ttl = version_ttl
+        self._corpus_version: Optional[str] = None
+        self._version_checked = 0.0
+        self._version_refreshing = False
+        self._version_lock = threading.Lock()
+
+    def _note_version(self, response):
+        version = response.getheader('X-Corpus-Version')
+        if version:
+            self._corpus_version = version
+            self._version_checked = time.monotonic()
+
+    def _request(self, method: str, path: str, payload=None, retry: bool = True):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection, reused = self.pool.get()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            if reused and retry:
+                # The server may have closed idle keep-alive connections (e.g. it restarted);
+                # drop them and try once more on a fresh one
+                self.pool.clear()
+                return self._request(method, path, payload, retry=False)
+            raise RemoteRAGError(f"RAG server {self.url} unavailable: {e}") from e
+
+        self._note_version(response)
+        if response.will_close:
+            connection.close()
+        else:
+            self.pool.put(connection)
+        return response.status, data
+
+    def _call(self, method: str, retry: bool = True, **kwargs):
+        status, data = self._request('POST', f"/call/{method}", kwargs, retry=retry)
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            raise RemoteRAGError(f"RAG server returned HTTP {status} for {method}")
+        if status != 200:
+            raise RemoteRAGError(f"{method} failed: {payload.get('error', status)}")
+        return payload['result']
+
+    def _call_with_progress(self, method: str, progress_callback=None, **kwargs):
+        """Long-running call on its own connection, relaying streamed progress"""
+        # The server sends a line at least every HEARTBEAT_INTERVAL; silence for longer means it is gone
+        connection = self._connect(timeout=max(self.timeout, 3 * HEARTBEAT_INTERVAL))
+        try:
+            connection.request('POST', f"/call/{method}", body=json.dumps(kwargs).encode('utf-8'),
+                               headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            if response.status != 200:
+                raise RemoteRAGError(f"{method} failed: HTTP {response.status} {response.read()[:200]!r}")
+            for line in response:
+                message = json.loads(line)
+                if 'progress' in message:
+                    if progress_callback:
+                        progress_callback(*message['progress'])
+                elif 'error' in message:
+                    raise RemoteRAGError(f"{method} failed: {message['error']}")
+                elif 'result' in message:
+                    self._version_checked = 0.0
+                    return message['result']
+            raise RemoteRAGError(f"{method}: RAG server closed the stream without a result")
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            raise RemoteRAGError(f"{method} failed: {e}") from e
+        finally:
+            connection.close()
+
+    async def _run_in_thread(self, func, *args, **kwargs):
+        return await asyncio.to_thread(functools.partial(func, *args, **kwargs))
+
+    @property
+    def corpus_version(self) -> Optional[str]:
+        """
+        Current knowledge base version on the server (cached for version_ttl
+        seconds), or None while it is unknown. On an event loop a stale value
+        is refreshed in the background rather than waited for, so a slow
+        server cannot stall it.
+        """
+        if time.monotonic() - self._version_checked > self.version_ttl:
+            if _on_event_loop():
+                self._refresh_version_in_background()
+            else:
+                self._refresh_version()
+        return self._corpus_version
+
+    def _refresh_version(self):
+        try:
+            self._request('GET', '/health')
+        except RemoteRAGError as e:
+            logger.warning("Could not refresh corpus version: %s", e)
+            # Back off for one version_ttl rather than retrying on every call
+            self._version_checked = time.monotonic()
+
+    def _refresh_version_in_background(self):
+        with self._version_lock:
+            if self._version_refreshing:
+                return
+            self._version_refreshing = True
+
+        def refresh():
+            try:
+                self._refresh_version()
+            finally:
+                self._version_refreshing = False
+
+        threading.Thread(target=refresh, name='rag-version-refresh', daemon=True).start()
+
+    def ping(self) -> bool:
+        """True if the server answers its health check"""
+        try:
+            status, _ = self._request('GET', '/health')
+        except RemoteRAGError:
+            return False
+        return status == 200
+
+    def after_fork(self):
+        """Connections must not be shared with the parent; the child opens its own"""
+        self.pool = _ConnectionPool(self._connect, size=self.pool.size)
+        # A refresh thread in the parent did not survive the fork
+        self._version_lock = threading.Lock()
+        self._version_refreshing = False
+
+    # Queries
+
+    def embed_query(self, query: str) -> List[float]:
+        return self._call('embed_query', query=query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        return await self._run_in_thread(self.embed_query, query)
+
+    def topic_similarity(self, query_embedding: List[float]) -> Optional[float]:
+        return self._call('topic_similarity', query_embedding=query_embedding)
+
+    def search(self, query: str, n_results: int = 8, source_filter: Optional[str] = None,
+               query_embedding: Optional[List[float]] = None, mode: Optional[str] = None) -> List[str]:
+        return self._call('search', query=query, n_results=n_results, source_filter=source_filter,
+                          query_embedding=query_embedding, mode=mode)
+
+    def search_documents(self, query: str, n_results: int = 8, source_filter: Optional[str] = None,
+                         query_embedding: Optional[List[float]] = None,
+                         mode: Optional[str] = None) -> List[Dict]:
+        return self._call('search_documents', query=query, n_results=n_results, source_filter=source_filter,
+                          query_embedding=query_embedding, mode=mode)
+
+    async def asearch(self, query: str, n_results: int = 8, source_filter: Optional[str] = None,
+                      query_embedding: Optional[List[float]] = None, mode: Optional[str] = None) -> List[str]:
+        return await self._run_in_thread(self.search, query, n_results=n_results, source_filter=source_filter,
+                                         query_embedding=query_embedding, mode=mode)
+
+    async def asearch_documents(self, query: str, n_results: int = 8, source_filter: Optional[str] = None,
+                                query_embedding: Optional[List[float]] = None,
+                                mode: Optional[str] = None) -> List[Dict]:
+        return await self._run_in_thread(self.search_documents, query, n_results=n_results,
+                                         source_filter=source_filter, query_embedding=query_embedding, mode=mode)
+
+    def get_sources(self, query: str, n_results: int = 5,
+                    query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        return self._call('get_sources', query=query, n_results=n_results, query_embedding=query_embedding)
+
+    async def aget_sources(self, query: str, n_results: int = 5,
+                           query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        return await self._run_in_thread(self.get_sources, query, n_results=n_results,
+                                         query_embedding=query_embedding)
+
+    # Stats
+
+    def get_stats(self) -> Dict:
+        return self._call('get_stats')
+
+    def get_cache_stats(self) -> Dict:
+        return self._call('get_cache_stats')
+
+    def get_batching_stats(self) -> Optional[Dict]:
+        return self._call('get_batching_stats')
+
+    def get_search_cache_stats(self) -> Dict:
+        return self._call('get_search_cache_stats')
+
+    def get_scrape_cache_stats(self) -> Optional[Dict]:
+        return self._call('get_scrape_cache_stats')
+
+    # Ingestion (runs in the server, so every web worker sees the result)
+
+    def reload_data(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        return self._call_with_progress('reload_data', progress_callback)
+
+    def refetch_and_reload_data(self, url: str = None,
+                                progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        kwargs = {'url': url} if url else {}
+        return self._call_with_progress('refetch_and_reload_data', progress_callback, **kwargs)
+
+    def add_web_content(self, url: str, max_pages: int = 1,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        return self._call_with_progress('add_web_content', progress_callback, url=url, max_pages=max_pages)
+
+    def add_search_content(self, query: str, max_results: int = 5,
+                           progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        return self._call_with_progress('add_search_content', progress_callback,
+                                        query=query, max_results=max_results)
+
+    def clear_web_content(self):
+        self._call('clear_web_content', retry=False)
+        self._version_checked = 0.0
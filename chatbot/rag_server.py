@@ -0,0 +1,191 @@
+"""
+Standalone RAG server: one process holds the embedding model and the index
+and serves the EnhancedRAGService interface to any number of web workers.
+
+Run it with `python manage.py rag_server` and point the web workers at it
+with CHATBOT_RAG_SERVER_URL. They then use RemoteRAGService (rag_client.py)
+and load neither chromadb nor the model. It listens on loopback HTTP or
+on a Unix socket, and is not meant to be exposed beyond the host.
+
+Protocol (HTTP/1.1, keep-alive, JSON):
+    POST /call/<method>   body: keyword arguments
+        -> 200 {"result": ...}        400/404/500 {"error": "..."}
+    Ingestion methods stream newline-delimited JSON instead:
+        {"progress": [processed, total]} ... then {"result": ...} or {"error": ...}
+        with {"heartbeat": true} every HEARTBEAT_INTERVAL seconds, so clients
+        can time out a server that died mid-ingest
+    GET /health, GET /metrics (Prometheus text)
+Every response carries the corpus version in X-Corpus-Version.
+
+Requests are handled on threads, so with CHATBOT_BATCH_WINDOW_MS > 0 the
+service's QueryBatcher coalesces concurrent queries from all web workers
+into shared forward passes.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chatbot.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Methods callable over the wire; everything else on the service stays private
+READ_METHODS = (
+    'embed_query', 'topic_similarity', 'search', 'search_documents', 'get_sources',
+    'get_stats', 'get_cache_stats', 'get_batching_stats', 'get_search_cache_stats',
+    'get_scrape_cache_stats'
+)
+# Long-running writes that take a progress_callback and stream progress back
+PROGRESS_METHODS = ('reload_data', 'refetch_and_reload_data', 'add_web_content', 'add_search_content')
+WRITE_METHODS = ('clear_web_content',)
+
+MAX_BODY_BYTES = 1 << 20
+
+# Seconds between heartbeat lines on a streamed (ingestion) response
+HEARTBEAT_INTERVAL = 10.0
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ChatbotRAG/1.0'
+    # Buffer so headers and body leave in one write (see handle_one_request's flush)
+    wbufsize = 64 * 1024
+
+    def setup(self):
+        super().setup()
+        if self.server.address_family in (socket.AF_INET, socket.AF_INET6):
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        logger.debug("rag_server %s", format % args)
+
+    @property
+    def service(self):
+        return self.server.rag_service
+
+    def _send_json(self, status: int, payload, content_type: str = 'application/json'):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Corpus-Version', self.service.corpus_version)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'pid': os.getpid()})
+        elif self.path == '/metrics':
+            self._send_json(200, REGISTRY.render().encode('utf-8'),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+        else:
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        method = self.path[len('/call/'):] if self.path.startswith('/call/') else ''
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {'error': 'request body too large'})
+            return
+        try:
+            kwargs = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(kwargs, dict):
+                raise ValueError('body must be a JSON object of keyword arguments')
+        except ValueError as e:
+            self._send_json(400, {'error': f"invalid request body: {e}"})
+            return
+
+        if method in PROGRESS_METHODS:
+            self._call_streaming(method, kwargs)
+        elif method in READ_METHODS or method in WRITE_METHODS:
+            self._call(method, kwargs)
+        else:
+            self._send_json(404, {'error': f"unknown method {method!r}"})
+
+    def _call(self, method: str, kwargs):
+        try:
+            result = getattr(self.service, method)(**kwargs)
+        except TypeError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            logger.exception("Error in %s: %s", method, e)
+            self._send_json(500, {'error': str(e)})
+            return
+        self._send_json(200, {'result': result})
+
+    def _write_chunk(self, payload):
+        """Send one NDJSON line of a chunked response (progress may come from worker threads)"""
+        data = (json.dumps(payload) + '\n').encode('utf-8')
+        with self._stream_lock:
+            if self._client_gone:
+                return
+            try:
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+            except OSError:
+                # Keep going: an ingestion should finish even if the caller stopped listening
+                self._client_gone = True
+                self.close_connection = True
+
+    def _call_streaming(self, method: str, kwargs):
+        self._stream_lock = threading.Lock()
+        self._client_gone = False
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def progress(processed: int, total: int):
+            self._write_chunk({'progress': [processed, total]})
+
+        # Crawls and searches can go a long time between progress updates
+        finished = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(HEARTBEAT_INTERVAL):
+                self._write_chunk({'heartbeat': True})
+
+        heartbeat_thread = threading.Thread(target=heartbeat, name='rag-heartbeat', daemon=True)
+        heartbeat_thread.start()
+        try:
+            result = getattr(self.service, method)(progress_callback=progress, **kwargs)
+            self._write_chunk({'result': result})
+        except Exception as e:
+            logger.exception("Error in %s: %s", method, e)
+            self._write_chunk({'error': str(e)})
+        finally:
+            finished.set()
+            heartbeat_thread.join()
+        if not self._client_gone:
+            try:
+                self.wfile.write(b"0\r\n\r\n")
+            except OSError:
+                self.close_connection = True
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # HTTPServer.server_bind resolves a host name, which a socket path does not have
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def create_server(rag_service, host: str = '127.0.0.1', port: int = 8765, socket_path=None):
+    """HTTP server for rag_service on host:port, or on a Unix socket when socket_path is given"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = _ThreadingUnixHTTPServer(socket_path, RAGRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), RAGRequestHandler)
+    server.rag_service = rag_service
+    return server
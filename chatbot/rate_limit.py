@@ -0,0 +1,29 @@
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least `min_interval` seconds.
+    Each caller reserves the next free slot for its host, so concurrent
+    scrapers of one site queue up while other hosts proceed immediately.
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        self.min_interval = max(0.0, min_interval)
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> float:
+        """Block until a request to url's host is allowed; returns the seconds waited"""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
@@ -0,0 +1,94 @@
+"""
+On-disk cache of scraped pages, one JSON file per URL.
+
+Each entry keeps the page markdown, its title, a hash of the markdown and
+when it was fetched. Fresh entries (younger than the TTL) are served
+without calling Firecrawl; after a refetch the hash tells callers whether
+the page changed, so unchanged pages skip cleaning and embedding.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+def content_hash(markdown: str) -> str:
+    return hashlib.sha256((markdown or '').encode('utf-8')).hexdigest()
+
+
+class ScrapeCache:
+    def __init__(self, directory: str, ttl: Optional[float] = 86400.0):
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Cached entry for url (fresh or not), or None"""
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def is_fresh(self, entry: Dict) -> bool:
+        if self.ttl is None:
+            return True
+        return time.time() - entry.get('fetched_at', 0) < self.ttl
+
+    def get_fresh(self, url: str) -> Optional[Dict]:
+        """Cached entry if it is younger than the TTL, counting hits and misses"""
+        entry = self.get(url)
+        fresh = entry is not None and self.is_fresh(entry)
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry if fresh else None
+
+    def put(self, url: str, scraped_data: Dict) -> bool:
+        """Store a scrape result; returns True if its content differs from the cached copy"""
+        markdown = scraped_data.get('markdown') or ''
+        digest = content_hash(markdown)
+        previous = self.get(url)
+        entry = {
+            'url': url,
+            'markdown': markdown,
+            'title': (scraped_data.get('metadata') or {}).get('title') or 'Unknown',
+            'content_hash': digest,
+            'fetched_at': time.time()
+        }
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        return previous is None or previous.get('content_hash') != digest
+
+    @staticmethod
+    def as_scraped(entry: Dict) -> Dict:
+        """Entry in the shape FirecrawlService.scrape_url returns"""
+        return {
+            'markdown': entry['markdown'],
+            'metadata': {'title': entry.get('title') or 'Unknown', 'source_url': entry['url']}
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'ttl': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0
+        }
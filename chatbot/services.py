@@ -0,0 +1,241 @@
+"""
+Process-wide chatbot services, built on first use.
+
+Importing the views (and so running migrate, check or a shell) no longer
+loads chromadb, the embedding model or the corpus. The first request or
+an explicit warm_up() builds EnhancedRAGService and ChatbotService once per
+process. Concurrent callers wait for that one build rather than starting
+their own.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+COLD = 'cold'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def build_rag_service():
+    """EnhancedRAGService from settings, holding the model and index in this process"""
+    # Heavy imports (chromadb, sentence-transformers) happen here, not at import time
+    from chatbot.enhanced_rag_service import DEFAULT_SEARCH_MODE, EnhancedRAGService
+
+    data_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'universities_data.txt')
+    return EnhancedRAGService(
+        data_file,
+        persist_directory=settings.CHATBOT_VECTOR_STORE_DIR or None,
+        chunk_size=settings.CHATBOT_CHUNK_SIZE,
+        embedding_model=settings.CHATBOT_EMBEDDING_MODEL,
+        embedding_backend=settings.CHATBOT_EMBEDDING_BACKEND,
+        embedding_threads=settings.CHATBOT_EMBEDDING_THREADS,
+        query_cache_size=settings.CHATBOT_QUERY_CACHE_SIZE,
+        query_cache_ttl=settings.CHATBOT_QUERY_CACHE_TTL,
+        embed_batch_size=settings.CHATBOT_EMBED_BATCH_SIZE,
+        ingest_workers=settings.CHATBOT_INGEST_WORKERS,
+        search_mode=settings.CHATBOT_SEARCH_MODE or DEFAULT_SEARCH_MODE,
+        search_workers=settings.CHATBOT_SEARCH_WORKERS,
+        batch_window_ms=settings.CHATBOT_BATCH_WINDOW_MS,
+        batch_max_size=settings.CHATBOT_BATCH_MAX_SIZE,
+        scrape_workers=settings.CHATBOT_SCRAPE_WORKERS,
+        scrape_host_interval=settings.CHATBOT_SCRAPE_HOST_INTERVAL,
+        search_cache_ttl=settings.CHATBOT_SEARCH_CACHE_TTL,
+        scrape_cache_dir=settings.CHATBOT_SCRAPE_CACHE_DIR or None,
+        scrape_cache_ttl=settings.CHATBOT_SCRAPE_CACHE_TTL
+    )
+
+
+def build_services() -> Tuple[object, object]:
+    """
+    Build (rag_service, chatbot_service) from settings. With
+    CHATBOT_RAG_SERVER_URL set, retrieval goes to the RAG server and this
+    process loads no model or index.
+    """
+    from chatbot.caching import create_cache
+    from chatbot.chatbot_service import ChatbotService
+
+    if settings.CHATBOT_RAG_SERVER_URL:
+        from chatbot.rag_client import RemoteRAGService
+        rag_service = RemoteRAGService(
+            settings.CHATBOT_RAG_SERVER_URL,
+            pool_size=settings.CHATBOT_RAG_SERVER_POOL_SIZE,
+            timeout=settings.CHATBOT_RAG_SERVER_TIMEOUT
+        )
+        # Learn the corpus version now, off the event loop (builds run in a thread)
+        if not rag_service.ping():
+            logger.warning("RAG server %s is not answering yet", settings.CHATBOT_RAG_SERVER_URL)
+    else:
+        rag_service = build_rag_service()
+    response_cache = create_cache(
+        settings.CHATBOT_RESPONSE_CACHE,
+        max_size=settings.CHATBOT_RESPONSE_CACHE_SIZE,
+        ttl=settings.CHATBOT_RESPONSE_CACHE_TTL
+    )
+    chatbot_service = ChatbotService(
+        rag_service,
+        response_cache=response_cache,
+        topic_gate=settings.CHATBOT_TOPIC_GATE,
+        topic_threshold=settings.CHATBOT_TOPIC_THRESHOLD
+    )
+    return rag_service, chatbot_service
+
+
+class ServiceRegistry:
+    """
+    Holds the services of this process and builds them once.
+    A failed build is not retried on every request (it would reload the
+    model each time) but after a backoff that doubles with each failure,
+    from retry_backoff up to max_retry_backoff seconds.
+    """
+
+    def __init__(self, factory: Callable[[], Tuple[object, object]] = build_services,
+                 retry_backoff: float = 5.0, max_retry_backoff: float = 300.0):
+        self.factory = factory
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.state = COLD
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.failures = 0
+        self.retry_at: Optional[float] = None
+        self._rag_service = None
+        self._chatbot_service = None
+        self._lock = threading.Lock()
+
+    def _should_build(self) -> bool:
+        if self.state == COLD:
+            return True
+        return self.state == FAILED and time.monotonic() >= self.retry_at
+
+    def _ensure(self):
+        if not self._should_build():
+            return
+        with self._lock:
+            if not self._should_build():
+                return
+            self.state = LOADING
+            started = time.perf_counter()
+            try:
+                self._rag_service, self._chatbot_service = self.factory()
+                self.load_seconds = time.perf_counter() - started
+                self.state = READY
+                self.error = None
+                self.failures = 0
+                self.retry_at = None
+                logger.info("Services initialized in %.1fs", self.load_seconds)
+            except Exception as e:
+                self.failures += 1
+                delay = min(self.max_retry_backoff, self.retry_backoff * 2 ** (self.failures - 1))
+                logger.exception("Error initializing services (retrying in %.1fs): %s", delay, e)
+                self.error = str(e)
+                self.retry_at = time.monotonic() + delay
+                self.state = FAILED
+
+    def get_rag_service(self):
+        """EnhancedRAGService, built on first call (None if initialization failed)"""
+        self._ensure()
+        return self._rag_service
+
+    def get_chatbot_service(self):
+        """ChatbotService, built on first call (None if initialization failed)"""
+        self._ensure()
+        return self._chatbot_service
+
+    async def aget_rag_service(self):
+        """get_rag_service() that builds in a thread rather than on the event loop"""
+        if self.state != READY:
+            await asyncio.to_thread(self._ensure)
+        return self._rag_service
+
+    async def aget_chatbot_service(self):
+        """get_chatbot_service() that builds in a thread rather than on the event loop"""
+        if self.state != READY:
+            await asyncio.to_thread(self._ensure)
+        return self._chatbot_service
+
+    def peek(self) -> Tuple[object, object]:
+        """(rag_service, chatbot_service) if already built, without building them"""
+        if self.state != READY:
+            return None, None
+        return self._rag_service, self._chatbot_service
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def warm_up(self, background: bool = False) -> bool:
+        """Build the services now, or in a daemon thread; returns whether they are ready"""
+        if background:
+            if self._should_build():
+                threading.Thread(target=self._ensure, name='chatbot-warm-up', daemon=True).start()
+            return self.ready
+        self._ensure()
+        return self.ready
+
+    def reset(self):
+        """Forget the services (and any failure) so the next use builds them again"""
+        with self._lock:
+            self._rag_service = None
+            self._chatbot_service = None
+            self.state = COLD
+            self.error = None
+            self.load_seconds = None
+            self.failures = 0
+            self.retry_at = None
+
+    def after_fork(self):
+        """Fix up state inherited through fork() (called in the child)"""
+        # A warm-up thread may have held the lock at fork time, and it did not survive
+        self._lock = threading.Lock()
+        if self.state == LOADING:
+            logger.warning("Forked while services were loading; building them again in this process")
+            self._rag_service = None
+            self._chatbot_service = None
+            self.state = COLD
+        elif self.state == READY and hasattr(self._rag_service, 'after_fork'):
+            try:
+                self._rag_service.after_fork()
+            except Exception as e:
+                logger.exception("Error preparing inherited services, rebuilding them: %s", e)
+                self._rag_service = None
+                self._chatbot_service = None
+                self.state = COLD
+
+    def status(self) -> Dict:
+        retry_in = max(0.0, self.retry_at - time.monotonic()) if self.state == FAILED else None
+        return {
+            'state': self.state, 'error': self.error, 'load_seconds': self.load_seconds,
+            'failures': self.failures, 'retry_in': retry_in, 'pid': os.getpid()
+        }
+
+
+_registry: Optional[ServiceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_service_registry() -> ServiceRegistry:
+    """Process-wide ServiceRegistry (creating it is cheap; services are built on use)"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ServiceRegistry()
+    return _registry
+
+
+def _after_fork_in_child():
+    if _registry is not None:
+        _registry.after_fork()
+
+
+# Pre-forking servers (gunicorn --preload) build the services once in the master;
+# each worker fixes up its inherited copy instead of loading its own
+os.register_at_fork(after_in_child=_after_fork_in_child)
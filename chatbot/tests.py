@@ -0,0 +1,108 @@
+"""
+Search-and-add ingestion against the local Firecrawl stand-in
+(benchmarks/stub_firecrawl.py), with a stub embedding function in place of
+the sentence-transformers model: no network, API key or model download.
+
+    python manage.py test chatbot
+"""
+import hashlib
+import math
+import os
+import re
+import tempfile
+import uuid
+from typing import List
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from benchmarks.stub_firecrawl import StubFirecrawlService
+from chatbot import enhanced_rag_service
+from chatbot.embeddings import SharedEmbeddingFunction
+from chatbot.enhanced_rag_service import EnhancedRAGService
+
+CORPUS = (
+    "The University of Oxford is a collegiate research university in Oxford, England.\n\n"
+    "The University of Cambridge is a collegiate research university in Cambridge, England.\n\n"
+    "University College London is a public research university in London, England.\n"
+)
+
+
+class StubEmbeddingFunction(SharedEmbeddingFunction):
+    """Hashed bag-of-words vectors: deterministic, instant, and no model to load"""
+
+    DIMENSIONS = 32
+
+    @property
+    def model(self):
+        return self
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            # The constant first component keeps every vector non-zero for cosine distance
+            vector = [1.0] + [0.0] * (self.DIMENSIONS - 1)
+            for word in re.findall(r'[a-z0-9]+', text.lower()):
+                digest = hashlib.md5(word.encode('utf-8')).digest()
+                vector[1 + digest[0] % (self.DIMENSIONS - 1)] += 1.0
+            norm = math.sqrt(sum(x * x for x in vector))
+            vectors.append([x / norm for x in vector])
+        return vectors
+
+
+class SearchIngestionTests(SimpleTestCase):
+    query = 'uk university admissions'
+    results = 6
+    host_interval = 0.2
+
+    def setUp(self):
+        patcher = mock.patch.object(enhanced_rag_service, 'SharedEmbeddingFunction', StubEmbeddingFunction)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        data_file = os.path.join(tmp.name, 'universities_data.txt')
+        with open(data_file, 'w', encoding='utf-8') as f:
+            f.write(CORPUS)
+
+        self.firecrawl = StubFirecrawlService(latency=0.01)
+        # In-memory Chroma clients share one store per process, so each test gets its own collection
+        self.rag = EnhancedRAGService(
+            data_file, collection_name=f"test_{uuid.uuid4().hex[:8]}", firecrawl=self.firecrawl,
+            scrape_workers=4, scrape_host_interval=self.host_interval
+        )
+
+    def test_pages_record_the_search_query(self):
+        pages = self.rag.add_search_content(self.query, max_results=self.results)
+
+        self.assertEqual(pages, self.results)
+        tagged = self.rag.collection.get(where={'search_query': self.query}, include=['metadatas'])
+        self.assertTrue(tagged['ids'])
+        sources = {metadata['source'] for metadata in tagged['metadatas']}
+        self.assertEqual(len(sources), self.results)
+        for metadata in tagged['metadatas']:
+            self.assertEqual(metadata['search_query'], self.query)
+
+    def test_repeat_search_reuses_the_cached_hits(self):
+        self.rag.add_search_content(self.query, max_results=self.results)
+        chunks = self.rag.collection.count()
+        pages = self.rag.add_search_content(self.query, max_results=self.results)
+
+        self.assertEqual(pages, self.results)
+        self.assertEqual(self.firecrawl.calls.get('search_web'), 1)
+        # Re-scraped pages replace their chunks rather than adding copies
+        self.assertEqual(self.rag.collection.count(), chunks)
+
+    def test_scrapes_of_one_host_are_spaced(self):
+        self.rag.add_search_content(self.query, max_results=self.results)
+
+        scrapes_by_host = {}
+        for at, url in sorted(self.firecrawl.scrape_log):
+            scrapes_by_host.setdefault(url.split('/')[2], []).append(at)
+        self.assertEqual(len(scrapes_by_host), len(self.firecrawl.hosts))
+        for host, times in scrapes_by_host.items():
+            self.assertGreater(len(times), 1, host)
+            for earlier, later in zip(times, times[1:]):
+                # Small allowance for monotonic clock and sleep granularity
+                self.assertGreaterEqual(later - earlier, self.host_interval * 0.95, host)
@@ -0,0 +1,51 @@
+"""
+Shared text cleaner for scraped Wikipedia/markdown content.
+
+Used by both ingestion (EnhancedRAGService) and the response path
+(ChatbotService). Patterns are compiled once at import and merged into
+a handful of passes instead of ~30 sequential re.sub calls.
+"""
+import re
+
+# Pass 1: citations and Wikipedia editorial tags (backslash escapes already stripped)
+#   [1] [183]  [[183]]  [_citation needed_]  (_[...]_)  [update]  [when?]  [who?]
+_CITATIONS_RE = re.compile(
+    r'\[\[\d+\]\]'
+    r'|\[\d+\]'
+    r'|\[_\[?[^\]]+_?\]\]'
+    r'|\(_\[[^\]]+\]_?\)'
+    r'|\[_[^\]]+_\]'
+    r'|\[(?:[a-zA-Z\s]+|when\?|who\?|which\?)\]'
+)
+
+# Pass 2: standalone _] or [_ left behind by the tags above ("[_]" keeps its "[")
+_UNDERSCORE_BRACKETS_RE = re.compile(r'_\]|\[_(?!\])')
+
+# Pass 3: citation anchors like #cite_note-211 and URLs
+_LINKS_RE = re.compile(
+    r'#cite[^\s\)]+'
+    r'|https?://[^\s]+'
+    r'|www\.[^\s]+'
+    r'|org/wiki/[^\s\)]+'
+    r'|en\.wikipedia\.org[^\s\)]+'
+)
+
+# Pass 4: empty brackets and parentheses left after the removals
+_EMPTY_BRACKETS_RE = re.compile(r'\(\s*\)|\[\s*\]')
+
+# Pass 5: no space before punctuation (runs after whitespace is collapsed)
+_SPACE_BEFORE_PUNCT_RE = re.compile(r' ([.,;:!?])')
+
+
+def clean_text(text: str) -> str:
+    """Remove citations, editorial tags, URLs and extra whitespace"""
+    # Markdown escapes go first so no pattern needs optional backslashes
+    text = text.replace('\\', '')
+    text = _CITATIONS_RE.sub('', text)
+    text = _UNDERSCORE_BRACKETS_RE.sub('', text)
+    text = text.replace('_', '')
+    text = _LINKS_RE.sub('', text)
+    text = _EMPTY_BRACKETS_RE.sub('', text)
+    # str.split() collapses the same whitespace as \s+ and strips both ends
+    text = ' '.join(text.split())
+    return _SPACE_BEFORE_PUNCT_RE.sub(r'\1', text)
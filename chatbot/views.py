@@ -1,25 +1,63 @@
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 import json
-import traceback
-from chatbot.chatbot_service import ChatbotService
-from chatbot.enhanced_rag_service import EnhancedRAGService
-import os
-
-# Initialize services
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-data_file = os.path.join(BASE_DIR, 'chatbot', 'universities_data.txt')
-
-try:
-    rag_service = EnhancedRAGService(data_file)
-    chatbot_service = ChatbotService(rag_service)
-    print("✅ Services initialized successfully")
-except Exception as e:
-    print(f"❌ Error initializing services: {e}")
-    print(traceback.format_exc())
-    rag_service = None
-    chatbot_service = None
+import logging
+from chatbot.jobs import JobFailed, fail_if_orphaned, get_job_runner
+from chatbot.metrics import REGISTRY, REQUEST_SECONDS, REQUESTS, timed
+from chatbot.models import IngestionJob
+from chatbot.services import get_service_registry
+
+logger = logging.getLogger(__name__)
+
+# Services are built on first use (or by the warm-up in ChatbotConfig.ready()),
+# so importing the views does not load the embedding model or the corpus
+services = get_service_registry()
+
+
+def _cache_stats():
+    """Stats of every enabled cache, by name (nothing until the services are built)"""
+    rag_service, chatbot_service = services.peek()
+    caches = {
+        'query_embedding': rag_service.get_cache_stats() if rag_service else None,
+        'search_results': rag_service.get_search_cache_stats() if rag_service else None,
+        'scrape': rag_service.get_scrape_cache_stats() if rag_service else None,
+        'response': chatbot_service.get_cache_stats() if chatbot_service else None
+    }
+    return {name: stats for name, stats in caches.items() if stats}
+
+
+REGISTRY.gauge_callback(
+    'chatbot_cache_hit_ratio', 'Hit ratio of each cache', ['cache'],
+    lambda: {(name,): stats['hit_ratio'] for name, stats in _cache_stats().items()}
+)
+REGISTRY.gauge_callback(
+    'chatbot_cache_hits', 'Hits of each cache since the worker started', ['cache'],
+    lambda: {(name,): stats['hits'] for name, stats in _cache_stats().items()}
+)
+REGISTRY.gauge_callback(
+    'chatbot_cache_misses', 'Misses of each cache since the worker started', ['cache'],
+    lambda: {(name,): stats['misses'] for name, stats in _cache_stats().items()}
+)
+
+
+def _chunk_counts():
+    rag_service = services.peek()[0]
+    if not rag_service:
+        return {}
+    stats = rag_service.get_stats()
+    return {('file',): stats['file_chunks'], ('web',): stats['web_chunks']}
+
+
+REGISTRY.gauge_callback(
+    'chatbot_knowledge_chunks', 'Chunks in the knowledge base by type', ['type'], _chunk_counts
+)
+REGISTRY.gauge_callback(
+    'chatbot_services_ready', '1 once this worker has built its services', [],
+    lambda: {(): 1 if services.ready else 0}
+)
 
 
 def index(request):
@@ -27,8 +65,7 @@ def index(request):
     return render(request, 'chatbot/index.html')
 
 
-@csrf_exempt
-def chat(request):
+async def chat(request):
     """Handle chat messages - ALWAYS returns success:True"""
     if request.method == 'POST':
         try:
@@ -43,6 +80,7 @@ def chat(request):
                 })
 
             # Check if services are initialized
+            chatbot_service = await services.aget_chatbot_service()
             if not chatbot_service:
                 return JsonResponse({
                     'response': 'Chatbot service is not available. Please restart the server.',
@@ -50,14 +88,14 @@ def chat(request):
                 })
 
             # Get response from chatbot
-            print(f"\n{'=' * 60}")
-            print(f"💬 User asked: {user_message}")
-            print(f"{'=' * 60}")
+            logger.debug("User asked: %s", user_message)
 
-            response = chatbot_service.get_response(user_message)
+            # Retrieval runs on a bounded executor so the event loop keeps serving other requests
+            with timed('chat', histogram=REQUEST_SECONDS):
+                response = await chatbot_service.aget_response(user_message)
+            REQUESTS.inc(endpoint='chat', outcome='ok')
 
-            print(f"\n✅ Response ready ({len(response)} characters)")
-            print(f"{'=' * 60}\n")
+            logger.debug("Response ready (%d characters)", len(response))
 
             # ALWAYS return success:True so the response is displayed
             return JsonResponse({
@@ -66,7 +104,8 @@ def chat(request):
             })
 
         except json.JSONDecodeError as e:
-            print(f"❌ JSON decode error: {e}")
+            logger.warning("JSON decode error: %s", e)
+            REQUESTS.inc(endpoint='chat', outcome='bad_request')
             return JsonResponse({
                 'response': 'Invalid request format. Please try again.',
                 'success': True  # Still True so message displays
@@ -74,12 +113,8 @@ def chat(request):
 
         except Exception as e:
             # Log the full error for debugging
-            print(f"\n{'=' * 60}")
-            print(f"❌ ERROR in chat endpoint:")
-            print(f"{'=' * 60}")
-            print(f"Error: {str(e)}")
-            print(traceback.format_exc())
-            print(f"{'=' * 60}\n")
+            logger.exception("ERROR in chat endpoint: %s", e)
+            REQUESTS.inc(endpoint='chat', outcome='error')
 
             # Return user-friendly error message but with success:True
             return JsonResponse({
@@ -93,25 +128,103 @@ def chat(request):
     })
 
 
+# csrf_exempt() only wraps async views from Django 5.0, so mark the view directly
+chat.csrf_exempt = True
+
+
+def _sse_event(data, event=None):
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+async def chat_stream(request):
+    """Stream the chat response as Server-Sent Events, one paragraph per event"""
+    if request.method != 'POST':
+        return JsonResponse({
+            'response': 'Invalid request method. Please use POST.',
+            'success': True
+        })
+
+    # None marks a malformed request: invalid JSON, or not an object with a string message
+    user_message = None
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        logger.warning("JSON decode error: %s", e)
+    else:
+        message = data.get('message', '') if isinstance(data, dict) else None
+        if isinstance(message, str):
+            user_message = message.strip()
+        else:
+            logger.warning("Invalid chat request body: %s", type(data).__name__)
+
+    async def events():
+        try:
+            chatbot_service = await services.aget_chatbot_service() if user_message else None
+            if user_message is None:
+                REQUESTS.inc(endpoint='chat_stream', outcome='bad_request')
+                yield _sse_event({'delta': 'Invalid request format. Please try again.'})
+            elif not user_message:
+                yield _sse_event({'delta': 'Please enter a message.'})
+            elif not chatbot_service:
+                yield _sse_event({'delta': 'Chatbot service is not available. Please restart the server.'})
+            else:
+                logger.debug("User asked (stream): %s", user_message)
+                with timed('chat_stream', histogram=REQUEST_SECONDS):
+                    async for paragraph in chatbot_service.astream_response(user_message):
+                        yield _sse_event({'delta': paragraph})
+                REQUESTS.inc(endpoint='chat_stream', outcome='ok')
+        except Exception as e:
+            # The response has started, so report the error in the stream and still finish it
+            logger.exception("ERROR in chat stream: %s", e)
+            REQUESTS.inc(endpoint='chat_stream', outcome='error')
+            yield _sse_event({'delta': f'\n\nAn error occurred: {str(e)}', 'error': True}, event='error')
+        yield _sse_event({'success': True}, event='done')
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+chat_stream.csrf_exempt = True
+
+
+def _job_accepted(job, message):
+    """202 response pointing at the status endpoint of a queued job"""
+    return JsonResponse({
+        'message': message,
+        'job_id': job.pk,
+        'status_url': reverse('chatbot:job_status', args=[job.pk]),
+        'job': job.to_dict(),
+        'success': True
+    }, status=202)
+
+
 @csrf_exempt
 def reload_data(request):
-    """Reload data from the text file"""
+    """Queue a reload of the text file; poll the returned job for progress"""
     if request.method == 'POST':
         try:
+            rag_service = services.get_rag_service()
             if not rag_service:
                 return JsonResponse({
                     'message': 'RAG service not available',
                     'success': False
                 }, status=500)
 
-            rag_service.reload_data()
-            return JsonResponse({
-                'message': 'Data reloaded successfully!',
-                'success': True
-            })
+            def run(progress):
+                if not rag_service.reload_data(progress_callback=progress):
+                    raise JobFailed('Error reloading data. Check the server console for details.')
+                return 'Data reloaded successfully!'
+
+            job = get_job_runner().submit('reload', run)
+            return _job_accepted(job, 'Reload started')
 
         except Exception as e:
-            print(f"Error reloading data: {str(e)}")
+            logger.exception("Error reloading data: %s", e)
             return JsonResponse({
                 'message': f'Error reloading data: {str(e)}',
                 'success': False
@@ -125,9 +238,10 @@ def reload_data(request):
 
 @csrf_exempt
 def refetch_and_reload_data(request):
-    """Refetch data from Wikipedia and reload"""
+    """Queue a refetch from Wikipedia and reload; poll the returned job for progress"""
     if request.method == 'POST':
         try:
+            rag_service = services.get_rag_service()
             if not rag_service:
                 return JsonResponse({
                     'message': 'RAG service not available',
@@ -137,21 +251,16 @@ def refetch_and_reload_data(request):
             data = json.loads(request.body) if request.body else {}
             url = data.get('url', 'https://en.wikipedia.org/wiki/Universities_in_the_United_Kingdom')
 
-            success = rag_service.refetch_and_reload_data(url)
+            def run(progress):
+                if not rag_service.refetch_and_reload_data(url, progress_callback=progress):
+                    raise JobFailed('Failed to refetch data. Check if Firecrawl API key is configured.')
+                return 'Data refetched and reloaded successfully!'
 
-            if success:
-                return JsonResponse({
-                    'message': 'Data refetched and reloaded successfully!',
-                    'success': True
-                })
-            else:
-                return JsonResponse({
-                    'message': 'Failed to refetch data. Check if Firecrawl API key is configured.',
-                    'success': False
-                }, status=500)
+            job = get_job_runner().submit('refetch', run, params={'url': url})
+            return _job_accepted(job, f'Refetching {url}')
 
         except Exception as e:
-            print(f"Error refetching data: {str(e)}")
+            logger.exception("Error refetching data: %s", e)
             return JsonResponse({
                 'message': f'Error refetching data: {str(e)}',
                 'success': False
@@ -165,9 +274,13 @@ def refetch_and_reload_data(request):
 
 @csrf_exempt
 def add_web_content(request):
-    """Add content from a web URL"""
+    """
+    Queue adding content from a web URL; poll the returned job for progress.
+    max_pages > 1 crawls the site and indexes pages as they arrive.
+    """
     if request.method == 'POST':
         try:
+            rag_service = services.get_rag_service()
             if not rag_service:
                 return JsonResponse({
                     'message': 'RAG service not available',
@@ -183,21 +296,24 @@ def add_web_content(request):
                     'success': False
                 }, status=400)
 
-            success = rag_service.add_web_content(url)
-
-            if success:
+            try:
+                max_pages = max(1, min(int(data.get('max_pages', 1)), settings.CHATBOT_CRAWL_MAX_PAGES))
+            except (TypeError, ValueError):
                 return JsonResponse({
-                    'message': f'Successfully added content from {url}',
-                    'success': True
-                })
-            else:
-                return JsonResponse({
-                    'message': 'Failed to add web content. Check if Firecrawl API key is configured.',
+                    'message': 'max_pages must be a number',
                     'success': False
-                }, status=500)
+                }, status=400)
+
+            def run(progress):
+                if not rag_service.add_web_content(url, max_pages=max_pages, progress_callback=progress):
+                    raise JobFailed('Failed to add web content. Check if Firecrawl API key is configured.')
+                return f'Successfully added content from {url}'
+
+            job = get_job_runner().submit('add_web_content', run, params={'url': url, 'max_pages': max_pages})
+            return _job_accepted(job, f'Adding content from {url}')
 
         except Exception as e:
-            print(f"Error adding web content: {str(e)}")
+            logger.exception("Error adding web content: %s", e)
             return JsonResponse({
                 'message': f'Error: {str(e)}',
                 'success': False
@@ -209,11 +325,30 @@ def add_web_content(request):
     }, status=405)
 
 
+def job_status(request, job_id):
+    """Status and progress (chunks processed out of total) of an ingestion job"""
+    try:
+        job = IngestionJob.objects.get(pk=job_id)
+    except IngestionJob.DoesNotExist:
+        return JsonResponse({
+            'message': f'Job {job_id} not found',
+            'success': False
+        }, status=404)
+
+    # A job whose worker died would otherwise read as running forever
+    job = fail_if_orphaned(job)
+    return JsonResponse({
+        'job': job.to_dict(),
+        'success': True
+    })
+
+
 @csrf_exempt
 def add_search_content(request):
-    """Add content from web search"""
+    """Queue a web search whose top results are scraped and added; poll the returned job"""
     if request.method == 'POST':
         try:
+            rag_service = services.get_rag_service()
             if not rag_service:
                 return JsonResponse({
                     'message': 'RAG service not available',
@@ -229,14 +364,26 @@ def add_search_content(request):
                     'success': False
                 }, status=400)
 
-            # This feature would require additional implementation
-            return JsonResponse({
-                'message': 'Search and add feature coming soon',
-                'success': False
-            }, status=501)
+            try:
+                max_results = max(1, min(int(data.get('max_results', settings.CHATBOT_SEARCH_RESULTS)), 10))
+            except (TypeError, ValueError):
+                return JsonResponse({
+                    'message': 'max_results must be a number',
+                    'success': False
+                }, status=400)
+
+            def run(progress):
+                pages = rag_service.add_search_content(query, max_results=max_results, progress_callback=progress)
+                if not pages:
+                    raise JobFailed('No search results could be added. Check if Firecrawl API key is configured.')
+                return f'Added {pages} pages for "{query}"'
+
+            job = get_job_runner().submit('add_search_content', run,
+                                          params={'query': query, 'max_results': max_results})
+            return _job_accepted(job, f'Searching the web for "{query}"')
 
         except Exception as e:
-            print(f"Error in search content: {str(e)}")
+            logger.exception("Error in search content: %s", e)
             return JsonResponse({
                 'message': f'Error: {str(e)}',
                 'success': False
@@ -251,6 +398,8 @@ def add_search_content(request):
 def get_knowledge_stats(request):
     """Get statistics about the knowledge base"""
     try:
+        rag_service = services.get_rag_service()
+        chatbot_service = services.get_chatbot_service()
         if not rag_service:
             return JsonResponse({
                 'stats': {
@@ -264,11 +413,16 @@ def get_knowledge_stats(request):
         stats = rag_service.get_stats()
         return JsonResponse({
             'stats': stats,
+            'query_cache': rag_service.get_cache_stats(),
+            'query_batching': rag_service.get_batching_stats(),
+            'scrape_cache': rag_service.get_scrape_cache_stats(),
+            'response_cache': chatbot_service.get_cache_stats() if chatbot_service else None,
+            'topic_gate': chatbot_service.get_gate_stats() if chatbot_service else None,
             'success': True
         })
 
     except Exception as e:
-        print(f"Error getting stats: {str(e)}")
+        logger.exception("Error getting stats: %s", e)
         return JsonResponse({
             'stats': {
                 'total_chunks': 0,
@@ -284,6 +438,7 @@ def clear_web_content(request):
     """Clear all web-scraped content"""
     if request.method == 'POST':
         try:
+            rag_service = services.get_rag_service()
             if not rag_service:
                 return JsonResponse({
                     'message': 'RAG service not available',
@@ -297,7 +452,7 @@ def clear_web_content(request):
             })
 
         except Exception as e:
-            print(f"Error clearing web content: {str(e)}")
+            logger.exception("Error clearing web content: %s", e)
             return JsonResponse({
                 'message': f'Error: {str(e)}',
                 'success': False
@@ -309,11 +464,11 @@ def clear_web_content(request):
     }, status=405)
 
 
-@csrf_exempt
-def search_with_sources(request):
+async def search_with_sources(request):
     """Search and return results with sources"""
     if request.method == 'POST':
         try:
+            rag_service = await services.aget_rag_service()
             if not rag_service:
                 return JsonResponse({
                     'sources': [],
@@ -331,7 +486,9 @@ def search_with_sources(request):
                     'success': False
                 }, status=400)
 
-            sources = rag_service.get_sources(query, n_results)
+            with timed('search_sources', histogram=REQUEST_SECONDS):
+                sources = await rag_service.aget_sources(query, n_results)
+            REQUESTS.inc(endpoint='search_sources', outcome='ok')
 
             return JsonResponse({
                 'sources': sources,
@@ -339,7 +496,7 @@ def search_with_sources(request):
             })
 
         except Exception as e:
-            print(f"Error in search: {str(e)}")
+            logger.exception("Error in search: %s", e)
             return JsonResponse({
                 'sources': [],
                 'message': f'Error: {str(e)}',
@@ -349,4 +506,33 @@ def search_with_sources(request):
     return JsonResponse({
         'message': 'Invalid request method',
         'success': False
-    }, status=405)
\ No newline at end of file
+    }, status=405)
+
+
+search_with_sources.csrf_exempt = True
+
+
+def metrics(request):
+    """Prometheus metrics: per-stage latency histograms, request counts and cache hit ratios"""
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def healthz(request):
+    """Liveness: the process is up and serving requests (services may still be loading)"""
+    return JsonResponse({'status': 'ok'})
+
+
+def readyz(request):
+    """
+    Readiness: 200 once this worker has built its services, 503 until then.
+    A probe of a cold worker starts the warm-up in the background, as does
+    one of a failed worker once its retry backoff has passed, so load
+    balancers only route traffic to warmed workers.
+    """
+    ready = services.warm_up(background=True)
+    rag_service = services.peek()[0]
+    if ready and hasattr(rag_service, 'ping') and not rag_service.ping():
+        # Remote RAG server mode: this worker is only useful while the server answers
+        return JsonResponse({'ready': False, **services.status(), 'error': 'RAG server unavailable'},
+                            status=503)
+    return JsonResponse({'ready': ready, **services.status()}, status=200 if ready else 503)
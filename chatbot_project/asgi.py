@@ -3,6 +3,15 @@ ASGI config for chatbot_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The chat and search views are async, so one ASGI worker can hold many
+concurrent connections, e.g.:
+
+    uvicorn chatbot_project.asgi:application --workers 2
+
+uvicorn --workers starts each worker as a fresh process, so each one loads
+its own model; gunicorn.conf.py (`gunicorn -c gunicorn.conf.py`) runs this
+app on uvicorn workers forked from a preloaded master that shares it.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -122,3 +122,95 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Chatbot knowledge base
+# Directory for the persistent vector store (set to an empty string for in-memory only)
+CHATBOT_VECTOR_STORE_DIR = os.getenv('CHATBOT_VECTOR_STORE_DIR', str(BASE_DIR / 'vector_store'))
+CHATBOT_CHUNK_SIZE = int(os.getenv('CHATBOT_CHUNK_SIZE', '400'))
+CHATBOT_EMBEDDING_MODEL = os.getenv('CHATBOT_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+# Embedding inference: 'torch' (fp32), 'torch-int8', 'onnx' or 'onnx-int8' (ONNX Runtime,
+# needs sentence-transformers[onnx]). Changing it re-indexes a persistent store.
+CHATBOT_EMBEDDING_BACKEND = os.getenv('CHATBOT_EMBEDDING_BACKEND', 'torch')
+# ONNX Runtime intra-op threads per process (0: one per core)
+CHATBOT_EMBEDDING_THREADS = int(os.getenv('CHATBOT_EMBEDDING_THREADS', '0'))
+CHATBOT_QUERY_CACHE_SIZE = int(os.getenv('CHATBOT_QUERY_CACHE_SIZE', '2048'))
+# Seconds before a cached query vector expires (empty for no expiry)
+CHATBOT_QUERY_CACHE_TTL = float(os.getenv('CHATBOT_QUERY_CACHE_TTL') or 0) or None
+# Chunks embedded per forward pass / upsert, and threads embedding web pages during ingestion
+CHATBOT_EMBED_BATCH_SIZE = int(os.getenv('CHATBOT_EMBED_BATCH_SIZE', '64'))
+CHATBOT_INGEST_WORKERS = int(os.getenv('CHATBOT_INGEST_WORKERS', '1'))
+# Retrieval: 'vector', 'lexical' (BM25), 'hybrid' (rank fusion) or 'auto' (lexical fast path for
+# entity queries); empty for EnhancedRAGService's DEFAULT_SEARCH_MODE
+CHATBOT_SEARCH_MODE = os.getenv('CHATBOT_SEARCH_MODE', '')
+# Threads that async views use for embedding and vector search
+CHATBOT_SEARCH_WORKERS = int(os.getenv('CHATBOT_SEARCH_WORKERS', '4'))
+# Micro-batching of concurrent query embeddings/searches (window 0 disables it).
+# Batches can only be as large as the number of concurrently searching threads.
+CHATBOT_BATCH_WINDOW_MS = float(os.getenv('CHATBOT_BATCH_WINDOW_MS', '0'))
+CHATBOT_BATCH_MAX_SIZE = int(os.getenv('CHATBOT_BATCH_MAX_SIZE', '16'))
+
+# Response cache: 'local' (per-process LRU), 'django' (shared via CACHES) or 'none'
+CHATBOT_RESPONSE_CACHE = os.getenv('CHATBOT_RESPONSE_CACHE', 'local')
+CHATBOT_RESPONSE_CACHE_SIZE = int(os.getenv('CHATBOT_RESPONSE_CACHE_SIZE', '1024'))
+CHATBOT_RESPONSE_CACHE_TTL = float(os.getenv('CHATBOT_RESPONSE_CACHE_TTL', '3600'))
+
+# Topic gate: 'keyword' (keyword/typo matching) or 'embedding' (similarity to the corpus centroid)
+CHATBOT_TOPIC_GATE = os.getenv('CHATBOT_TOPIC_GATE', 'keyword')
+CHATBOT_TOPIC_THRESHOLD = float(os.getenv('CHATBOT_TOPIC_THRESHOLD', '0.3'))
+
+# Background ingestion jobs (reload, refetch, web content); 1 runs them one at a time
+CHATBOT_JOB_WORKERS = int(os.getenv('CHATBOT_JOB_WORKERS', '1'))
+# Upper bound on pages per site crawl (add-web-content with max_pages > 1)
+CHATBOT_CRAWL_MAX_PAGES = int(os.getenv('CHATBOT_CRAWL_MAX_PAGES', '50'))
+
+# Search-and-add (add-search-content): results scraped per query, cached search hits,
+# concurrent scrapes and the minimum spacing between requests to one host
+CHATBOT_SEARCH_RESULTS = int(os.getenv('CHATBOT_SEARCH_RESULTS', '5'))
+CHATBOT_SEARCH_CACHE_TTL = float(os.getenv('CHATBOT_SEARCH_CACHE_TTL', '3600'))
+CHATBOT_SCRAPE_WORKERS = int(os.getenv('CHATBOT_SCRAPE_WORKERS', '4'))
+CHATBOT_SCRAPE_HOST_INTERVAL = float(os.getenv('CHATBOT_SCRAPE_HOST_INTERVAL', '1.0'))
+
+# On-disk scrape cache (empty to disable): pages younger than the TTL (seconds, empty for
+# no expiry) are not refetched, and unchanged pages are not re-embedded
+CHATBOT_SCRAPE_CACHE_DIR = os.getenv('CHATBOT_SCRAPE_CACHE_DIR', str(BASE_DIR / 'scrape_cache'))
+CHATBOT_SCRAPE_CACHE_TTL = float(os.getenv('CHATBOT_SCRAPE_CACHE_TTL', '86400') or 0) or None
+
+# Logging: chatbot messages at CHATBOT_LOG_LEVEL (DEBUG adds per-stage timings) written to
+# stderr from a background thread; per-stage latency histograms are served at /metrics/
+CHATBOT_LOG_LEVEL = os.getenv('CHATBOT_LOG_LEVEL', 'INFO').upper()
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'standard': {
+            'format': '%(asctime)s %(levelname)s %(name)s [%(process)d] %(message)s'
+        }
+    },
+    'handlers': {
+        'console': {
+            'class': 'chatbot.log.BackgroundStreamHandler',
+            'formatter': 'standard'
+        }
+    },
+    'loggers': {
+        'chatbot': {
+            'handlers': ['console'],
+            'level': CHATBOT_LOG_LEVEL,
+            'propagate': False
+        }
+    }
+}
+
+# Service warm-up: 'off' builds the services on the first request (or first /readyz/ probe),
+# 'background' starts building them at startup, 'blocking' finishes before serving requests.
+# manage.py commands other than runserver never warm up.
+CHATBOT_WARMUP = os.getenv('CHATBOT_WARMUP', 'off')
+
+# Out-of-process retrieval: with a URL (http://127.0.0.1:8765 or unix:///path/to.sock) web
+# workers send embedding/search/ingestion to `python manage.py rag_server` over pooled
+# keep-alive connections instead of loading the model and index themselves
+CHATBOT_RAG_SERVER_URL = os.getenv('CHATBOT_RAG_SERVER_URL', '')
+CHATBOT_RAG_SERVER_POOL_SIZE = int(os.getenv('CHATBOT_RAG_SERVER_POOL_SIZE', '8'))
+CHATBOT_RAG_SERVER_TIMEOUT = float(os.getenv('CHATBOT_RAG_SERVER_TIMEOUT', '30'))
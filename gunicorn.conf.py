@@ -0,0 +1,104 @@
+"""
+Gunicorn settings for multi-worker deployments with a shared, preloaded model.
+
+    gunicorn -c gunicorn.conf.py    # needs uvicorn installed
+
+Workers default to uvicorn's ASGI worker serving chatbot_project.asgi.
+The async views and /chat/stream/ need it. Under a WSGI worker, Django
+collects an async streaming response into a list before sending it, so
+the streamed answer arrives all at once, and each request ties up a
+thread. GUNICORN_WORKER_CLASS=gthread runs the WSGI app instead, for
+hosts without uvicorn.
+
+With GUNICORN_PRELOAD on (the default), the master imports Django and builds
+the chatbot services before it forks the workers: it loads the embedding
+model, builds the vector index, the BM25 index and the topic centroid.
+CHATBOT_WARMUP defaults to 'blocking' here to make that happen. Every
+worker then shares those pages copy-on-write instead of loading its own
+copy. A worker costs its private memory only, not another model.
+
+Fork safety:
+  - gc.freeze() runs in the master just before forking. The collector then
+    never walks the preloaded objects in a worker, and does not write to
+    (and un-share) their pages.
+  - ServiceRegistry.after_fork(), registered with os.register_at_fork, runs
+    in each worker. It drops inherited thread pools. With a persistent
+    store (CHATBOT_VECTOR_STORE_DIR) it also reopens Chroma, because SQLite
+    connections must not cross fork(). That worker then loads its own HNSW
+    index; the model, BM25 index and centroid stay shared. To share the
+    vector index as well, use the in-memory store (CHATBOT_VECTOR_STORE_DIR=).
+    The master then re-embeds the corpus at every start.
+  - post_fork closes inherited Django database connections and limits
+    PyTorch to CHATBOT_TORCH_THREADS intra-op threads per worker (default
+    1), so N workers do not oversubscribe the CPUs. The ONNX embedding
+    backends get the same limit through CHATBOT_EMBEDDING_THREADS, set
+    before the session is created; a single-threaded session also has no
+    thread pool to lose in the fork.
+
+Ingestion jobs run in the worker that accepted them. With the in-memory
+store they update only that worker's indexes. New workers fork from the
+master's snapshot, including those respawned by `kill -HUP`, so restart
+gunicorn after ingesting to serve the new content from every worker.
+
+Workers sharing a persistent store coordinate through a lock file next
+to it. When one worker reloads, it swaps in a new collection and the
+others follow it on their next search. The replaced collection is only
+dropped RETIRED_COLLECTION_GRACE seconds later. Web pages added in place
+reach the other workers' BM25 results at once, but their dense results
+only after the next reload.
+
+With CHATBOT_RAG_SERVER_URL set, the model and index live in the separate
+`python manage.py rag_server` process instead. Workers are then light,
+preloading only saves Django's own memory, and ingestion reaches every
+worker at once.
+
+`python -m benchmarks.check_fork_rss` measures how much private memory
+each worker adds, with and without preloading.
+"""
+import gc
+import os
+import sys
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+# The app to serve unless one is given on the command line; ASGI for uvicorn workers
+wsgi_app = os.getenv(
+    'GUNICORN_APP',
+    'chatbot_project.asgi:application' if 'uvicorn' in worker_class.lower() else 'chatbot_project.wsgi:application'
+)
+# Threads per gthread (WSGI) worker; uvicorn workers serve concurrently on their event loop
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() not in ('0', 'false', 'no', '')
+
+os.environ.setdefault('CHATBOT_EMBEDDING_THREADS', os.getenv('CHATBOT_TORCH_THREADS', '1'))
+
+if preload_app:
+    # Build the services in the master (read by settings when the app is preloaded)
+    os.environ.setdefault('CHATBOT_WARMUP', 'blocking')
+    # No collections while preloading; whatever is loaded gets frozen before the fork
+    gc.disable()
+else:
+    # Each worker builds its own services; /readyz/ reports when they are done
+    os.environ.setdefault('CHATBOT_WARMUP', 'background')
+
+
+def when_ready(server):
+    """Runs in the master once the app is loaded, before the first fork"""
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+        server.log.info("Preloaded app frozen (%s objects) before forking workers", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    """Runs in each new worker"""
+    if preload_app:
+        gc.enable()
+        # The master's connections (if any) must not be shared with workers
+        from django.db import connections
+        connections.close_all()
+
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(int(os.getenv('CHATBOT_TORCH_THREADS', '1')))
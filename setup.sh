@@ -31,8 +31,9 @@ pip install -r requirements.txt
 echo ""
 echo "Setup complete! Next steps:"
 echo "1. Edit .env with your API keys"
-echo "2. Run: python manage.py runserver"
-echo "3. Open: http://127.0.0.1:8000"
+echo "2. Run: python manage.py migrate (creates the ingestion job table)"
+echo "3. Run: python manage.py runserver"
+echo "4. Open: http://127.0.0.1:8000"
 echo ""
 echo "New Firecrawl features:"
 echo "   • Scrape web content and add to knowledge base"